@@ -0,0 +1,56 @@
+from datetime import datetime
+from decimal import Decimal
+import base64
+import binascii
+import json
+
+from fastapi import HTTPException, status
+
+
+def encode_cursor(**position) -> str:
+    """
+    Pack the position of the last row of a page into an opaque, URL-safe token.
+    Values must be JSON serializable; pass Decimals as strings to keep them exact.
+    """
+    raw = json.dumps(position, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def cursor_int(value) -> int:
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise TypeError(value)
+    return value
+
+
+def cursor_decimal(value) -> Decimal:
+    # Decimals are encoded as strings; NaN and infinities never are
+    if not isinstance(value, str):
+        raise TypeError(value)
+    number = Decimal(value)
+    if not number.is_finite():
+        raise ValueError(value)
+    return number
+
+
+def cursor_datetime(value) -> datetime:
+    if not isinstance(value, str):
+        raise TypeError(value)
+    return datetime.fromisoformat(value)
+
+
+def decode_cursor(cursor: str, *fields: str, **parsers) -> dict:
+    """
+    Unpack a cursor that must hold every one of fields; parsers maps a field to the function
+    that checks and converts its value, such as cursor_int or cursor_decimal.
+    """
+    # Any malformed, foreign or tampered token is the client's fault, never a 500
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(position, dict) or any(field not in position for field in fields):
+            raise ValueError(cursor)
+        for field, parse in parsers.items():
+            position[field] = parse(position[field])
+        return position
+    except (ValueError, TypeError, KeyError, ArithmeticError, binascii.Error):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
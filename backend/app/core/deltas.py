@@ -0,0 +1,243 @@
+from dataclasses import dataclass
+from decimal import Decimal
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, Sequence
+import logging
+
+import numpy as np
+from sqlalchemy import select, update, union_all, func, bindparam, cast, true, or_, BigInteger, Integer, DECIMAL
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session
+
+from app.models.db_models import Player, PlayerData
+from app.models.pricing_model import price_model_batch
+
+logger = logging.getLogger(__name__)
+
+# Price change windows, by the players column each one is written to
+DELTA_WINDOWS = {
+    'delta_8h': timedelta(hours=8),
+    'delta_24h': timedelta(hours=24),
+    'delta_72h': timedelta(hours=72),
+}
+LOOKBACK = max(DELTA_WINDOWS.values())
+# Ticks computed per pass when backfilling, bounding the (ticks x players) arrays
+BACKFILL_CHUNK = 500
+# League points of a player before their first snapshot
+MISSING = -1
+
+
+def epoch_seconds(dates) -> np.ndarray:
+    return np.array([int(date.timestamp()) for date in dates], dtype=np.int64)
+
+
+def forward_fill(league_points: np.ndarray) -> np.ndarray:
+    """Replace every MISSING reading with the player's previous one, along the time axis."""
+    columns = np.where(league_points != MISSING, np.arange(league_points.shape[1]), 0)
+    np.maximum.accumulate(columns, axis=1, out=columns)
+    return np.take_along_axis(league_points, columns, axis=1)
+
+
+@dataclass
+class DeltaFrame:
+    """Deltas of every player at one or more ticks: deltas[field][tick index, player index]."""
+    ticks: np.ndarray
+    player_ids: np.ndarray
+    deltas: Dict[str, np.ndarray]
+
+    def column(self, field: str, tick: int = -1) -> list:
+        """One window's deltas at one tick, rounded to cents as written to players; unknown ones are None."""
+        return [None if np.isnan(delta) else Decimal(str(delta)) for delta in np.round(self.deltas[field][tick], 2)]
+
+
+class DeltaEngine:
+    """
+    Recent LP history of every player as a (players x ticks) array with one sorted array of
+    tick times, from which the price change over every window is computed for all players in
+    one vectorized pass: a lookback is a searchsorted on the tick times and a column read.
+
+    Readings are forward filled, so a player's price at a time is the price of their last
+    snapshot at or before it, and a delta is the price at the tick less the price at
+    tick - window. Players with less history than a window are measured from their oldest
+    snapshot. Only ticks newer than the longest window are kept, plus the last one before it,
+    which is what the longest lookback lands on.
+    """
+
+    def __init__(self, windows: Dict[str, timedelta] = DELTA_WINDOWS):
+        self.windows = windows
+        self.lookback = max(windows.values())
+        self.reset()
+
+    def reset(self):
+        """Forget the history, e.g. after a failed write left it ahead of the database."""
+        self.times = np.empty(0, dtype=np.int64)
+        self.player_ids = np.empty(0, dtype=np.int64)
+        self.league_points = np.empty((0, 0), dtype=np.int32)
+        self.rows: Dict[int, int] = {}
+        self.loaded = False
+
+    def load(self, player_ids: Sequence[int], seconds: Sequence[int], league_points: Sequence[int]):
+        """Replace the history with snapshot rows given in any order, times in epoch seconds."""
+        self.times, columns = np.unique(np.asarray(seconds, dtype=np.int64), return_inverse=True)
+        self.player_ids, rows = np.unique(np.asarray(player_ids, dtype=np.int64), return_inverse=True)
+        history = np.full((len(self.player_ids), len(self.times)), MISSING, dtype=np.int32)
+        history[rows, columns] = league_points
+        self.league_points = forward_fill(history)
+        self.rows = {player_id: row for row, player_id in enumerate(self.player_ids.tolist())}
+        self.loaded = True
+
+    def append(self, tick: datetime, player_ids: Sequence[int], league_points: Sequence[int]):
+        """Add one tick's snapshot, no older than the newest tick held."""
+        seconds = int(tick.timestamp())
+        if len(self.times) and seconds < self.times[-1]:
+            raise ValueError(f'Tick {tick} is older than the newest tick held')
+
+        new = [player_id for player_id in player_ids if player_id not in self.rows]
+        if new:
+            self.rows.update((player_id, len(self.player_ids) + index) for index, player_id in enumerate(new))
+            self.player_ids = np.concatenate([self.player_ids, np.asarray(new, dtype=np.int64)])
+            self.league_points = np.vstack([
+                self.league_points, np.full((len(new), len(self.times)), MISSING, dtype=np.int32)])
+
+        if not len(self.times) or seconds > self.times[-1]:
+            # The new tick starts from everyone's previous reading
+            previous = self.league_points[:, -1:] if len(self.times) else \
+                np.full((len(self.player_ids), 1), MISSING, dtype=np.int32)
+            self.times = np.append(self.times, seconds)
+            self.league_points = np.hstack([self.league_points, previous])
+        self.league_points[[self.rows[player_id] for player_id in player_ids], -1] = league_points
+        self.loaded = True
+
+    def trim(self, as_of: datetime):
+        """Drop ticks no window ending at or after as_of can reach."""
+        first = max(np.searchsorted(self.times, int((as_of - self.lookback).timestamp()), side='right') - 1, 0)
+        self.times, self.league_points = self.times[first:], self.league_points[:, first:]
+
+    def compute(self, ticks) -> DeltaFrame:
+        """Deltas of every player at each of ticks (datetimes), without touching the database."""
+        ticks = epoch_seconds(ticks)
+        history = self.league_points
+        if not history.size:
+            return DeltaFrame(ticks, self.player_ids,
+                              {field: np.empty((len(ticks), 0)) for field in self.windows})
+        oldest = history[np.arange(len(history)), np.argmax(history != MISSING, axis=1)]
+
+        def readings_at(seconds):
+            # Each player's LP at each time, as a (players x ticks) array; MISSING before any reading
+            columns = np.searchsorted(self.times, seconds, side='right') - 1
+            readings = history[:, np.maximum(columns, 0)]
+            readings[:, columns < 0] = MISSING
+            return readings
+
+        current = readings_at(ticks)
+        known = current != MISSING
+        current_prices = price_model_batch(np.where(known, current, 0))
+
+        deltas = {}
+        for field, window in self.windows.items():
+            baseline = readings_at(ticks - int(window.total_seconds()))
+            baseline = np.where(baseline != MISSING, baseline, oldest[:, None])
+            delta = current_prices - price_model_batch(baseline)
+            delta[~known] = np.nan
+            deltas[field] = delta.T
+        return DeltaFrame(ticks, self.player_ids, deltas)
+
+
+def history_statement(since: datetime, until: datetime, model=Player, data_model=PlayerData):
+    """
+    Snapshot rows, as (player id, epoch seconds, LP), an engine needs to compute deltas for
+    ticks in [since, until]: every row in (since - lookback, until], and each player's last row
+    before that, found with one index probe per player and tier.
+
+    When the lookback reaches past the raw retention window, the hourly and daily rollups of
+    data_model are read as well, each bucket as one reading of its close at the bucket's time,
+    as the history endpoints show them; ticks in rolled-up periods are then one per bucket.
+    """
+    # Imported here, as retention reads LOOKBACK from this module
+    from app.core.price_history import tier_sources
+    from app.core.retention import RAW_RETENTION
+
+    cutoff = since - LOOKBACK
+    sources = [(table, time, close) for table, (time, *_, close) in tier_sources(data_model)]
+    if cutoff >= datetime.now(timezone.utc) - RAW_RETENTION:
+        # Nothing this recent has been rolled up, so only the raw tier is read
+        sources = sources[-1:]
+
+    recent = union_all(*[
+        select(table.player_id.label('player_id'), time.label('date'), close.label('league_points'))
+        .where(time > cutoff, time <= until, table.player_id.is_not(None))
+        for table, time, close in sources
+    ])
+    candidates = union_all(*[
+        select(time.label('date'), close.label('league_points'))
+        .where(table.player_id == model.id, time <= cutoff)
+        .order_by(time.desc()).limit(1).correlate(model)
+        for table, time, close in sources
+    ]).subquery('candidates')
+    last_before = select(candidates.c.date, candidates.c.league_points) \
+        .order_by(candidates.c.date.desc()).limit(1).lateral('last_before')
+    earlier = select(model.id, last_before.c.date, last_before.c.league_points) \
+        .select_from(model).join(last_before, true())
+    rows = union_all(recent, earlier).subquery('history')
+    # Whole epoch seconds are much cheaper to fetch and convert than timestamps
+    return select(rows.c.player_id, cast(func.floor(func.extract('epoch', rows.c.date)), BigInteger),
+                  rows.c.league_points)
+
+
+def load_history(engine: DeltaEngine, rows):
+    rows = list(rows)
+    engine.load([row[0] for row in rows], [row[1] for row in rows], [row[2] for row in rows])
+
+
+def write_statement(frame: DeltaFrame, tick: int = -1, model=Player):
+    """
+    One UPDATE of every player's deltas, skipping rows that did not change. The deltas are bound
+    as one array per column and unnested, so the SQL is the same every tick and compiles once.
+    """
+    changes = func.unnest(
+        bindparam('player_ids', frame.player_ids.tolist(), type_=ARRAY(Integer)),
+        *[bindparam(field, frame.column(field, tick), type_=ARRAY(DECIMAL)) for field in DELTA_WINDOWS]
+    ).table_valued('id', *DELTA_WINDOWS).render_derived('delta_changes')
+    return update(model).where(model.id == changes.c.id).where(or_(*[
+        getattr(model, field).is_distinct_from(changes.c[field]) for field in DELTA_WINDOWS
+    ])).values({field: changes.c[field] for field in DELTA_WINDOWS})
+
+
+def backfill_deltas(db: Session, start: datetime, end: datetime, model=Player, data_model=PlayerData,
+                    chunk: int = BACKFILL_CHUNK) -> Iterator[DeltaFrame]:
+    """
+    Recompute deltas at every snapshot tick in [start, end], e.g. after history in or before
+    that range was backfilled, yielding them BACKFILL_CHUNK ticks at a time. players only keeps
+    the current deltas, so when the range reaches the newest tick they are written once every
+    frame has been consumed.
+    """
+    engine = DeltaEngine()
+    load_history(engine, db.execute(history_statement(start, end, model, data_model)))
+    times = engine.times[engine.times >= int(start.timestamp())]
+    ticks = [datetime.fromtimestamp(seconds, timezone.utc) for seconds in times.tolist()]
+    newest = db.execute(select(func.max(data_model.date))).scalar()
+
+    frame = None
+    for offset in range(0, len(ticks), chunk):
+        frame = engine.compute(ticks[offset:offset + chunk])
+        yield frame
+
+    if frame is not None and len(frame.player_ids) and int(newest.timestamp()) == times[-1]:
+        updated = db.execute(write_statement(frame, model=model)).rowcount
+        db.commit()
+        logger.info(f"Backfilled deltas for {len(ticks)} ticks, {updated} players updated as of {newest}")
+
+
+if __name__ == "__main__":
+    import argparse
+    from app.db.database import get_database_session
+
+    parser = argparse.ArgumentParser(description='Recompute player deltas over a range of snapshots')
+    parser.add_argument('--start', type=datetime.fromisoformat, required=True)
+    parser.add_argument('--end', type=datetime.fromisoformat, default=datetime.now(timezone.utc))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    with get_database_session() as session:
+        ticks = sum(len(frame.ticks) for frame in backfill_deltas(session, args.start, args.end))
+        print(f"Recomputed deltas at {ticks} ticks")
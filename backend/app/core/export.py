@@ -0,0 +1,128 @@
+from decimal import Decimal
+from typing import AsyncIterator, List, Optional, Tuple
+import csv
+import io
+import json
+import logging
+import os
+
+from fastapi import HTTPException
+from sqlalchemy import select, DateTime
+from sqlalchemy.orm import Session
+
+from app.db.database import async_engine, async_replica_engine, replica_monitor
+from app.models.db_models import League, Player, PortfolioHistory, Transaction, User, UserLeagues
+from app.models.models import UserIdentity
+
+logger = logging.getLogger(__name__)
+
+# Rows fetched from the server-side cursor, and formatted into one response chunk, at a time
+EXPORT_BATCH = int(os.getenv('EXPORT_BATCH', '1000'))
+
+MEDIA_TYPES = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+
+def export_scope(db: Session, user: UserIdentity, league_id: Optional[int], members: bool) -> Tuple[int, Optional[int]]:
+    """
+    Check what the user may export and return (league id, user id to restrict to). Everyone can
+    export their own rows in a league they belong to; the league's creator can export every
+    member's, in which case no user id is returned.
+    """
+    league_id = league_id or user.current_league_id
+    league = db.get(League, league_id) if league_id else None
+    if league is None:
+        raise HTTPException(status_code=404, detail='League not found')
+
+    if members:
+        if league.created_by != user.id:
+            raise HTTPException(status_code=403, detail='Only the league creator can export every member')
+        return league.id, None
+
+    is_member = db.query(UserLeagues.id).filter(
+        UserLeagues.user_id == user.id,
+        UserLeagues.league_id == league.id
+    ).first()
+    if not is_member:
+        raise HTTPException(status_code=404, detail='User not associated with this league')
+    return league.id, user.id
+
+
+def transactions_export(league_id: int, user_id: Optional[int]):
+    statement = (
+        select(User.username, Transaction.transaction_date, Transaction.type, Player.game_name, Player.tag_line,
+               Transaction.shares, Transaction.price)
+        .select_from(UserLeagues)
+        .join(User, User.id == UserLeagues.user_id)
+        .join(Transaction, Transaction.portfolio_id == UserLeagues.portfolio_id)
+        .join(Player, Player.id == Transaction.player_id)
+        .where(UserLeagues.league_id == league_id)
+        .order_by(UserLeagues.id, Transaction.transaction_date, Transaction.id)
+    )
+    if user_id is not None:
+        statement = statement.where(UserLeagues.user_id == user_id)
+    return statement
+
+
+def portfolio_history_export(league_id: int, user_id: Optional[int]):
+    statement = (
+        select(User.username, PortfolioHistory.date, PortfolioHistory.value)
+        .select_from(UserLeagues)
+        .join(User, User.id == UserLeagues.user_id)
+        .join(PortfolioHistory, PortfolioHistory.portfolio_id == UserLeagues.portfolio_id)
+        .where(UserLeagues.league_id == league_id)
+        .order_by(UserLeagues.id, PortfolioHistory.date, PortfolioHistory.id)
+    )
+    if user_id is not None:
+        statement = statement.where(UserLeagues.user_id == user_id)
+    return statement
+
+
+def row_converter(statement):
+    """Row -> list with datetimes as ISO 8601; only the datetime columns are touched."""
+    dates = [index for index, column in enumerate(statement.selected_columns) if isinstance(column.type, DateTime)]
+
+    def convert(row):
+        row = list(row)
+        for index in dates:
+            if row[index] is not None:
+                row[index] = row[index].isoformat()
+        return row
+    return convert
+
+
+def format_csv(rows) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+
+def format_ndjson(columns: List[str], rows) -> str:
+    return ''.join(
+        json.dumps(dict(zip(columns, row)), default=lambda value: float(value) if isinstance(value, Decimal) else str(value)) + '\n'
+        for row in rows
+    )
+
+
+async def stream_export(statement, fmt: str) -> AsyncIterator[str]:
+    """
+    Stream the rows of statement as CSV or NDJSON, EXPORT_BATCH rows at a time, from a server-side
+    cursor, so memory stays flat whatever the row count.
+
+    The connection is checked out when the first chunk is requested rather than by the request,
+    and is released as soon as the last row is read. A client that disconnects cancels the stream,
+    and the pool discards the connection rather than keeping it checked out. Exports
+    are read-only and do not need the newest rows, so they use the replica while it is healthy.
+    """
+    engine = async_replica_engine if replica_monitor.healthy() else async_engine
+    columns = [column.name for column in statement.selected_columns]
+    convert = row_converter(statement)
+    exported = 0
+    async with engine.connect() as connection:
+        result = await connection.stream(statement.execution_options(yield_per=EXPORT_BATCH))
+        if fmt == 'csv':
+            yield format_csv([columns])
+        async for rows in result.partitions():
+            exported += len(rows)
+            rows = [convert(row) for row in rows]
+            yield format_csv(rows) if fmt == 'csv' else format_ndjson(columns, rows)
+    logger.info(f"Exported {exported} rows as {fmt}")
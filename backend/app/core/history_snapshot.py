@@ -0,0 +1,131 @@
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+import fcntl
+import logging
+import mmap
+import os
+import struct
+import tempfile
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# File every worker on a host maps the history store from; empty to always build it from the database
+HISTORY_SNAPSHOT_PATH = os.getenv('HISTORY_SNAPSHOT_PATH',
+                                  os.path.join(tempfile.gettempdir(), 'tft_stocks_history.snapshot'))
+HISTORY_SNAPSHOT_SECONDS = float(os.getenv('HISTORY_SNAPSHOT_SECONDS', '3600'))
+
+MAGIC = b'TFTHIST\0'
+# Bumped whenever the layout changes; files of any other format are ignored and rewritten
+FORMAT_VERSION = 1
+# Magic, format version, padding, tick held (epoch microseconds), player count, row count
+HEADER = struct.Struct('<8sI4xqqq')
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+@dataclass
+class Snapshot:
+    """
+    Every player's history as of one tick, read-only views of a mapped file: player i's rows are
+    offsets[i]:offsets[i + 1] of times (epoch seconds) and of each row of ohlc.
+    """
+    version: datetime
+    player_ids: np.ndarray
+    offsets: np.ndarray
+    times: np.ndarray
+    ohlc: np.ndarray
+
+
+def layout(players: int, rows: int):
+    # (dtype, shape, byte offset) of each section, in file order; every one starts 8-byte aligned
+    sections = [(np.int64, (players,)), (np.int64, (players + 1,)), (np.float64, (rows,)), (np.int32, (4, rows))]
+    offset = HEADER.size
+    for dtype, shape in sections:
+        yield dtype, shape, offset
+        offset += np.dtype(dtype).itemsize * int(np.prod(shape))
+
+
+def write_snapshot(path: str, version: datetime, player_ids: np.ndarray, offsets: np.ndarray, times: np.ndarray,
+                   ohlc: np.ndarray):
+    """
+    Write a snapshot next to path and move it into place, so readers only ever see a complete file.
+    Workers that mapped the previous file keep reading it until they map the new one.
+    """
+    directory = os.path.dirname(path) or '.'
+    with tempfile.NamedTemporaryFile(dir=directory, prefix='.history-', delete=False) as file:
+        try:
+            file.write(HEADER.pack(MAGIC, FORMAT_VERSION, (version - EPOCH) // timedelta(microseconds=1),
+                                   len(player_ids), len(times)))
+            for array, (dtype, shape, _) in zip((player_ids, offsets, times, ohlc), layout(len(player_ids), len(times))):
+                file.write(np.ascontiguousarray(array, dtype=dtype).reshape(shape).tobytes())
+            file.flush()
+            os.fsync(file.fileno())
+        except BaseException:
+            os.unlink(file.name)
+            raise
+    os.replace(file.name, path)
+
+
+def read_header(file) -> Optional[tuple]:
+    header = file.read(HEADER.size)
+    if len(header) < HEADER.size:
+        return None
+    magic, format_version, version, players, rows = HEADER.unpack(header)
+    if magic != MAGIC or format_version != FORMAT_VERSION:
+        return None
+    return EPOCH + timedelta(microseconds=version), players, rows
+
+
+def snapshot_version(path: str) -> Optional[datetime]:
+    """Tick held by the snapshot at path, without mapping it; None when there is no usable one."""
+    try:
+        with open(path, 'rb') as file:
+            header = read_header(file)
+    except FileNotFoundError:
+        return None
+    return header[0] if header else None
+
+
+def read_snapshot(path: str) -> Optional[Snapshot]:
+    """
+    Map the snapshot at path. Its pages are shared with every other process mapping the same file,
+    and are only read in when touched. None when there is no file or it is not a complete one of
+    this format.
+    """
+    try:
+        with open(path, 'rb') as file:
+            header = read_header(file)
+            if header is None:
+                logger.warning(f"Ignoring history snapshot {path} of another format")
+                return None
+            version, players, rows = header
+            sections = list(layout(players, rows))
+            dtype, shape, offset = sections[-1]
+            if os.fstat(file.fileno()).st_size != offset + np.dtype(dtype).itemsize * int(np.prod(shape)):
+                logger.warning(f"Ignoring truncated history snapshot {path}")
+                return None
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except FileNotFoundError:
+        return None
+
+    arrays = [np.frombuffer(mapped, dtype=dtype, count=int(np.prod(shape)), offset=offset).reshape(shape)
+              for dtype, shape, offset in sections]
+    return Snapshot(version, *arrays)
+
+
+@contextmanager
+def snapshot_lock(path: str, blocking: bool = True):
+    """Exclusive lock on writing the snapshot at path, across processes; yields whether it was taken."""
+    with open(f'{path}.lock', 'a') as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
@@ -0,0 +1,415 @@
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+import logging
+import threading
+
+import numpy as np
+from sqlalchemy import select, func, cast, BigInteger
+from sqlalchemy.orm import Session
+
+from app.core.history_snapshot import HISTORY_SNAPSHOT_PATH, HISTORY_SNAPSHOT_SECONDS, Snapshot, read_snapshot, \
+    snapshot_lock, snapshot_version, write_snapshot
+from app.core.price_history import LpHistory, bucket_ohlc, tier_sources, OHLC
+from app.core.retention import RAW_RETENTION, HOURLY_RETENTION, truncate
+from app.core.ticks import on_tick, is_current
+from app.models.db_models import Player, PlayerData, PlayerLatest
+
+logger = logging.getLogger(__name__)
+
+# Rows a player's buffer of new snapshots starts with; it doubles whenever it fills up
+INITIAL_CAPACITY = 16
+HOUR_SECONDS = 3600
+DAY_SECONDS = 86400
+
+
+def as_seconds(when: Optional[datetime]) -> Optional[float]:
+    # Epoch seconds, computed exactly as load_lp_history does; naive times are taken as UTC
+    if when is None:
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return when.timestamp()
+
+
+def roll_up_history(history: LpHistory, raw_cutoff: float, hourly_cutoff: float) -> LpHistory:
+    """
+    Roll rows before raw_cutoff into hourly buckets and rows before hourly_cutoff into daily
+    ones, as apply_retention does in the database. Buckets already rolled up stay as they are,
+    so history that already is comes back unchanged.
+    """
+    times, columns = history.times, history[1:]
+    hourly_end = np.searchsorted(times, raw_cutoff, side='left')
+    daily_end = np.searchsorted(times, hourly_cutoff, side='left')
+    if not hourly_end:
+        return history
+
+    parts = []
+    if daily_end:
+        parts.append(bucket_ohlc(LpHistory(times[:daily_end], *[column[:daily_end] for column in columns]),
+                                 DAY_SECONDS))
+    parts.append(bucket_ohlc(LpHistory(times[daily_end:hourly_end],
+                                       *[column[daily_end:hourly_end] for column in columns]), HOUR_SECONDS))
+    if sum(len(part['time']) for part in parts) == hourly_end:
+        # Every row is a bucket of its own already
+        return history
+    return LpHistory(np.concatenate([part['time'] for part in parts] + [times[hourly_end:]]), *[
+        np.concatenate([part[field] for part in parts] + [column[hourly_end:]]).astype(np.int32)
+        for field, column in zip(OHLC, columns)
+    ])
+
+
+class PlayerHistory:
+    """
+    One player's details and LP history across every retention tier: a base of contiguous arrays,
+    epoch seconds in base_times and open/high/low/close in the rows of base_ohlc (all four equal
+    for raw snapshots), then the snapshots appended since in buffers of the same layout, of which
+    only the first `length` entries are in use. The base may be a view of a mapped snapshot file,
+    and is never written to.
+    """
+
+    __slots__ = ('id', 'game_name', 'tag_line', 'delta_8h', 'delta_24h', 'delta_72h', 'delist_date',
+                 'latest_date', 'base_times', 'base_ohlc', 'times', 'ohlc', 'length')
+
+    def __init__(self, base_times: np.ndarray, base_ohlc: np.ndarray):
+        self.base_times = base_times
+        self.base_ohlc = base_ohlc
+        self.times = np.empty(0, dtype=np.float64)
+        self.ohlc = np.empty((4, 0), dtype=np.int32)
+        self.length = 0
+
+    def newest(self) -> Optional[float]:
+        if self.length:
+            return self.times[self.length - 1]
+        return self.base_times[-1] if len(self.base_times) else None
+
+    def append(self, seconds: float, league_points: int):
+        """Add a snapshot newer than every row held."""
+        if self.length == len(self.times):
+            capacity = max(2 * self.length, INITIAL_CAPACITY)
+            times = np.empty(capacity, dtype=np.float64)
+            ohlc = np.empty((4, capacity), dtype=np.int32)
+            times[:self.length] = self.times[:self.length]
+            ohlc[:, :self.length] = self.ohlc[:, :self.length]
+            self.times, self.ohlc = times, ohlc
+        self.times[self.length] = seconds
+        self.ohlc[:, self.length] = league_points
+        self.length += 1
+
+    def rows(self, start: Optional[float] = None, end: Optional[float] = None) -> LpHistory:
+        """Rows held with start <= time <= end, by binary search in the base and the appended snapshots."""
+        parts = []
+        for times, ohlc in ((self.base_times, self.base_ohlc), (self.times[:self.length], self.ohlc[:, :self.length])):
+            first = 0 if start is None else np.searchsorted(times, start, side='left')
+            last = len(times) if end is None else np.searchsorted(times, end, side='right')
+            parts.append((times[first:last], ohlc[:, first:last]))
+        if not len(parts[1][0]):
+            return LpHistory(parts[0][0], *parts[0][1])
+        return LpHistory(np.concatenate([part[0] for part in parts]), *np.hstack([part[1] for part in parts]))
+
+    def window(self, start: Optional[float], end: Optional[float], raw_cutoff: float, hourly_cutoff: float) \
+            -> LpHistory:
+        """
+        History with start <= time <= end as the database serves it once retention has run for
+        the cutoffs. Whole days around the range are rolled up, so every bucket is complete.
+        """
+        history = roll_up_history(self.rows(
+            None if start is None else start // DAY_SECONDS * DAY_SECONDS,
+            None if end is None else (end // DAY_SECONDS + 1) * DAY_SECONDS
+        ), raw_cutoff, hourly_cutoff)
+        first = 0 if start is None else np.searchsorted(history.times, start, side='left')
+        last = len(history.times) if end is None else np.searchsorted(history.times, end, side='right')
+        return LpHistory(*[column[first:last] for column in history])
+
+    def rebase(self, raw_cutoff: float, hourly_cutoff: float):
+        """Fold the appended snapshots into a private, rolled up base."""
+        history = roll_up_history(self.rows(), raw_cutoff, hourly_cutoff)
+        self.base_times, self.base_ohlc = history.times, np.vstack(history[1:])
+        self.times, self.ohlc, self.length = self.times[:0], self.ohlc[:, :0], 0
+
+
+def history_statements(since: Optional[datetime] = None, until: Optional[datetime] = None):
+    """
+    One statement per retention tier of player_data, giving (player id, epoch microseconds, LP)
+    for raw snapshots and (player id, epoch microseconds, open, high, low, close) for rollups.
+    With since, only the raw snapshots in (since, until].
+    """
+    sources = tier_sources(PlayerData)
+    if since is not None:
+        sources = sources[-1:]
+    statements = []
+    for table, (time, *ohlc) in sources:
+        # Whole microseconds fetch much faster than timestamps or floats, and convert exactly
+        values = ohlc[:1] if table is PlayerData else ohlc
+        statement = select(table.player_id, cast(func.extract('epoch', time) * 1_000_000, BigInteger), *values) \
+            .where(table.player_id.is_not(None))
+        if since is not None:
+            statement = statement.where(time > since, time <= until)
+        statements.append(statement)
+    return statements
+
+
+def fetch_columns(db: Session, statement) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Player ids, epoch seconds and a (4 x rows) OHLC array of a history_statements statement's rows."""
+    rows = [tuple(row) for row in db.execute(statement)]
+    columns = np.array(rows, dtype=np.int64).reshape(-1, len(statement.selected_columns)).T
+    # A raw snapshot's one LP is its open, high, low and close
+    ohlc = np.broadcast_to(columns[2:], (4, len(rows)))
+    return columns[0], columns[1] / 1e6, ohlc.astype(np.int32)
+
+
+def players_statement():
+    return select(Player.id, Player.game_name, Player.tag_line, Player.delta_8h, Player.delta_24h, Player.delta_72h,
+                  Player.delist_date, PlayerLatest.date).outerjoin(PlayerLatest, PlayerLatest.player_id == Player.id)
+
+
+class HistoryStore:
+    """
+    Every player's details and full price history, held in process for one price tick so the
+    player page is answered without the database. Built from the database or mapped from a
+    snapshot file, then each tick appends its snapshots and refreshes the players' details.
+    History past the raw retention window is rolled up as it is read, the way retention rolls
+    it up in the database, so a mapped base is never copied.
+
+    A lock guards the buffers, which the tick watcher thread appends to while requests read them.
+    """
+
+    def __init__(self, version: datetime, snapshot: Optional[datetime] = None):
+        self.version = version
+        # Tick of the snapshot file the bases are mapped from; None when they were built from the database
+        self.snapshot = snapshot
+        self.players: Dict[int, PlayerHistory] = {}
+        self.by_name: Dict[Tuple[str, str], PlayerHistory] = {}
+        self.lock = threading.Lock()
+        self.raw_cutoff: Optional[float] = None
+        self.hourly_cutoff: Optional[float] = None
+
+    @classmethod
+    def build(cls, db: Session, version: datetime) -> 'HistoryStore':
+        store = cls(version)
+        parts = [fetch_columns(db, statement) for statement in history_statements()]
+        player_ids = np.concatenate([part[0] for part in parts])
+        times = np.concatenate([part[1] for part in parts])
+        ohlc = np.hstack([part[2] for part in parts])
+        # Sorted by player, then time; each player's rows are one contiguous run
+        order = np.lexsort((times, player_ids))
+        player_ids, times, ohlc = player_ids[order], times[order], ohlc[:, order]
+        starts = np.flatnonzero(np.r_[True, player_ids[1:] != player_ids[:-1]]) if len(player_ids) else []
+        ends = np.r_[starts[1:], len(player_ids)] if len(player_ids) else []
+        for start, end in zip(starts, ends):
+            store.players[int(player_ids[start])] = PlayerHistory(times[start:end], ohlc[:, start:end].copy())
+
+        store.refresh_players(db.execute(players_statement()).all())
+        store.compact(version)
+        return store
+
+    @classmethod
+    def from_snapshot(cls, db: Session, snapshot: Snapshot, tick: datetime) -> 'HistoryStore':
+        """A store on a mapped snapshot, with the snapshots taken after it, up to tick, replayed from player_data."""
+        store = cls(snapshot.version, snapshot.version)
+        offsets = snapshot.offsets.tolist()
+        for index, player_id in enumerate(snapshot.player_ids.tolist()):
+            start, end = offsets[index], offsets[index + 1]
+            store.players[player_id] = PlayerHistory(snapshot.times[start:end], snapshot.ohlc[:, start:end])
+
+        store.refresh_players(db.execute(players_statement()).all())
+        store.compact(snapshot.version)
+        if tick > snapshot.version:
+            store.update(db, tick)
+        return store
+
+    def save(self, path: str):
+        """Write every player's history, rolled up as of the store's tick, as the snapshot file at path."""
+        with self.lock:
+            player_ids = sorted(self.players)
+            histories = [self.players[player_id].window(None, None, self.raw_cutoff, self.hourly_cutoff)
+                         for player_id in player_ids]
+            version = self.version
+        offsets = np.cumsum([0] + [len(history.times) for history in histories])
+        times = np.concatenate([history.times for history in histories] + [np.empty(0)])
+        ohlc = np.hstack([np.vstack(history[1:]) for history in histories] + [np.empty((4, 0), dtype=np.int32)])
+        write_snapshot(path, version, np.array(player_ids, dtype=np.int64), offsets, times, ohlc)
+
+    def refresh_players(self, rows):
+        by_name = {}
+        for row in rows:
+            player = self.players.get(row.id)
+            if player is None:
+                player = self.players[row.id] = PlayerHistory(np.empty(0), np.empty((4, 0), dtype=np.int32))
+            player.id, player.game_name, player.tag_line = row.id, row.game_name, row.tag_line
+            player.delta_8h, player.delta_24h, player.delta_72h = row.delta_8h, row.delta_24h, row.delta_72h
+            player.delist_date, player.latest_date = row.delist_date, row.date
+            by_name[row.game_name, row.tag_line] = player
+        self.by_name = by_name
+
+    def update(self, db: Session, tick: datetime):
+        """Append the snapshots taken since the last tick held, up to tick, and refresh every player."""
+        player_ids, times, ohlc = fetch_columns(db, history_statements(self.version, tick)[0])
+        order = np.argsort(times, kind='stable')
+        players = db.execute(players_statement()).all()
+        with self.lock:
+            self.refresh_players(players)
+            for player_id, seconds, league_points in zip(player_ids[order].tolist(), times[order].tolist(),
+                                                         ohlc[3, order].tolist()):
+                player = self.players.get(player_id)
+                if player is not None:
+                    newest = player.newest()
+                    if newest is None or seconds > newest:
+                        player.append(seconds, league_points)
+            self.version = tick
+            self.compact(tick)
+
+    def compact(self, now: datetime):
+        """
+        Move the retention cutoffs to now's. Reads roll up whatever crosses them; appended
+        snapshots are only folded into the base once they cross them too, which takes no newer
+        snapshot file being mapped for a whole raw retention window.
+        """
+        self.raw_cutoff = truncate(now - RAW_RETENTION, timedelta(hours=1)).timestamp()
+        self.hourly_cutoff = truncate(now - HOURLY_RETENTION, timedelta(days=1)).timestamp()
+        for player in self.players.values():
+            if player.length and player.times[0] < self.raw_cutoff:
+                player.rebase(self.raw_cutoff, self.hourly_cutoff)
+
+    def find(self, game_name: str, tag_line: str, start: datetime = None, end: datetime = None) \
+            -> Optional[Tuple[PlayerHistory, LpHistory]]:
+        """A player and their history in [start, end], or None when no such player exists."""
+        with self.lock:
+            player = self.by_name.get((game_name, tag_line))
+            if player is None:
+                return None
+            return player, player.window(as_seconds(start), as_seconds(end), self.raw_cutoff, self.hourly_cutoff)
+
+    def nbytes(self) -> Tuple[int, int]:
+        """Bytes of history held privately, and bytes mapped from a snapshot file."""
+        private = mapped = 0
+        for player in self.players.values():
+            base = player.base_times.nbytes + player.base_ohlc.nbytes
+            if player.base_times.flags.writeable:
+                private += base
+            else:
+                mapped += base
+            private += player.times.nbytes + player.ohlc.nbytes
+        return private, mapped
+
+
+def open_history_store(db: Session, tick: datetime, path: str = HISTORY_SNAPSHOT_PATH) -> Optional[HistoryStore]:
+    """
+    A store on the snapshot file at path, or None when there is none, or it is so old that the
+    database has rolled up snapshots it would have to replay.
+    """
+    snapshot = read_snapshot(path)
+    if snapshot is None or snapshot.version < truncate(tick - RAW_RETENTION, timedelta(hours=1)):
+        return None
+    return HistoryStore.from_snapshot(db, snapshot, tick)
+
+
+def load_history_store(db: Session, tick: datetime, path: str = HISTORY_SNAPSHOT_PATH) -> HistoryStore:
+    """
+    Map the snapshot file and replay the ticks since it. Without a usable one, build the store
+    from the database and write it, under the snapshot lock so that of the workers starting
+    together one builds it and the rest wait and map the same file.
+    """
+    if not path:
+        return HistoryStore.build(db, tick)
+    store = open_history_store(db, tick, path)
+    if store is not None:
+        return store
+
+    with snapshot_lock(path):
+        # Written by another worker while this one waited for the lock
+        store = open_history_store(db, tick, path)
+        if store is not None:
+            return store
+        store = HistoryStore.build(db, tick)
+        try:
+            store.save(path)
+        except OSError as e:
+            logger.error(f"Could not write the history snapshot {path}: {e}")
+            return store
+    # Map the file just written, so this worker shares its pages too
+    return open_history_store(db, tick, path) or store
+
+
+def snapshot_replaced(store: HistoryStore, path: str = HISTORY_SNAPSHOT_PATH) -> bool:
+    """Whether the snapshot file holds a newer tick than the one store was mapped or built from."""
+    written = snapshot_version(path) if path else None
+    return written is not None and written > (store.snapshot or store.version)
+
+
+_store: Optional[HistoryStore] = None
+
+
+@on_tick
+def refresh_history_store(db: Session, tick: datetime):
+    global _store
+    if _store is None or snapshot_replaced(_store):
+        # Requests keep reading the previous store until this one replaces it
+        _store = load_history_store(db, tick)
+        private, mapped = _store.nbytes()
+        logger.info(f"History store loaded for tick {tick}: {len(_store.players)} players, "
+                    f"{private / 2 ** 20:.1f} MB private, {mapped / 2 ** 20:.1f} MB mapped")
+    else:
+        _store.update(db, tick)
+
+
+def current_history_store() -> Optional[HistoryStore]:
+    """The store for the newest tick, or None when it is missing or stale and SQL must be used."""
+    store = _store
+    if store is None or not is_current(store.version):
+        return None
+    return store
+
+
+class SnapshotWriter:
+    """
+    Background thread that writes this worker's store to the snapshot file every interval
+    seconds, unless another worker on the host holds the lock or wrote one within the interval.
+    Every worker maps the new file at its next tick, dropping the snapshots it appended since.
+    """
+
+    def __init__(self, path: str = HISTORY_SNAPSHOT_PATH, interval: float = HISTORY_SNAPSHOT_SECONDS):
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run(self) -> bool:
+        store = current_history_store()
+        if store is None or not self.path:
+            return False
+        with snapshot_lock(self.path, blocking=False) as locked:
+            if not locked:
+                return False
+            written = snapshot_version(self.path)
+            if written is not None and (store.version - written).total_seconds() < self.interval:
+                return False
+            store.save(self.path)
+        logger.info(f"History snapshot written for tick {store.version}")
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run()
+            except Exception as e:
+                logger.error(f"History snapshot failed: {e}")
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='history-snapshot', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.interval)
+
+
+if __name__ == "__main__":
+    from app.core.ticks import latest_tick
+    from app.db.database import get_database_session
+
+    logging.basicConfig(level=logging.INFO)
+    # Rebuilt from the database, e.g. after history was backfilled, since workers write it from memory
+    with get_database_session() as session, snapshot_lock(HISTORY_SNAPSHOT_PATH):
+        HistoryStore.build(session, latest_tick(session)).save(HISTORY_SNAPSHOT_PATH)
+        print(f"History snapshot written to {HISTORY_SNAPSHOT_PATH}")
@@ -0,0 +1,111 @@
+from datetime import datetime, timezone
+from typing import Optional
+import logging
+import os
+import threading
+
+from sqlalchemy import select, delete, update, func, exists, and_
+from sqlalchemy.orm import Session
+
+from app.models.db_models import PortfolioPlayer, PortfolioHold, UserLeagues
+
+logger = logging.getLogger(__name__)
+
+# How often expired holds are swept, and how many portfolios one sweep statement covers
+HOLD_SWEEP_SECONDS = float(os.getenv('HOLD_SWEEP_SECONDS', '60'))
+HOLD_SWEEP_BATCH = int(os.getenv('HOLD_SWEEP_BATCH', '500'))
+
+
+def active_holds(now: datetime):
+    """Filter for holds that still lock their shares."""
+    return PortfolioHold.hold_deadline > now
+
+
+def expired_hold_shares(now: datetime):
+    """
+    Shares of a holding's holds that have expired but not been swept yet, correlated to
+    PortfolioPlayer. Subtracted from locked_shares it gives the shares still on hold.
+    """
+    return select(func.coalesce(func.sum(PortfolioHold.shares), 0)).where(and_(
+        PortfolioHold.portfolio_id == PortfolioPlayer.portfolio_id,
+        PortfolioHold.player_id == PortfolioPlayer.player_id,
+        PortfolioHold.hold_deadline <= now
+    )).scalar_subquery()
+
+
+def sweep_statement(now: datetime, batch_size: int):
+    """
+    Delete the expired holds of up to batch_size portfolios and release their shares from
+    PortfolioPlayer.locked_shares, in one statement.
+
+    The portfolios' user_leagues rows are locked first with SKIP LOCKED, the same row a trade
+    locks before touching holdings, so a portfolio that is trading right now is left for the
+    next sweep instead of waiting on it or deadlocking with it.
+    """
+    swept = select(UserLeagues.portfolio_id).where(exists().where(and_(
+        PortfolioHold.portfolio_id == UserLeagues.portfolio_id,
+        PortfolioHold.hold_deadline <= now
+    ))).limit(batch_size).with_for_update(skip_locked=True).cte('swept_portfolios')
+
+    expired = delete(PortfolioHold).where(and_(
+        PortfolioHold.portfolio_id.in_(select(swept.c.portfolio_id)),
+        PortfolioHold.hold_deadline <= now
+    )).returning(PortfolioHold.portfolio_id, PortfolioHold.player_id, PortfolioHold.shares).cte('expired_holds')
+
+    released = select(expired.c.portfolio_id, expired.c.player_id, func.sum(expired.c.shares).label('shares')) \
+        .group_by(expired.c.portfolio_id, expired.c.player_id).subquery('released')
+    release = update(PortfolioPlayer).where(and_(
+        PortfolioPlayer.portfolio_id == released.c.portfolio_id,
+        PortfolioPlayer.player_id == released.c.player_id
+    )).values(locked_shares=PortfolioPlayer.locked_shares - released.c.shares).cte('released_holdings')
+
+    return select(func.count()).select_from(expired).add_cte(release)
+
+
+def sweep_expired_holds(db: Session, now: Optional[datetime] = None, batch_size: int = HOLD_SWEEP_BATCH) -> int:
+    """
+    Delete every expired hold, one committed batch of portfolios at a time, and return how many
+    were deleted. Portfolios locked by a trade are skipped and picked up by the next sweep.
+    """
+    now = now or datetime.now(timezone.utc)
+    total = 0
+    while True:
+        deleted = db.execute(sweep_statement(now, batch_size)).scalar()
+        db.commit()
+        total += deleted
+        if not deleted:
+            return total
+
+
+class HoldSweeper:
+    """Background thread that sweeps expired holds every interval seconds."""
+
+    def __init__(self, session_factory, interval: float = HOLD_SWEEP_SECONDS):
+        self.session_factory = session_factory
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def sweep(self) -> int:
+        with self.session_factory() as db:
+            deleted = sweep_expired_holds(db)
+        if deleted:
+            logger.info(f"Swept {deleted} expired holds")
+        return deleted
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Hold sweep failed: {e}")
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='hold-sweeper', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.interval)
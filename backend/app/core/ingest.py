@@ -0,0 +1,303 @@
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from time import monotonic, perf_counter
+from typing import Dict, List, Optional, Sequence, Tuple
+import asyncio
+import logging
+import os
+
+import httpx
+from sqlalchemy import select, update, and_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.deltas import DeltaEngine, history_statement, load_history, write_statement
+from app.models.db_models import Player
+
+logger = logging.getLogger(__name__)
+
+RIOT_PLATFORM_URL = os.getenv('RIOT_PLATFORM_URL', 'https://na1.api.riotgames.com')
+RIOT_REGIONAL_URL = os.getenv('RIOT_REGIONAL_URL', 'https://americas.api.riotgames.com')
+# Riot limits are "N requests per T seconds" windows that all apply at once, e.g. "20:1,100:120"
+RIOT_RATE_LIMITS = os.getenv('RIOT_RATE_LIMITS', '20:1,100:120')
+RIOT_CONCURRENCY = int(os.getenv('RIOT_CONCURRENCY', '10'))
+RIOT_MAX_RETRIES = int(os.getenv('RIOT_MAX_RETRIES', '3'))
+RIOT_TIMEOUT_SECONDS = float(os.getenv('RIOT_TIMEOUT_SECONDS', '10'))
+
+# Everyone in Grandmaster and above is listed; a player out of it for DELIST_GRACE is delisted
+LADDER_TIERS = ('challenger', 'grandmaster')
+LADDER_QUEUE = 'RANKED_TFT'
+DELIST_GRACE = timedelta(days=3)
+INGEST_INTERVAL_SECONDS = float(os.getenv('INGEST_INTERVAL_SECONDS', '300'))
+
+
+def parse_rate_limits(limits: str) -> List[Tuple[int, float]]:
+    windows = []
+    for window in limits.split(','):
+        count, seconds = window.split(':')
+        windows.append((int(count), float(seconds)))
+    return windows
+
+
+class RateLimiter:
+    """Sliding-window limiter: a request goes out only while every window has room for it."""
+
+    def __init__(self, limits: Sequence[Tuple[int, float]]):
+        self.windows = [(count, seconds, deque()) for count, seconds in limits]
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = monotonic()
+                wait = 0.0
+                for count, seconds, sent in self.windows:
+                    while sent and now - sent[0] >= seconds:
+                        sent.popleft()
+                    if len(sent) >= count:
+                        wait = max(wait, seconds - (now - sent[0]))
+                if wait <= 0:
+                    for _, _, sent in self.windows:
+                        sent.append(now)
+                    return
+                await asyncio.sleep(wait)
+
+
+@dataclass
+class LadderEntry:
+    puuid: str
+    summoner_id: Optional[str]
+    league_points: int
+
+
+class RiotClient:
+    """Riot API calls the ingestion needs, sharing one rate limiter and connection pool."""
+
+    def __init__(self, api_key: str, platform_url: str = RIOT_PLATFORM_URL, regional_url: str = RIOT_REGIONAL_URL,
+                 limiter: Optional[RateLimiter] = None, concurrency: int = RIOT_CONCURRENCY):
+        self.platform_url = platform_url.rstrip('/')
+        self.regional_url = regional_url.rstrip('/')
+        self.limiter = limiter or RateLimiter(parse_rate_limits(RIOT_RATE_LIMITS))
+        self._concurrency = asyncio.Semaphore(concurrency)
+        self._http = httpx.AsyncClient(headers={'X-Riot-Token': api_key}, timeout=RIOT_TIMEOUT_SECONDS,
+                                       limits=httpx.Limits(max_connections=concurrency))
+
+    async def close(self):
+        await self._http.aclose()
+
+    async def get(self, url: str, **params) -> dict:
+        # 429s wait as long as Riot asks, other failures back off; anything left over fails the tick
+        for attempt in range(RIOT_MAX_RETRIES + 1):
+            async with self._concurrency:
+                await self.limiter.acquire()
+                try:
+                    response = await self._http.get(url, params=params)
+                except httpx.TransportError as e:
+                    if attempt == RIOT_MAX_RETRIES:
+                        raise
+                    logger.warning(f"Riot request {url} failed: {e}")
+                    response = None
+            if response is not None and response.status_code not in (429, 500, 502, 503, 504):
+                response.raise_for_status()
+                return response.json()
+            if attempt == RIOT_MAX_RETRIES:
+                response.raise_for_status()
+            retry_after = response.headers.get('Retry-After') if response is not None else None
+            await asyncio.sleep(float(retry_after) if retry_after else 2 ** attempt)
+
+    async def ladder(self) -> List[LadderEntry]:
+        """Every ranked entry of the listed tiers, the tiers fetched concurrently."""
+        tiers = await asyncio.gather(*[
+            self.get(f'{self.platform_url}/tft/league/v1/{tier}', queue=LADDER_QUEUE) for tier in LADDER_TIERS
+        ])
+        entries = {}
+        for tier in tiers:
+            for entry in tier.get('entries', []):
+                if entry.get('puuid'):
+                    entries[entry['puuid']] = LadderEntry(entry['puuid'], entry.get('summonerId'),
+                                                          int(entry['leaguePoints']))
+        return list(entries.values())
+
+    async def account(self, puuid: str) -> dict:
+        return await self.get(f'{self.regional_url}/riot/account/v1/accounts/by-puuid/{puuid}')
+
+
+class PlayerIdCache:
+    """
+    puuid -> players.id for every known player. Ids never change, so the map is loaded once and
+    then only asked about puuids it has not seen.
+    """
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.loaded = False
+
+    async def resolve(self, connection, puuids: Sequence[str]) -> List[str]:
+        """Fill in the given puuids from the database and return those with no player yet."""
+        if not self.loaded:
+            rows = await connection.execute(select(Player.puuid, Player.id).where(Player.puuid.is_not(None)))
+            self.ids.update(rows.all())
+            self.loaded = True
+
+        missing = [puuid for puuid in puuids if puuid not in self.ids]
+        if missing:
+            # Another process may have added them since the map was loaded
+            rows = await connection.execute(select(Player.puuid, Player.id).where(Player.puuid.in_(missing)))
+            self.ids.update(rows.all())
+        return [puuid for puuid in missing if puuid not in self.ids]
+
+
+@dataclass
+class TickResult:
+    tick: datetime
+    players: int = 0
+    new_players: int = 0
+    delisted: int = 0
+    relisted: int = 0
+    deltas_updated: int = 0
+    fetch_seconds: float = 0.0
+    db_seconds: float = 0.0
+    skipped: List[str] = field(default_factory=list)
+
+
+async def ingest_tick(client: RiotClient, engine: AsyncEngine, cache: PlayerIdCache,
+                      tick: Optional[datetime] = None, deltas: Optional[DeltaEngine] = None) -> TickResult:
+    """
+    Fetch the ladder once and store it as one snapshot stamped tick.
+
+    Ladder tiers, and the account names of players seen for the first time, are fetched
+    concurrently under the rate limit with no database connection held. The snapshot is then
+    written in one transaction: new players in one multi-row INSERT, every LP reading in one
+    COPY into player_data (its trigger refreshes player_latest in the same statement), the
+    delist dates in two set-based UPDATEs and, given a delta engine, every player's deltas in
+    one more, so readers never see a tick without its deltas.
+    """
+    result = TickResult(tick=tick or datetime.now(timezone.utc))
+
+    start = perf_counter()
+    entries = await client.ladder()
+    result.fetch_seconds += perf_counter() - start
+
+    start = perf_counter()
+    async with engine.connect() as connection:
+        unknown = await cache.resolve(connection, [entry.puuid for entry in entries])
+    result.db_seconds += perf_counter() - start
+
+    start = perf_counter()
+    accounts = await asyncio.gather(*[client.account(puuid) for puuid in unknown], return_exceptions=True)
+    result.fetch_seconds += perf_counter() - start
+
+    by_puuid = {entry.puuid: entry for entry in entries}
+    new_players = []
+    for puuid, account in zip(unknown, accounts):
+        if isinstance(account, Exception):
+            # Picked up again next tick; the rest of the ladder is not held back by one lookup
+            logger.warning(f"Account lookup failed for {puuid}: {account}")
+            result.skipped.append(puuid)
+            continue
+        new_players.append({
+            'puuid': puuid,
+            'summoner_id': by_puuid[puuid].summoner_id,
+            'game_name': account['gameName'],
+            'game_name_lower': account['gameName'].lower(),
+            'tag_line': account['tagLine'],
+        })
+
+    start = perf_counter()
+    try:
+        await write_tick(engine, cache, entries, new_players, result, deltas)
+    except Exception:
+        if deltas is not None:
+            # The history may already hold rows that were rolled back; reload it next tick
+            deltas.reset()
+        raise
+    result.db_seconds += perf_counter() - start
+
+    logger.info(f"Ingested {result.players} players at {result.tick.isoformat()} ({result.new_players} new, "
+                f"{result.delisted} leaving, {result.relisted} back, {result.deltas_updated} deltas changed), "
+                f"fetch {result.fetch_seconds:.2f}s, db {result.db_seconds:.3f}s")
+    return result
+
+
+async def write_tick(engine: AsyncEngine, cache: PlayerIdCache, entries: List[LadderEntry], new_players: List[dict],
+                     result: TickResult, deltas: Optional[DeltaEngine]):
+    async with engine.begin() as connection:
+        if new_players:
+            statement = insert(Player).values(new_players)
+            statement = statement.on_conflict_do_update(
+                index_elements=[Player.puuid],
+                set_={'game_name': statement.excluded.game_name, 'game_name_lower': statement.excluded.game_name_lower,
+                      'tag_line': statement.excluded.tag_line}
+            ).returning(Player.puuid, Player.id)
+            cache.ids.update((await connection.execute(statement)).all())
+            result.new_players = len(new_players)
+
+        records = [(cache.ids[entry.puuid], result.tick, entry.league_points)
+                   for entry in entries if entry.puuid in cache.ids]
+        raw = await connection.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(
+            'player_data', records=records, columns=['player_id', 'date', 'league_points'])
+        result.players = len(records)
+
+        listed = [player_id for player_id, _, _ in records]
+        delisted = await connection.execute(
+            update(Player)
+            .where(and_(Player.delist_date.is_(None), Player.id.not_in(listed)))
+            .values(delist_date=result.tick + DELIST_GRACE)
+        )
+        relisted = await connection.execute(
+            update(Player)
+            .where(and_(Player.delist_date > result.tick, Player.id.in_(listed)))
+            .values(delist_date=None)
+        )
+        result.delisted, result.relisted = delisted.rowcount, relisted.rowcount
+
+        if deltas is not None:
+            if not deltas.loaded:
+                # The COPY above is visible to this transaction, so the load includes this tick
+                load_history(deltas, await connection.execute(history_statement(result.tick, result.tick)))
+            else:
+                deltas.append(result.tick, listed, [lp for _, _, lp in records])
+            deltas.trim(result.tick)
+            frame = deltas.compute([result.tick])
+            if len(frame.player_ids):
+                result.deltas_updated = (await connection.execute(write_statement(frame))).rowcount
+
+
+def after_tick(tick: datetime):
+    """Work that follows each snapshot on the sync engine: revalue portfolios, then re-rank leagues."""
+    from app.core.league_rank import rank_leagues
+    from app.core.revaluation import revalue_portfolios
+    from app.db.database import get_database_session
+
+    with get_database_session() as db:
+        revalue_portfolios(db, tick)
+        rank_leagues(db)
+
+
+async def run_ingestion(api_key: str, engine: AsyncEngine, interval: float = INGEST_INTERVAL_SECONDS):
+    """Ingest a snapshot every interval seconds; a failed tick is logged and the next one runs on time."""
+    client = RiotClient(api_key)
+    cache = PlayerIdCache()
+    deltas = DeltaEngine()
+    try:
+        while True:
+            started = monotonic()
+            try:
+                result = await ingest_tick(client, engine, cache, deltas=deltas)
+                await asyncio.to_thread(after_tick, result.tick)
+            except Exception as e:
+                logger.exception(f"Ingestion tick failed: {e}")
+            await asyncio.sleep(max(0.0, interval - (monotonic() - started)))
+    finally:
+        await client.close()
+
+
+if __name__ == "__main__":
+    from app.db.database import async_engine
+    from app.utils.get_secret import get_secret
+
+    logging.basicConfig(level=logging.INFO)
+    api_key = os.getenv('RIOT_API_KEY') or get_secret('tft-stocks-keys')['riot_api_key']
+    asyncio.run(run_ingestion(api_key, async_engine))
@@ -0,0 +1,116 @@
+from bisect import bisect_right
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+import logging
+
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
+
+from app.core.cursor import encode_cursor, decode_cursor, cursor_decimal, cursor_int
+from app.core.ticks import on_tick, is_current
+from app.models.db_models import Player, PlayerLatest
+from app.models.models import LeaderboardEntry
+
+logger = logging.getLogger(__name__)
+
+PLAYER_LEAD_TYPES = ['lp', 'delta_8h', 'delta_24h', 'delta_72h', 'neg_8h', 'neg_24h', 'neg_72h']
+
+
+class LeaderboardSnapshot:
+    """
+    Every player leaderboard, pre-sorted for one price tick.
+
+    Each board keeps its entries (ranked 1..N) and their (sort value, player id) keys in the
+    same order as the SQL path, so pages and cursors are interchangeable between the two.
+    """
+
+    def __init__(self, version: datetime, boards: Dict[str, Tuple[List[LeaderboardEntry], List[tuple], bool]]):
+        self.version = version
+        self.boards = boards
+
+    def page(self, lead_type: str, limit: int, page: int = 0, cursor: Optional[str] = None):
+        entries, keys, descending = self.boards[lead_type]
+        start = page * limit
+        skip = start
+
+        if cursor:
+            position = decode_cursor(cursor, 'type', 'value', 'id', 'rank',
+                                     value=cursor_decimal, id=cursor_int, rank=cursor_int)
+            if position['type'] != lead_type:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+            # keys are stored ascending, descending boards with both parts negated
+            value, player_id = position['value'], position['id']
+            start = bisect_right(keys, (-value, -player_id) if descending else (value, player_id))
+            skip = position['rank']
+
+        page_entries = [
+            entry.model_copy(update={'rank': skip + index + 1})
+            for index, entry in enumerate(entries[start:start + limit])
+        ]
+
+        next_cursor = None
+        if start + limit < len(entries):
+            value, player_id = keys[start + limit - 1]
+            if descending:
+                value, player_id = -value, -player_id
+            next_cursor = encode_cursor(type=lead_type, value=str(value), id=player_id, rank=skip + len(page_entries))
+
+        return page_entries, next_cursor
+
+
+_snapshot: Optional[LeaderboardSnapshot] = None
+
+
+def build_leaderboard_snapshot(db: Session, version: datetime) -> LeaderboardSnapshot:
+    # One read of every player's latest row; all seven boards are sorted from it in memory
+    rows = db.query(
+        Player.id, Player.game_name, Player.tag_line, Player.delta_8h, Player.delta_24h, Player.delta_72h,
+        PlayerLatest.league_points, PlayerLatest.price
+    ).join(PlayerLatest, PlayerLatest.player_id == Player.id).all()
+
+    boards = {}
+    for lead_type in PLAYER_LEAD_TYPES:
+        descending = not lead_type.startswith('neg_')
+        field = lead_type.replace('neg_', 'delta_')
+
+        def sort_value(row):
+            if field == 'lp':
+                return row.league_points
+            return getattr(row, field) or Decimal(0)
+
+        ordered = sorted(rows, key=lambda row: (sort_value(row), row.id), reverse=descending)
+        entries = [
+            LeaderboardEntry(
+                gameName=row.game_name,
+                tagLine=row.tag_line,
+                lp=row.price,
+                delta_8h=row.delta_8h or 0,
+                delta_24h=row.delta_24h or 0,
+                delta_72h=row.delta_72h or 0,
+                rank=index + 1
+            )
+            for index, row in enumerate(ordered)
+        ]
+        if descending:
+            keys = [(-sort_value(row), -row.id) for row in ordered]
+        else:
+            keys = [(sort_value(row), row.id) for row in ordered]
+        boards[lead_type] = (entries, keys, descending)
+
+    return LeaderboardSnapshot(version, boards)
+
+
+@on_tick
+def refresh_leaderboard_snapshot(db: Session, tick: datetime):
+    global _snapshot
+    _snapshot = build_leaderboard_snapshot(db, tick)
+    logger.info(f"Leaderboard snapshot rebuilt for tick {tick}")
+
+
+def current_leaderboard_snapshot() -> Optional[LeaderboardSnapshot]:
+    """The snapshot for the newest tick, or None when it is missing or stale and SQL must be used."""
+    snapshot = _snapshot
+    if snapshot is None or not is_current(snapshot.version):
+        return None
+    return snapshot
@@ -0,0 +1,65 @@
+from typing import Iterable, Optional
+import logging
+
+from sqlalchemy import select, update, func
+from sqlalchemy.orm import Session, aliased
+
+from app.models.db_models import Portfolio, UserLeagues
+
+logger = logging.getLogger(__name__)
+
+
+def rank_leagues(db: Session, league_ids: Optional[Iterable[int]] = None) -> int:
+    """
+    Recompute UserLeagues.rank for every league (or only league_ids) in one statement.
+
+    Ranks are 1..N per league by row_number over Portfolio.current_value, ties broken by join
+    order, so rank doubles as a stable position for paging. Only rows whose rank changed are written.
+    Returns the number of rows updated.
+    """
+    ranked = select(
+        UserLeagues.id,
+        func.row_number().over(
+            partition_by=UserLeagues.league_id,
+            order_by=(Portfolio.current_value.desc().nulls_last(), UserLeagues.id)
+        ).label('rank')
+    ).join(Portfolio, Portfolio.id == UserLeagues.portfolio_id)
+    if league_ids is not None:
+        ranked = ranked.where(UserLeagues.league_id.in_(list(league_ids)))
+    ranked = ranked.subquery('ranked')
+
+    statement = update(UserLeagues).where(
+        UserLeagues.id == ranked.c.id,
+        UserLeagues.rank.is_distinct_from(ranked.c.rank)
+    ).values(rank=ranked.c.rank)
+
+    try:
+        result = db.execute(statement)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    logger.info(f"Re-ranked {result.rowcount} league members")
+    return result.rowcount
+
+
+def rank_new_member(db: Session, user_id: int, league_ids: Iterable[int]) -> int:
+    """
+    Place user_id last in each of league_ids, at rank count + 1 of the members already there, in one
+    statement. Their true place is left to the re-rank of the next tick. Returns the rows updated.
+    """
+    members = aliased(UserLeagues)
+    count = select(func.count()).where(members.league_id == UserLeagues.league_id).scalar_subquery()
+    statement = update(UserLeagues).where(
+        UserLeagues.user_id == user_id,
+        UserLeagues.league_id.in_(list(league_ids))
+    ).values(rank=count)
+
+    try:
+        result = db.execute(statement)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return result.rowcount
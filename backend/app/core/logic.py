@@ -1,16 +1,15 @@
-from datetime import timezone
-from typing import List
+from typing import List, Optional, Tuple
 import logging
 
 from fastapi import HTTPException, status, Depends
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, asc, func
+from sqlalchemy import desc, asc, func, tuple_, literal
 
-from app.core.token import get_user_from_token
+from app.core.cursor import encode_cursor, decode_cursor, cursor_datetime, cursor_decimal, cursor_int
 from app.models.db_models import User, PlayerData, Transaction, PortfolioHistory, Player, Portfolio, \
-    UserLeagues
+    UserLeagues, PlayerLatest
 from app.models.models import LeaderboardEntry, Transaction as TransactionModel, TransactionWithTagLine, UserPublic, \
-    PortfolioLeaderboardEntry, UserProfile
+    PortfolioLeaderboardEntry, UserProfile, UserIdentity
 from app.db.database import get_database_session, get_db
 from app.models.pricing_model import price_model
 
@@ -22,17 +21,18 @@ from fastapi import HTTPException, status, Depends
 from sqlalchemy.orm import Session
 from sqlalchemy import func, desc, asc
 
-from app.models.db_models import PlayerData, Player
+from app.models.db_models import PlayerData, Player, PlayerLatest
 from app.models.models import LeaderboardEntry
 from app.db.database import get_database_session
 
-def fetch_leaderboard_entries(lead_type: str, page: int = 0, limit: int = 100, db: Session = Depends(get_db)) -> List[LeaderboardEntry]:
+def fetch_leaderboard_entries(lead_type: str, page: int = 0, limit: int = 100, db: Session = Depends(get_db),
+                              cursor: Optional[str] = None) -> Tuple[List[LeaderboardEntry], Optional[str]]:
     skip = page * limit
 
     try:
         # Map lead_type to actual fields and corresponding model
         sort_fields_map = {
-            'lp': ('league_points', PlayerData),
+            'lp': ('league_points', PlayerLatest),
             'delta_8h': ('delta_8h', Player),
             'delta_24h': ('delta_24h', Player),
             'delta_72h': ('delta_72h', Player)
@@ -49,134 +49,198 @@ def fetch_leaderboard_entries(lead_type: str, page: int = 0, limit: int = 100, d
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid leaderboard type")
 
         sort_field_actual, model = sort_fields_map[sort_field]
-
-        # Subquery to get the latest PlayerData entry for each player
-        subquery = db.query(
-            PlayerData.player_id,
-            func.max(PlayerData.date).label('max_date')
-        ).group_by(PlayerData.player_id).subquery()
-
-        # Query to get the latest PlayerData entries joined with Player
-        query = db.query(PlayerData).join(Player).join(
-            subquery,
-            (PlayerData.player_id == subquery.c.player_id) &
-            (PlayerData.date == subquery.c.max_date)
-        )
-
-        if model == PlayerData:
-            query = query.order_by(sort_direction(getattr(PlayerData, sort_field_actual)))
-        else:
-            query = query.order_by(sort_direction(getattr(Player, sort_field_actual)))
-
-        player_data = query.offset(skip).limit(limit).all()
+        sort_key = getattr(model, sort_field_actual)
+        if model is Player:
+            # Deltas are unset until a player has enough history; they rank as no change
+            sort_key = func.coalesce(sort_key, 0)
+
+        # Latest price of every player comes straight from the player_latest read model
+        query = db.query(PlayerLatest, Player, sort_key).join(Player, Player.id == PlayerLatest.player_id)
+        query = query.order_by(sort_direction(sort_key), sort_direction(Player.id))
+
+        if cursor:
+            # Keyset: continue strictly after the last (sort value, id) of the previous page
+            position = decode_cursor(cursor, 'type', 'value', 'id', 'rank',
+                                     value=cursor_decimal, id=cursor_int, rank=cursor_int)
+            if position['type'] != lead_type:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+            last_key = tuple_(literal(position['value']), literal(position['id']))
+            if sort_direction is desc:
+                query = query.filter(tuple_(sort_key, Player.id) < last_key)
+            else:
+                query = query.filter(tuple_(sort_key, Player.id) > last_key)
+            skip = position['rank']
+        elif skip:
+            query = query.offset(skip)
+
+        player_data = query.limit(limit + 1).all()
+        has_more = len(player_data) > limit
+        player_data = player_data[:limit]
 
         entries = []
-        for index, item in enumerate(player_data):
-            lp_value = price_model(item.league_points)
-            player = item.player
-
+        for index, (latest, player, _) in enumerate(player_data):
             entry = LeaderboardEntry(
                 gameName=player.game_name,
                 tagLine=player.tag_line,
-                lp=lp_value,
-                delta_8h=player.delta_8h,
-                delta_24h=player.delta_24h,
-                delta_72h=player.delta_72h,
+                lp=latest.price,
+                delta_8h=player.delta_8h or 0,
+                delta_24h=player.delta_24h or 0,
+                delta_72h=player.delta_72h or 0,
                 rank=index + 1 + skip
             )
             entries.append(entry)
 
-        return entries
+        next_cursor = None
+        if has_more:
+            _, last_player, last_value = player_data[-1]
+            next_cursor = encode_cursor(type=lead_type, value=str(last_value), id=last_player.id, rank=skip + len(entries))
+
+        return entries, next_cursor
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f'Failed to fetch leaderboard data: {str(e)}')
 
 
-def fetch_portfolio_leaderboard(current_user: User, page: int, limit: int, db: Session) -> list[PortfolioLeaderboardEntry]:
+def fetch_portfolio_leaderboard(current_user: UserIdentity, page: int, limit: int, db: Session,
+                                cursor: Optional[str] = None) -> Tuple[List[PortfolioLeaderboardEntry], Optional[str]]:
     skip = page * limit
     try:
         user_league_id = current_user.current_league_id
         logging.debug(f"Current league ID for user {current_user.username}: {user_league_id}")
 
         # Ensure the league ID is valid and accessible
-        user_league = db.query(UserLeagues).filter(UserLeagues.league_id == user_league_id).first()
+        user_league = db.query(UserLeagues.id).filter(
+            UserLeagues.league_id == user_league_id,
+            UserLeagues.user_id == current_user.id
+        ).first()
         if not user_league:
             raise HTTPException(status_code=404, detail="User league not found")
 
+        # The rank job materializes the (current_value desc, id) order as UserLeagues.rank, so the
+        # keyset is (rank, id) and a page is a range scan over rank rather than a sort of the league
         query = (
-            db.query(User.username, Portfolio.current_value)
+            db.query(User.username, Portfolio.current_value, UserLeagues.rank, UserLeagues.id)
             .join(UserLeagues, User.id == UserLeagues.user_id)
             .join(Portfolio, UserLeagues.portfolio_id == Portfolio.id)
             .filter(UserLeagues.league_id == user_league_id)
-            .order_by(Portfolio.current_value.desc())
-            .offset(skip)
-            .limit(limit)
+            .order_by(UserLeagues.rank, UserLeagues.id)
         )
-
-        user_portfolios = query.all()
-        logging.debug(f"Portfolios fetched: {user_portfolios}")
-
-        entries = []
-        for index, (username, current_value) in enumerate(user_portfolios):
-            entry = PortfolioLeaderboardEntry(
-                username=username,
-                value=current_value,
-                rank=index + 1 + skip
+        if cursor:
+            position = decode_cursor(cursor, 'type', 'rank', 'id', rank=cursor_int, id=cursor_int)
+            if position['type'] != 'portfolio':
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+            query = query.filter(
+                tuple_(UserLeagues.rank, UserLeagues.id) > tuple_(literal(position['rank']), literal(position['id']))
             )
-            entries.append(entry)
+        else:
+            query = query.filter(UserLeagues.rank > skip)
 
-        return entries
+        user_portfolios = query.limit(limit + 1).all()
+        logging.debug(f"Portfolios fetched: {user_portfolios}")
+        has_more = len(user_portfolios) > limit
+        user_portfolios = user_portfolios[:limit]
+
+        entries = [
+            PortfolioLeaderboardEntry(username=username, value=current_value, rank=rank)
+            for username, current_value, rank, _ in user_portfolios
+        ]
+
+        next_cursor = None
+        if has_more:
+            _, _, last_rank, last_id = user_portfolios[-1]
+            next_cursor = encode_cursor(type='portfolio', rank=last_rank, id=last_id)
+
+        return entries, next_cursor
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error in fetch_portfolio_leaderboard: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch portfolio leaderboard data: {str(e)}")
 
 
-
-def fetch_recent_transactions(user: UserPublic, db: Session) -> List[TransactionWithTagLine]:
+def fetch_portfolio_leaderboard_around(current_user: UserIdentity, n: int, db: Session) -> list[PortfolioLeaderboardEntry]:
+    """
+    The caller's entry in their current league plus the n entries ranked directly above and below.
+    """
+    user_rank = db.query(UserLeagues.rank).filter(
+        UserLeagues.league_id == current_user.current_league_id,
+        UserLeagues.user_id == current_user.id
+    ).scalar()
+    if user_rank is None:
+        raise HTTPException(status_code=404, detail="User league not found")
+
+    rows = (
+        db.query(User.username, Portfolio.current_value, UserLeagues.rank)
+        .join(UserLeagues, User.id == UserLeagues.user_id)
+        .join(Portfolio, UserLeagues.portfolio_id == Portfolio.id)
+        .filter(UserLeagues.league_id == current_user.current_league_id)
+        .filter(UserLeagues.rank.between(user_rank - n, user_rank + n))
+        .order_by(UserLeagues.rank)
+        .all()
+    )
+    return [
+        PortfolioLeaderboardEntry(username=username, value=current_value, rank=rank)
+        for username, current_value, rank in rows
+    ]
+
+
+def fetch_recent_transactions(user: UserIdentity, db: Session, limit: int = 50,
+                              cursor: Optional[str] = None) -> Tuple[List[TransactionWithTagLine], Optional[str]]:
+    """
+    One page of the user's transactions in their current league, newest first.
+
+    The page is ordered and cut in SQL with the player joined in, and the keyset cursor continues
+    strictly after the (transaction_date, id) of the previous page's last row, so every page is
+    one index range scan however long the history is.
+    """
     try:
-        user_record = db.query(User).filter(User.username == user.username).first()
-        if not user_record:
-            logger.error(f"User not found: {user.username}")
-            raise HTTPException(status_code=404, detail='User not found')
-
-        user_league = db.query(UserLeagues).filter(
-            UserLeagues.user_id == user_record.id,
-            UserLeagues.league_id == user_record.current_league_id
-        ).first()
-        if not user_league:
+        portfolio_id = db.query(UserLeagues.portfolio_id).filter(
+            UserLeagues.user_id == user.id,
+            UserLeagues.league_id == user.current_league_id
+        ).scalar()
+        if portfolio_id is None:
             logger.error(f"User not associated with current league: {user.username}")
             raise HTTPException(status_code=404, detail='User not associated with current league')
 
-        transactions = db.query(Transaction).filter(Transaction.portfolio_id == user_league.portfolio_id).all()
-        if not transactions:
-            logger.info(f"No transactions found for user: {user.username}")
-
-        recent_transactions = []
-        for t in transactions:
-            player = db.query(Player).filter(Player.id == t.player_id).first()
-            if not player:
-                logger.error(f"Player not found for player_id: {t.player_id}")
-                continue
-
-            logger.debug(f"Fetched player data: {player}")
-            logger.debug(f"Player game_name: {player.game_name}, Player tag_line: {player.tag_line}")
-
-            t.transaction_date = t.transaction_date.replace(tzinfo=timezone.utc)  # Ensure the datetime is timezone-aware
-
-            # Directly use the Pydantic model
-            transaction = TransactionWithTagLine(
-                id=t.id,
-                type=t.type,
-                gameName=player.game_name,  # Include gameName
-                tagLine=player.tag_line,  # Include tagLine
-                shares=t.shares,
-                price=float(t.price),  # Convert Decimal to float
-                transaction_date=t.transaction_date,
+        query = (
+            db.query(Transaction, Player.game_name, Player.tag_line)
+            .join(Player, Player.id == Transaction.player_id)
+            .filter(Transaction.portfolio_id == portfolio_id)
+            .order_by(desc(Transaction.transaction_date), desc(Transaction.id))
+        )
+        if cursor:
+            position = decode_cursor(cursor, 'type', 'date', 'id', date=cursor_datetime, id=cursor_int)
+            if position['type'] != 'transactions':
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+            query = query.filter(
+                tuple_(Transaction.transaction_date, Transaction.id) <
+                tuple_(literal(position['date']), literal(position['id']))
+            )
+
+        rows = query.limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        transactions = [
+            TransactionWithTagLine(
+                id=transaction.id,
+                type=transaction.type,
+                gameName=game_name,
+                tagLine=tag_line,
+                shares=transaction.shares,
+                price=float(transaction.price),
+                transaction_date=transaction.transaction_date
             )
-            recent_transactions.append(transaction)
+            for transaction, game_name, tag_line in rows
+        ]
+
+        next_cursor = None
+        if has_more:
+            last = rows[-1][0]
+            next_cursor = encode_cursor(type='transactions', date=last.transaction_date.isoformat(), id=last.id)
 
-        # Reversing the list of transactions to maintain the correct order
-        list_transactions = list(recent_transactions)[::-1]
-        return list_transactions
+        return transactions, next_cursor
     except HTTPException as e:
         logger.error(f"HTTPException: {str(e)}")
         raise e
@@ -0,0 +1,143 @@
+from datetime import datetime, timezone
+from typing import NamedTuple, Optional
+
+import numpy as np
+from fastapi import HTTPException, status
+from sqlalchemy import select, union_all, func
+from sqlalchemy.orm import Session
+
+from app.core.retention import TIERS_BY_RAW, raw_columns, rollup_columns
+
+# Bucket width in seconds for every supported history resolution; 'raw' returns ticks as stored
+RESOLUTIONS = {
+    'raw': None,
+    '1h': 3600,
+    '1d': 86400,
+}
+
+
+def validate_resolution(resolution: str) -> Optional[int]:
+    if resolution not in RESOLUTIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid resolution, expected one of: {', '.join(RESOLUTIONS)}"
+        )
+    return RESOLUTIONS[resolution]
+
+
+OHLC = ('open', 'high', 'low', 'close')
+
+
+class LpHistory(NamedTuple):
+    """Time-ordered LP series; raw snapshots have open == high == low == close."""
+    times: np.ndarray
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+
+
+def tier_sources(model):
+    """(table, (time, open, high, low, close) columns) of every retention tier of model, oldest tier first."""
+    sources = [(model, raw_columns(model))]
+    tiers = TIERS_BY_RAW.get(model)
+    if tiers is not None:
+        sources = [(rollup, rollup_columns(rollup)) for rollup in (tiers.daily, tiers.hourly)] + sources
+    return sources
+
+
+def tiered_history_query(model, player_id: int, start: datetime = None, end: datetime = None):
+    """
+    One player's history across every retention tier of model, as (time, open, high, low,
+    close) rows in time order: daily and hourly rollups for the periods that were rolled up,
+    raw snapshots after that. The tiers never overlap, so the union is one continuous series.
+    """
+    selects = []
+    for table, (time, *ohlc) in tier_sources(model):
+        part = select(time.label('time'), *[column.label(name) for column, name in zip(ohlc, OHLC)]) \
+            .where(table.player_id == player_id)
+        if start is not None:
+            part = part.where(time >= start)
+        if end is not None:
+            part = part.where(time <= end)
+        selects.append(part)
+    history = union_all(*selects).subquery('history')
+    return select(history).order_by(history.c.time)
+
+
+def load_lp_history(db: Session, model, player_id: int, start: datetime = None, end: datetime = None) -> LpHistory:
+    # Only the five columns are fetched, never ORM objects, and the range is applied in SQL
+    rows = db.execute(tiered_history_query(model, player_id, start, end)).all()
+
+    times = np.fromiter((row[0].timestamp() for row in rows), dtype=np.float64, count=len(rows))
+    columns = [np.fromiter((row[index] for row in rows), dtype=np.int64, count=len(rows)) for index in range(1, 5)]
+    return LpHistory(times, *columns)
+
+
+def latest_history_date(db: Session, model, player_id: int) -> Optional[datetime]:
+    """Time of the player's newest row in any tier, each tier read off its (player_id, time) index."""
+    candidates = [select(model.date).where(model.player_id == player_id).order_by(model.date.desc()).limit(1)]
+    tiers = TIERS_BY_RAW.get(model)
+    if tiers is not None:
+        candidates += [select(rollup.bucket).where(rollup.player_id == player_id).order_by(rollup.bucket.desc())
+                       .limit(1) for rollup in (tiers.hourly, tiers.daily)]
+    return db.execute(select(func.coalesce(*[candidate.scalar_subquery() for candidate in candidates]))).scalar()
+
+
+def bucket_ohlc(history: LpHistory, bucket_seconds: int):
+    """
+    Collapse a time-ordered OHLC series into open/high/low/close buckets of bucket_seconds each.
+
+    Buckets are aligned to the epoch (so 1h buckets start on the hour, UTC) and a bucket is
+    labelled by its start time. Empty buckets are skipped. Rolled-up rows keep their own high and
+    low, so a bucket spanning them is as wide as the ticks it was built from.
+    """
+    times = history.times
+    if len(times) == 0:
+        empty = history.close[:0]
+        return {'time': times[:0], 'open': empty, 'high': empty, 'low': empty, 'close': empty}
+
+    bucket_ids = np.floor_divide(times, bucket_seconds).astype(np.int64)
+    starts = np.flatnonzero(np.r_[True, bucket_ids[1:] != bucket_ids[:-1]])
+    ends = np.r_[starts[1:], len(times)] - 1
+
+    return {
+        'time': bucket_ids[starts].astype(np.float64) * bucket_seconds,
+        'open': history.open[starts],
+        'high': np.maximum.reduceat(history.high, starts),
+        'low': np.minimum.reduceat(history.low, starts),
+        'close': history.close[ends],
+    }
+
+
+def format_timestamp(epoch_seconds: float) -> str:
+    # Matches str() of a timezone-aware datetime coming back from the database
+    return str(datetime.fromtimestamp(epoch_seconds, tz=timezone.utc))
+
+
+def history_payload(history: LpHistory, resolution: str, to_price=None) -> dict:
+    """
+    Build the 'date'/'price' lists returned by the history endpoints.
+
+    At 'raw' resolution every stored row is returned: each tick inside the raw retention window,
+    and the close of each rolled-up hour or day before it. Coarser resolutions return one close per bucket
+    in 'price', plus 'open', 'high' and 'low' lists of the same length. to_price maps LP arrays to
+    prices; since it is monotonic it is applied after bucketing.
+    """
+    bucket_seconds = validate_resolution(resolution)
+    to_price = to_price or (lambda lps: lps)
+
+    if bucket_seconds is None:
+        return {
+            'price': to_price(history.close).tolist(),
+            'date': [format_timestamp(t) for t in history.times.tolist()],
+        }
+
+    buckets = bucket_ohlc(history, bucket_seconds)
+    return {
+        'price': to_price(buckets['close']).tolist(),
+        'open': to_price(buckets['open']).tolist(),
+        'high': to_price(buckets['high']).tolist(),
+        'low': to_price(buckets['low']).tolist(),
+        'date': [format_timestamp(t) for t in buckets['time'].tolist()],
+    }
@@ -0,0 +1,173 @@
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, Iterable
+import logging
+
+from sqlalchemy import select, true
+from sqlalchemy.orm import Session
+
+from app.core.holds import active_holds
+from app.models.db_models import User, Player, PlayerLatest, Portfolio, PortfolioPlayer, PortfolioHold, \
+    PortfolioHistory as DBPortfolioHistory, League as DBLeague, UserLeagues as DBUserLeagues, \
+    Transaction as DBTransaction, Favorite
+from app.models.models import UserProfile, Portfolio as PortfolioModel, Player as PlayerModel, Holds, \
+    Transaction, PortfolioHistory, LeagueWithPortfolio, League, FavoritesEntry
+
+logger = logging.getLogger(__name__)
+
+# Transactions embedded per league; the full history is paged by /transaction_history
+PROFILE_TRANSACTIONS = 10
+
+
+def fetch_latest_prices(db: Session, player_ids: Iterable[int]) -> Dict[int, float]:
+    # One primary-key lookup on player_latest for every requested player
+    player_ids = set(player_ids)
+    if not player_ids:
+        return {}
+
+    rows = db.query(PlayerLatest.player_id, PlayerLatest.price).filter(PlayerLatest.player_id.in_(player_ids)).all()
+    return {player_id: price for player_id, price in rows}
+
+
+def build_user_profile(db: Session, user: User, include_favorites: bool = False, profile_model=UserProfile, **extra):
+    """
+    Assemble a user's profile across all of their leagues with a fixed number of queries.
+
+    Every league, portfolio, holding, active hold, history point and recent transaction is fetched
+    with one set-based query per entity, and the latest price of every referenced player is resolved
+    in a single query, so the cost does not grow with the number of players held or trades made.
+    """
+    league_rows = db.query(DBUserLeagues, DBLeague, Portfolio) \
+        .join(DBLeague, DBLeague.id == DBUserLeagues.league_id) \
+        .outerjoin(Portfolio, Portfolio.id == DBUserLeagues.portfolio_id) \
+        .filter(DBUserLeagues.user_id == user.id) \
+        .order_by(DBUserLeagues.id) \
+        .all()
+    portfolio_ids = [user_league.portfolio_id for user_league, _, _ in league_rows]
+
+    players_by_portfolio = defaultdict(list)
+    holds_by_portfolio = defaultdict(list)
+    history_by_portfolio = defaultdict(list)
+    transactions_by_portfolio = defaultdict(list)
+    favorite_players = []
+
+    if portfolio_ids:
+        for portfolio_player, player in db.query(PortfolioPlayer, Player) \
+                .join(Player, Player.id == PortfolioPlayer.player_id) \
+                .filter(PortfolioPlayer.portfolio_id.in_(portfolio_ids)) \
+                .order_by(PortfolioPlayer.id):
+            players_by_portfolio[portfolio_player.portfolio_id].append((portfolio_player, player))
+
+        for hold, game_name in db.query(PortfolioHold, Player.game_name) \
+                .join(Player, Player.id == PortfolioHold.player_id) \
+                .filter(PortfolioHold.portfolio_id.in_(portfolio_ids), active_holds(datetime.now(timezone.utc))) \
+                .order_by(PortfolioHold.id):
+            holds_by_portfolio[hold.portfolio_id].append(Holds(
+                id=hold.id,
+                gameName=game_name,
+                shares=hold.shares,
+                hold_deadline=hold.hold_deadline
+            ))
+
+        for history in db.query(DBPortfolioHistory) \
+                .filter(DBPortfolioHistory.portfolio_id.in_(portfolio_ids)) \
+                .order_by(DBPortfolioHistory.date, DBPortfolioHistory.id):
+            history_by_portfolio[history.portfolio_id].append(PortfolioHistory(
+                id=history.id,
+                value=history.value,
+                date=history.date
+            ))
+
+        # The newest PROFILE_TRANSACTIONS of each portfolio, one index range scan per league
+        recent = select(DBTransaction.id) \
+            .where(DBTransaction.portfolio_id == DBUserLeagues.portfolio_id) \
+            .order_by(DBTransaction.transaction_date.desc(), DBTransaction.id.desc()) \
+            .limit(PROFILE_TRANSACTIONS) \
+            .correlate(DBUserLeagues) \
+            .lateral('recent_transactions')
+        for transaction, game_name in db.query(DBTransaction, Player.game_name) \
+                .select_from(DBUserLeagues) \
+                .join(recent, true()) \
+                .join(DBTransaction, DBTransaction.id == recent.c.id) \
+                .join(Player, Player.id == DBTransaction.player_id) \
+                .filter(DBUserLeagues.user_id == user.id) \
+                .order_by(DBTransaction.transaction_date, DBTransaction.id):
+            transactions_by_portfolio[transaction.portfolio_id].append(Transaction(
+                id=transaction.id,
+                type=transaction.type,
+                gameName=game_name,
+                shares=transaction.shares,
+                price=float(transaction.price),
+                transaction_date=transaction.transaction_date
+            ))
+
+    if include_favorites:
+        favorite_players = db.query(Player) \
+            .join(Favorite, Favorite.player_id == Player.id) \
+            .filter(Favorite.user_id == user.id) \
+            .order_by(Favorite.id) \
+            .all()
+
+    # Resolve the latest price of every held or favorited player at once
+    player_ids = {player.id for rows in players_by_portfolio.values() for _, player in rows}
+    player_ids.update(player.id for player in favorite_players)
+    latest_prices = fetch_latest_prices(db, player_ids)
+
+    leagues_with_portfolios = []
+    for user_league, league, portfolio in league_rows:
+        players_dict = {}
+        for portfolio_player, player in players_by_portfolio[user_league.portfolio_id]:
+            current_price = latest_prices.get(player.id, portfolio_player.purchase_price)
+            players_dict[player.game_name] = PlayerModel(
+                name=player.game_name,
+                tagLine=player.tag_line,
+                current_price=current_price,
+                purchase_price=portfolio_player.purchase_price,
+                shares=portfolio_player.shares
+            )
+
+        leagues_with_portfolios.append(
+            LeagueWithPortfolio(
+                league=League(
+                    id=league.id,
+                    name=league.name,
+                    start_date=league.start_date,
+                    end_date=league.end_date,
+                    created_by=league.created_by,
+                    type=league.type
+                ),
+                portfolio=PortfolioModel(
+                    id=portfolio.id if portfolio else user_league.portfolio_id,
+                    players=players_dict,
+                    holds=holds_by_portfolio[user_league.portfolio_id]
+                ),
+                portfolio_history=history_by_portfolio[user_league.portfolio_id],
+                transactions=transactions_by_portfolio[user_league.portfolio_id],
+                one_day_change=None,
+                three_day_change=None,
+                balance=user_league.balance,
+                rank=user_league.rank
+            )
+        )
+
+    favorites = [
+        FavoritesEntry(
+            name=player.game_name,
+            current_price=latest_prices[player.id],
+            eight_hour_change=player.delta_8h,
+            one_day_change=player.delta_24h,
+            three_day_change=player.delta_72h,
+            tag_line=player.tag_line
+        )
+        for player in favorite_players if player.id in latest_prices
+    ]
+
+    user_profile = profile_model(
+        username=user.username,
+        leagues=leagues_with_portfolios,
+        favorites=favorites,
+        current_league_id=user.current_league_id,
+        **extra
+    )
+    logger.debug(f"UserProfile: {user_profile}")
+    return user_profile
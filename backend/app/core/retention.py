@@ -0,0 +1,188 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+import logging
+import os
+import threading
+
+from sqlalchemy import select, delete, func, true, literal_column, Integer
+from sqlalchemy.dialects.postgresql import insert, aggregate_order_by, ARRAY
+from sqlalchemy.engine import Connection, Engine
+
+from app.core.deltas import LOOKBACK
+from app.models.db_models import Player, PlayerData, PlayerDataHourly, PlayerDataDaily, RegionalsNonna, \
+    RegionalsData, RegionalsDataHourly, RegionalsDataDaily
+
+logger = logging.getLogger(__name__)
+
+# Raw snapshots are kept this long, hourly rollups this long after that; daily rollups are kept for good
+RAW_RETENTION = timedelta(days=float(os.getenv('RAW_RETENTION_DAYS', '7')))
+HOURLY_RETENTION = timedelta(days=float(os.getenv('HOURLY_RETENTION_DAYS', '90')))
+RETENTION_SECONDS = float(os.getenv('RETENTION_SECONDS', '3600'))
+# Rows are rolled up one day of history per transaction
+RETENTION_BATCH = timedelta(days=1)
+# Session advisory lock taken by whichever worker runs retention, so the others skip the run
+RETENTION_LOCK = 7_311_002
+
+if RAW_RETENTION <= LOOKBACK:
+    raise ValueError(f'RAW_RETENTION_DAYS must exceed the {LOOKBACK} the deltas are computed over')
+if HOURLY_RETENTION <= RAW_RETENTION:
+    raise ValueError('HOURLY_RETENTION_DAYS must exceed RAW_RETENTION_DAYS')
+
+
+@dataclass(frozen=True)
+class HistoryTiers:
+    """A raw snapshot table, its rollups, and the table its player ids point at."""
+    raw: type
+    hourly: type
+    daily: type
+    players: type
+
+
+HISTORY_TIERS = [
+    HistoryTiers(PlayerData, PlayerDataHourly, PlayerDataDaily, Player),
+    HistoryTiers(RegionalsData, RegionalsDataHourly, RegionalsDataDaily, RegionalsNonna),
+]
+TIERS_BY_RAW = {tiers.raw: tiers for tiers in HISTORY_TIERS}
+
+
+def truncate(when: datetime, unit: timedelta) -> datetime:
+    """Round down to a whole hour or day, UTC."""
+    seconds = unit.total_seconds()
+    return datetime.fromtimestamp(when.timestamp() // seconds * seconds, timezone.utc)
+
+
+def oldest_statement(tiers: HistoryTiers, model, time_column):
+    """
+    Oldest time in model, as the minimum of each player's oldest row: one probe of the
+    (player_id, time) index per player instead of a scan of the whole table.
+    """
+    oldest = select(time_column.label('time')).where(model.player_id == tiers.players.id) \
+        .order_by(time_column).limit(1).correlate(tiers.players).lateral('oldest')
+    return select(func.min(oldest.c.time)).select_from(tiers.players).join(oldest, true())
+
+
+def first_value(values, order_by):
+    # Value of the first row of a group in order_by order
+    return func.array_agg(aggregate_order_by(values, order_by), type_=ARRAY(Integer))[1]
+
+
+def rollup_statement(source, target, moved_columns, start: datetime, end: datetime, unit: str):
+    """
+    Move source rows in [start, end) into target buckets of one unit ('hour' or 'day', UTC):
+    one DELETE ... RETURNING feeding one grouped INSERT, so a row is never in both tiers.
+
+    A bucket that already exists, when rows are backfilled into a period already rolled up,
+    keeps its open and close and widens its high and low.
+    """
+    time, open_, high, low, close = moved_columns(source)
+    moved = delete(source).where(time >= start, time < end) \
+        .returning(source.player_id, time.label('time'), open_.label('open'), high.label('high'),
+                   low.label('low'), close.label('close')).cte(f'moved_{source.__tablename__}')
+
+    bucket = func.date_trunc(literal_column(f"'{unit}'"), moved.c.time, literal_column("'UTC'"))
+    rollup = select(
+        moved.c.player_id, bucket, first_value(moved.c.open, moved.c.time.asc()), func.max(moved.c.high),
+        func.min(moved.c.low), first_value(moved.c.close, moved.c.time.desc())
+    ).where(moved.c.player_id.is_not(None)).group_by(moved.c.player_id, bucket)
+
+    statement = insert(target).from_select(['player_id', 'bucket', 'open', 'high', 'low', 'close'], rollup)
+    return statement.on_conflict_do_update(
+        index_elements=[target.player_id, target.bucket],
+        set_={'high': func.greatest(target.high, statement.excluded.high),
+              'low': func.least(target.low, statement.excluded.low)}
+    )
+
+
+def raw_columns(raw):
+    """(time, open, high, low, close) of a raw snapshot table, where a snapshot is all four."""
+    return raw.date, raw.league_points, raw.league_points, raw.league_points, raw.league_points
+
+
+def rollup_columns(rollup):
+    """(time, open, high, low, close) of an hourly or daily rollup table."""
+    return rollup.bucket, rollup.open, rollup.high, rollup.low, rollup.close
+
+
+def roll_up(connection: Connection, source, target, moved_columns, oldest: Optional[datetime], cutoff: datetime,
+            unit: str) -> int:
+    """Roll every source row older than cutoff into target, one committed day at a time; returns the buckets written."""
+    if oldest is None:
+        return 0
+    written = 0
+    start = truncate(oldest, timedelta(days=1))
+    while start < cutoff:
+        end = min(start + RETENTION_BATCH, cutoff)
+        written += connection.execute(rollup_statement(source, target, moved_columns, start, end, unit)).rowcount
+        connection.commit()
+        start = end
+    return written
+
+
+def apply_retention(connection: Connection, now: Optional[datetime] = None):
+    """
+    Roll raw snapshots older than RAW_RETENTION into hourly buckets, then hourly buckets older
+    than HOURLY_RETENTION into daily ones, for every history table. Cutoffs are whole hours and
+    days, so every bucket is complete when it is written.
+    """
+    now = now or datetime.now(timezone.utc)
+    raw_cutoff = truncate(now - RAW_RETENTION, timedelta(hours=1))
+    hourly_cutoff = truncate(now - HOURLY_RETENTION, timedelta(days=1))
+
+    for tiers in HISTORY_TIERS:
+        oldest = connection.execute(oldest_statement(tiers, tiers.raw, tiers.raw.date)).scalar()
+        hours = roll_up(connection, tiers.raw, tiers.hourly, raw_columns, oldest, raw_cutoff, 'hour')
+        oldest = connection.execute(oldest_statement(tiers, tiers.hourly, tiers.hourly.bucket)).scalar()
+        days = roll_up(connection, tiers.hourly, tiers.daily, rollup_columns, oldest, hourly_cutoff, 'day')
+        if hours or days:
+            logger.info(f"Rolled {tiers.raw.__tablename__} up into {hours} hourly and {days} daily buckets")
+
+
+class RetentionWorker:
+    """
+    Background thread that applies retention every interval seconds. Every worker runs one;
+    the advisory lock lets only one of them roll up at a time.
+    """
+
+    def __init__(self, engine: Engine, interval: float = RETENTION_SECONDS):
+        self.engine = engine
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run(self) -> bool:
+        with self.engine.connect() as connection:
+            if not connection.execute(select(func.pg_try_advisory_lock(RETENTION_LOCK))).scalar():
+                return False
+            try:
+                apply_retention(connection)
+            finally:
+                connection.rollback()
+                connection.execute(select(func.pg_advisory_unlock(RETENTION_LOCK)))
+                connection.commit()
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run()
+            except Exception as e:
+                logger.error(f"Retention failed: {e}")
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='retention', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.interval)
+
+
+if __name__ == "__main__":
+    from app.db.database import engine
+
+    logging.basicConfig(level=logging.INFO)
+    if not RetentionWorker(engine).run():
+        print('Retention is already running elsewhere')
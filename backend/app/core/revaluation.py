@@ -0,0 +1,77 @@
+from datetime import datetime, timezone
+import logging
+
+from sqlalchemy import select, update, insert, func, literal, Numeric, cast, and_
+from sqlalchemy.orm import Session
+
+from app.core.league_rank import rank_leagues
+from app.models.db_models import Portfolio, PortfolioPlayer, PortfolioHistory, PlayerLatest, UserLeagues, League
+
+logger = logging.getLogger(__name__)
+
+
+def portfolio_values_query(as_of: datetime):
+    """
+    Value of every portfolio in every league that is running at as_of.
+
+    value = UserLeagues.balance + sum(PortfolioPlayer.shares * latest price), computed in SQL
+    with one aggregate over portfolio_players joined to player_latest.
+    """
+    holdings = select(
+        PortfolioPlayer.portfolio_id,
+        func.sum(PortfolioPlayer.shares * cast(PlayerLatest.price, Numeric)).label('holdings_value')
+    ).join(
+        PlayerLatest, PlayerLatest.player_id == PortfolioPlayer.player_id
+    ).group_by(PortfolioPlayer.portfolio_id).subquery()
+
+    return select(
+        UserLeagues.portfolio_id,
+        (func.coalesce(UserLeagues.balance, 0) + func.coalesce(holdings.c.holdings_value, 0)).label('value')
+    ).join(
+        League, League.id == UserLeagues.league_id
+    ).outerjoin(
+        holdings, holdings.c.portfolio_id == UserLeagues.portfolio_id
+    ).where(
+        and_(League.start_date <= as_of, League.end_date >= as_of)
+    )
+
+
+def revalue_portfolios(db: Session, as_of: datetime = None) -> int:
+    """
+    Revalue every active portfolio after a price tick.
+
+    A single statement updates Portfolio.current_value from the set-based valuation and feeds
+    the updated rows straight into a bulk INSERT of PortfolioHistory stamped with as_of, so both
+    writes land in one transaction. Returns the number of portfolios revalued.
+    """
+    as_of = as_of or datetime.now(timezone.utc)
+    values = portfolio_values_query(as_of).cte('portfolio_values')
+
+    updated = update(Portfolio).where(
+        Portfolio.id == values.c.portfolio_id
+    ).values(
+        current_value=values.c.value
+    ).returning(Portfolio.id, Portfolio.current_value).cte('updated_portfolios')
+
+    statement = insert(PortfolioHistory).from_select(
+        ['portfolio_id', 'value', 'date'],
+        select(updated.c.id, updated.c.current_value, literal(as_of, PortfolioHistory.date.type))
+    )
+
+    try:
+        result = db.execute(statement)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    logger.info(f"Revalued {result.rowcount} portfolios as of {as_of.isoformat()}")
+    return result.rowcount
+
+
+if __name__ == "__main__":
+    from app.db.database import get_database_session
+
+    with get_database_session() as session:
+        print(f"Revalued {revalue_portfolios(session)} portfolios")
+        print(f"Re-ranked {rank_leagues(session)} league members")
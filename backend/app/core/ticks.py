@@ -0,0 +1,97 @@
+from datetime import datetime, timezone
+from typing import Callable, List, Optional
+import logging
+import os
+import threading
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models.db_models import PlayerLatest
+
+logger = logging.getLogger(__name__)
+
+# How often each worker checks player_latest for a new snapshot, and how long without a
+# successful check before in-memory state derived from ticks is no longer trusted
+TICK_POLL_SECONDS = float(os.getenv('TICK_POLL_SECONDS', '15'))
+TICK_MAX_LAG_SECONDS = float(os.getenv('TICK_MAX_LAG_SECONDS', '120'))
+
+_listeners: List[Callable[[Session, datetime], None]] = []
+_lock = threading.RLock()
+_last_tick: Optional[datetime] = None
+_last_poll: Optional[datetime] = None
+
+
+def on_tick(listener: Callable[[Session, datetime], None]):
+    """Register listener(db, tick) to run whenever a new price snapshot lands."""
+    _listeners.append(listener)
+    return listener
+
+
+def latest_tick(db: Session) -> Optional[datetime]:
+    return db.query(func.max(PlayerLatest.date)).scalar()
+
+
+def notify_tick(db: Session, tick: datetime) -> bool:
+    """
+    Run every listener for tick unless it has already been seen. Called by the watcher, or
+    directly by whatever inserted the snapshot. A failing listener is logged and skipped.
+    """
+    global _last_tick, _last_poll
+    with _lock:
+        _last_poll = datetime.now(timezone.utc)
+        if _last_tick is not None and tick <= _last_tick:
+            return False
+        _last_tick = tick
+
+        for listener in list(_listeners):
+            try:
+                listener(db, tick)
+            except Exception as e:
+                logger.exception(f"Tick listener {listener.__name__} failed for {tick}: {e}")
+        return True
+
+
+def is_current(version: Optional[datetime]) -> bool:
+    """
+    Whether state built for tick `version` still reflects the newest tick this worker knows of.
+    State is also treated as stale once the watcher has not checked in for TICK_MAX_LAG_SECONDS.
+    """
+    if version is None or _last_tick is None or _last_poll is None:
+        return False
+    if version < _last_tick:
+        return False
+    return (datetime.now(timezone.utc) - _last_poll).total_seconds() <= TICK_MAX_LAG_SECONDS
+
+
+class TickWatcher:
+    """Background thread that polls max(player_latest.date) and fires the tick listeners."""
+
+    def __init__(self, session_factory, interval: float = TICK_POLL_SECONDS):
+        self.session_factory = session_factory
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def poll(self):
+        with self.session_factory() as db:
+            tick = latest_tick(db)
+            if tick is not None:
+                notify_tick(db, tick)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                logger.error(f"Tick watcher poll failed: {e}")
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='tick-watcher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.interval)
@@ -0,0 +1,75 @@
+from datetime import datetime
+from typing import Optional, Tuple
+import logging
+
+from sqlalchemy import desc
+from sqlalchemy.orm import Session
+
+from app.core.ticks import on_tick, is_current, latest_tick
+from app.models.db_models import User, Player, PlayerLatest, Portfolio, UserLeagues
+from app.models.models import TopLeaderboard, TopLeaderboardEntry
+
+logger = logging.getLogger(__name__)
+
+_cached: Optional[Tuple[datetime, TopLeaderboard]] = None
+
+
+def compute_top_leaderboard(db: Session) -> Optional[TopLeaderboard]:
+    """
+    Leaders of every category from one pass over the players and a walk down the portfolio value
+    index to the most valuable portfolio held in a league. Returns None when any category has no leader yet.
+    """
+    rows = db.query(
+        Player.id, Player.game_name, Player.tag_line, Player.delta_8h, Player.delta_24h, Player.delta_72h,
+        PlayerLatest.league_points, PlayerLatest.price
+    ).join(PlayerLatest, PlayerLatest.player_id == Player.id).all()
+
+    leaders = {'league_points': None, 'delta_8h': None, 'delta_24h': None, 'delta_72h': None}
+    for row in rows:
+        for field, leader in leaders.items():
+            value = getattr(row, field)
+            # Lowest id wins ties; unset deltas never lead
+            if value is not None and (leader is None or (value, -row.id) > (getattr(leader, field), -leader.id)):
+                leaders[field] = row
+
+    # Portfolio.current_value is kept up to date by the revaluation job, so no history scan is needed
+    portfolio_data = db.query(User.username, Portfolio.current_value) \
+        .join(UserLeagues, User.id == UserLeagues.user_id) \
+        .join(Portfolio, Portfolio.id == UserLeagues.portfolio_id) \
+        .filter(Portfolio.current_value.isnot(None)) \
+        .order_by(desc(Portfolio.current_value)) \
+        .first()
+
+    if portfolio_data is None or any(leader is None for leader in leaders.values()):
+        return None
+
+    def entry(field: str, value_field: str = None) -> TopLeaderboardEntry:
+        leader = leaders[field]
+        return TopLeaderboardEntry(name=leader.game_name, tagLine=leader.tag_line, value=getattr(leader, value_field or field))
+
+    return TopLeaderboard(
+        price=entry('league_points', 'price'),
+        delta_8h=entry('delta_8h'),
+        delta_24h=entry('delta_24h'),
+        delta_72h=entry('delta_72h'),
+        portfolio_value=TopLeaderboardEntry(name=portfolio_data[0], value=portfolio_data[1])
+    )
+
+
+@on_tick
+def refresh_top_leaderboard(db: Session, tick: datetime):
+    global _cached
+    _cached = (tick, compute_top_leaderboard(db))
+
+
+def get_top_leaderboard(db: Session) -> Optional[TopLeaderboard]:
+    """The cached leaders for the newest tick; recomputed here only when the cache is stale."""
+    global _cached
+    cached = _cached
+    if cached is not None and is_current(cached[0]) and cached[1] is not None:
+        return cached[1]
+
+    logger.debug("Top leaderboard cache is stale, computing from the database")
+    top_leaderboard = compute_top_leaderboard(db)
+    _cached = (latest_tick(db), top_leaderboard)
+    return top_leaderboard
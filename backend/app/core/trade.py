@@ -0,0 +1,282 @@
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+import logging
+
+from fastapi import HTTPException
+from sqlalchemy import select, insert, update, delete, exists, literal, and_, tuple_, values, column, \
+    Integer, DECIMAL
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.holds import expired_hold_shares
+from app.models.db_models import Player, PlayerLatest, Portfolio, PortfolioPlayer, PortfolioHold, Transaction, \
+    UserLeagues, League
+from app.models.models import OrderRequest, UserIdentity
+
+logger = logging.getLogger(__name__)
+
+HOLD_PERIOD = timedelta(hours=3)
+IDEMPOTENCY_INDEX = 'uq_transactions_portfolio_id_idempotency_key'
+
+
+def reject(detail: str, order: OrderRequest, orders: List[OrderRequest]):
+    # A basket names the leg that failed; a single trade keeps the plain message
+    if len(orders) > 1:
+        detail = f'{detail} ({order.gameName}#{order.tagLine})'
+    raise HTTPException(status_code=400, detail=detail)
+
+
+def price_orders(db: Session, orders: List[OrderRequest]) -> Dict[Tuple[str, str], Tuple[int, Decimal]]:
+    """Round trip 1: every ordered player and its latest price, from one lookup."""
+    names = {(order.gameName, order.tagLine) for order in orders}
+    rows = db.execute(
+        select(Player.id, Player.game_name, Player.tag_line, PlayerLatest.price)
+        .outerjoin(PlayerLatest, PlayerLatest.player_id == Player.id)
+        .where(tuple_(Player.game_name, Player.tag_line).in_(names))
+        .order_by(Player.id)
+    ).all()
+
+    found = {}
+    for row in rows:
+        found.setdefault((row.game_name, row.tag_line), row)
+
+    prices = {}
+    for order in orders:
+        row = found.get((order.gameName, order.tagLine))
+        if row is None:
+            reject('Invalid gameName or tagLine', order, orders)
+        if row.price is None:
+            reject('No league points data available for this player', order, orders)
+        prices[(order.gameName, order.tagLine)] = (row.id, Decimal(row.price))
+    return prices
+
+
+def lock_account(db: Session, user: UserIdentity, player_ids: List[int], idempotency_key: Optional[str],
+                 now: datetime):
+    """
+    Round trips 2 and 3: lock the user's row in their current league, then read everything the
+    orders are validated against, i.e. balance, league end, the holdings of the ordered players
+    with their shares on hold and whether the idempotency key was already used. Shares on hold
+    come from the maintained locked_shares less any expired holds the sweeper has not removed
+    yet, so only those few hold rows are read.
+
+    The lock serializes trades and hold sweeps on the same portfolio. It is taken in a statement
+    of its own because under READ COMMITTED a statement that waited on a row lock only re-reads
+    the locked row; the read that follows starts after the lock is granted, so it sees whatever
+    the previous holder committed, and nothing it reads can change before the orders commit.
+    Returns the account row and the holdings by player id.
+    """
+    account_id = db.execute(
+        select(UserLeagues.id)
+        .where(and_(UserLeagues.user_id == user.id, UserLeagues.league_id == user.current_league_id))
+        .order_by(UserLeagues.id)
+        .limit(1)
+        .with_for_update()
+    ).scalar()
+    if account_id is None:
+        raise HTTPException(status_code=404, detail='User not associated with current league')
+
+    if idempotency_key is None:
+        replayed = literal(False)
+    else:
+        replayed = exists().where(and_(
+            Transaction.portfolio_id == UserLeagues.portfolio_id,
+            Transaction.idempotency_key == idempotency_key
+        ))
+
+    # One row per held player, or a single row with null holding columns when none is held
+    rows = db.execute(
+        select(
+            UserLeagues.id, UserLeagues.balance, UserLeagues.portfolio_id,
+            League.id.label('league_id'), League.end_date,
+            PortfolioPlayer.id.label('holding_id'), PortfolioPlayer.player_id, PortfolioPlayer.shares,
+            PortfolioPlayer.purchase_price, PortfolioPlayer.locked_shares,
+            (PortfolioPlayer.locked_shares - expired_hold_shares(now)).label('on_hold'), replayed.label('replayed')
+        )
+        .select_from(UserLeagues)
+        .outerjoin(League, League.id == UserLeagues.league_id)
+        .outerjoin(PortfolioPlayer, and_(
+            PortfolioPlayer.portfolio_id == UserLeagues.portfolio_id,
+            PortfolioPlayer.player_id.in_(player_ids)
+        ))
+        .where(UserLeagues.id == account_id)
+    ).all()
+
+    account = rows[0]
+    if account.league_id is None:
+        raise HTTPException(status_code=404, detail='League not found')
+
+    holdings = {
+        row.player_id: {'id': row.holding_id, 'shares': row.shares, 'purchase_price': row.purchase_price,
+                        'locked_shares': row.locked_shares, 'on_hold': row.on_hold}
+        for row in rows if row.holding_id is not None
+    }
+    return account, holdings
+
+
+def insert_rows(model, rows: List[dict], name: str):
+    """Multi-row INSERT ... SELECT from a typed VALUES list, which unlike insert().values(rows) can sit in a CTE."""
+    keys = list(rows[0])
+    table = model.__table__
+    rows_values = values(*[column(key, table.c[key].type) for key in keys], name=name) \
+        .data([tuple(row[key] for key in keys) for row in rows])
+    return insert(model).from_select(keys, select(rows_values))
+
+
+def orders_statement(account, holdings: dict, portfolio_id: int, orders: List[OrderRequest],
+                     prices: Dict[Tuple[str, str], Tuple[int, Decimal]], idempotency_key: Optional[str],
+                     now: datetime):
+    """
+    Round trip 4: apply the orders in sequence to the locked balance and holdings, then write
+    the result as one multi-row INSERT of the transactions carrying the balance update, the
+    holding changes and the new holds as data-modifying CTEs. Shares bought in the basket are
+    on hold like any other purchase, so they cannot be sold in the same basket. Raises
+    HTTPException when the account cannot cover an order.
+    """
+    balance = account.balance
+    changed = set()
+    holds, transactions = [], []
+
+    for order in orders:
+        player_id, price = prices[(order.gameName, order.tagLine)]
+        shares = order.shares
+        total = shares * price
+        holding = holdings.get(player_id)
+
+        if order.type == 'buy':
+            if balance < total:
+                reject('Insufficient Balance', order, orders)
+            balance -= total
+
+            if holding is None:
+                holding = holdings[player_id] = {'id': None, 'shares': 0, 'purchase_price': price,
+                                                 'locked_shares': 0, 'on_hold': 0}
+            owned = holding['shares']
+            holding['purchase_price'] = ((holding['purchase_price'] * owned) + (price * shares)) / (owned + shares)
+            holding['shares'] = owned + shares
+            holding['locked_shares'] += shares
+            holding['on_hold'] += shares
+            holds.append({'portfolio_id': portfolio_id, 'player_id': player_id,
+                          'hold_deadline': now + HOLD_PERIOD, 'shares': shares})
+        else:
+            if holding is None or holding['shares'] < shares:
+                reject('Insufficient Shares', order, orders)
+            if shares > holding['shares'] - holding['on_hold']:
+                reject('Insufficient Free Shares', order, orders)
+            balance += total
+            holding['shares'] -= shares
+
+        changed.add(player_id)
+        transactions.append({
+            'portfolio_id': portfolio_id,
+            'type': order.type,
+            'player_id': player_id,
+            'shares': shares,
+            'price': price,
+            'transaction_date': now,
+            # The key marks the basket once; the unique index allows one row per key
+            'idempotency_key': idempotency_key if not transactions else None
+        })
+
+    inserted, updated, deleted = [], [], []
+    for player_id in changed:
+        holding = holdings[player_id]
+        if holding['id'] is None:
+            inserted.append({'portfolio_id': portfolio_id, 'player_id': player_id,
+                             'purchase_price': holding['purchase_price'], 'shares': holding['shares'],
+                             'locked_shares': holding['locked_shares']})
+        elif holding['shares'] == 0:
+            deleted.append(player_id)
+        else:
+            # Absolute values, read after the account lock was granted: the sweeper takes the same
+            # lock, so a sweep either committed before that read or waits for this trade to commit
+            updated.append((holding['id'], holding['shares'], holding['purchase_price'], holding['locked_shares']))
+
+    writes = [update(UserLeagues).where(UserLeagues.id == account.id)
+              .values(balance=balance, portfolio_id=portfolio_id)]
+    if inserted:
+        writes.append(insert_rows(PortfolioPlayer, inserted, 'new_holdings'))
+    if updated:
+        changes = values(
+            column('id', Integer), column('shares', Integer), column('purchase_price', DECIMAL),
+            column('locked_shares', Integer), name='holding_changes'
+        ).data(updated)
+        writes.append(update(PortfolioPlayer).where(PortfolioPlayer.id == changes.c.id)
+                      .values(shares=changes.c.shares, purchase_price=changes.c.purchase_price,
+                              locked_shares=changes.c.locked_shares))
+    if deleted:
+        # Selling out needs every share free, so whatever holds remain have expired; dropping them
+        # with the holding keeps a later sweep from releasing them from a re-bought holding
+        writes.append(delete(PortfolioPlayer).where(and_(PortfolioPlayer.portfolio_id == portfolio_id,
+                                                         PortfolioPlayer.player_id.in_(deleted))))
+        writes.append(delete(PortfolioHold).where(and_(PortfolioHold.portfolio_id == portfolio_id,
+                                                       PortfolioHold.player_id.in_(deleted))))
+    if holds:
+        writes.append(insert_rows(PortfolioHold, holds, 'new_holds'))
+
+    statement = insert_rows(Transaction, transactions, 'new_transactions')
+    for i, write in enumerate(writes):
+        statement = statement.add_cte(write.cte(f'trade_write_{i}'))
+    return statement
+
+
+def execute_orders(db: Session, user: UserIdentity, orders: List[OrderRequest],
+                   idempotency_key: Optional[str] = None) -> bool:
+    """
+    Buy and sell shares in the user's current league, all or nothing.
+
+    Pricing, validation and the writes take four round trips plus the commit whatever the
+    number of orders, with the user's league row locked in between. A repeated idempotency_key
+    for the same portfolio is not applied again. Returns False for such a replay, True when
+    the orders were executed.
+    """
+    now = datetime.now(timezone.utc)
+    try:
+        prices = price_orders(db, orders)
+        player_ids = sorted({player_id for player_id, _ in prices.values()})
+        account, holdings = lock_account(db, user, player_ids, idempotency_key, now)
+
+        if account.replayed:
+            db.rollback()
+            logger.info(f'Replayed transaction {idempotency_key} for user {user.username}')
+            return False
+
+        if now > account.end_date:
+            raise HTTPException(status_code=400, detail='The league has ended, transactions are not allowed')
+
+        portfolio_id = account.portfolio_id
+        if portfolio_id is None:
+            portfolio_id = db.execute(insert(Portfolio).values(current_value=0).returning(Portfolio.id)).scalar_one()
+
+        db.execute(orders_statement(account, holdings, portfolio_id, orders, prices, idempotency_key, now))
+        db.commit()
+        summary = ', '.join(f'{order.type} {order.shares} shares of {order.gameName}' for order in orders)
+        logger.info(f'Transaction successful for user {user.username}: {summary}')
+        return True
+
+    except HTTPException as e:
+        db.rollback()
+        logger.error(f"Transaction failed for user {user.username}: {e.detail}")
+        raise e
+
+    except IntegrityError as e:
+        db.rollback()
+        # The same key committed by a concurrent request after this one's snapshot was taken
+        if idempotency_key is not None and IDEMPOTENCY_INDEX in str(e.orig):
+            logger.info(f'Replayed transaction {idempotency_key} for user {user.username}')
+            return False
+        logger.error(f"Unexpected error during transaction for user {user.username}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f'Failed to update user data in the database: {str(e)}')
+
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Unexpected error during transaction for user {user.username}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f'Failed to update user data in the database: {str(e)}')
+
+
+def execute_trade(db: Session, user: UserIdentity, game_name: str, tag_line: str, transaction_type: str,
+                  shares: int, idempotency_key: Optional[str] = None) -> bool:
+    """A single buy or sell, executed as a basket of one order."""
+    order = OrderRequest(gameName=game_name, tagLine=tag_line, type=transaction_type, shares=shares)
+    return execute_orders(db, user, [order], idempotency_key)
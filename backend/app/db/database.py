@@ -1,22 +1,70 @@
+import os
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from contextlib import contextmanager
+from app.db.instrumentation import InstrumentedQueuePool, InstrumentedAsyncQueuePool, instrument_engine
+from app.db.routing import ReplicaMonitor
 from app.utils.get_secret import get_secret  # Adjust the import path as necessary
 
-# Fetch secrets from AWS Secrets Manager
+# Fetch secrets from AWS Secrets Manager, unless the database is given directly (local development)
 secret_name = "tft-stocks-keys"
-secrets = get_secret(secret_name)
+secrets = {} if os.getenv('DATABASE_URL') else get_secret(secret_name)
 
 # Extract the database URL from the secrets
-DATABASE_URL = secrets["database_url"]
+DATABASE_URL = os.getenv('DATABASE_URL') or secrets["database_url"]
+
+# Connection pool settings, per engine and per worker process
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))  # Seconds, stays under RDS/proxy idle timeouts
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', '0'))  # 0 leaves the server default
+
+POOL_OPTIONS = dict(
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=DB_POOL_PRE_PING,
+)
 
 # Create the SQLAlchemy engine
-engine = create_engine(DATABASE_URL)
+engine = create_engine(DATABASE_URL, poolclass=InstrumentedQueuePool, **POOL_OPTIONS)
+instrument_engine(engine, 'primary', DB_STATEMENT_TIMEOUT_MS)
 
 # Create a configured "Session" class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Same database through asyncpg, for endpoints that must not block the event loop while they wait on it
+ASYNC_DATABASE_URL = os.getenv('ASYNC_DATABASE_URL') or make_url(DATABASE_URL).set(drivername='postgresql+asyncpg')
+async_engine = create_async_engine(ASYNC_DATABASE_URL, poolclass=InstrumentedAsyncQueuePool, **POOL_OPTIONS)
+instrument_engine(async_engine.sync_engine, 'primary_async', DB_STATEMENT_TIMEOUT_MS)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+# Optional read replica for endpoints that never write. Without one, read sessions use the primary.
+REPLICA_DATABASE_URL = secrets.get("replica_database_url") or os.getenv('REPLICA_DATABASE_URL')
+REPLICA_MAX_LAG_SECONDS = float(os.getenv('REPLICA_MAX_LAG_SECONDS', '30'))
+REPLICA_CHECK_SECONDS = float(os.getenv('REPLICA_CHECK_SECONDS', '5'))
+
+replica_engine = None
+async_replica_engine = None
+if REPLICA_DATABASE_URL:
+    replica_engine = create_engine(REPLICA_DATABASE_URL, poolclass=InstrumentedQueuePool, **POOL_OPTIONS)
+    instrument_engine(replica_engine, 'replica', DB_STATEMENT_TIMEOUT_MS)
+
+    ASYNC_REPLICA_DATABASE_URL = os.getenv('ASYNC_REPLICA_DATABASE_URL') or \
+        make_url(REPLICA_DATABASE_URL).set(drivername='postgresql+asyncpg')
+    async_replica_engine = create_async_engine(ASYNC_REPLICA_DATABASE_URL, poolclass=InstrumentedAsyncQueuePool,
+                                               **POOL_OPTIONS)
+    instrument_engine(async_replica_engine.sync_engine, 'replica_async', DB_STATEMENT_TIMEOUT_MS)
+
+replica_monitor = ReplicaMonitor(replica_engine, REPLICA_MAX_LAG_SECONDS, REPLICA_CHECK_SECONDS)
+
 # Create a Base class for declarative class definitions
 Base = declarative_base()
 
@@ -35,3 +83,28 @@ def get_db():
         yield db
     finally:
         db.close()
+
+def get_read_db():
+    """Read-only session: the replica while it is healthy, the primary otherwise. Never write through it."""
+    db = SessionLocal(bind=replica_engine) if replica_monitor.healthy() else SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_read_db():
+    """Async counterpart of get_read_db."""
+    if replica_monitor.healthy():
+        db = AsyncSessionLocal(bind=async_replica_engine)
+    else:
+        db = AsyncSessionLocal()
+    async with db:
+        yield db
+
+async def get_async_db():
+    """
+    AsyncSession for the request. Existing db.query code runs on it unchanged through
+    `await db.run_sync(fn, ...)`, which awaits the driver instead of blocking the loop.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
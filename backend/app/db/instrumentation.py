@@ -0,0 +1,171 @@
+from contextvars import ContextVar
+from collections import defaultdict
+from dataclasses import dataclass
+from time import perf_counter
+from typing import Dict, Optional
+import threading
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+
+@dataclass
+class RequestMetrics:
+    queries: int = 0
+    db_seconds: float = 0.0
+    pool_wait_seconds: float = 0.0
+    checkouts: int = 0
+
+
+@dataclass
+class RouteStats:
+    requests: int = 0
+    queries: int = 0
+    db_seconds: float = 0.0
+    pool_wait_seconds: float = 0.0
+    max_pool_wait_seconds: float = 0.0
+    total_seconds: float = 0.0
+
+
+@dataclass
+class PoolStats:
+    checkouts: int = 0
+    wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+    timeouts: int = 0
+
+
+# Set by the request middleware; queries outside a request (jobs, the tick watcher) are not attributed
+current_request_metrics: ContextVar[Optional[RequestMetrics]] = ContextVar('current_request_metrics', default=None)
+
+_lock = threading.Lock()
+route_stats: Dict[str, RouteStats] = defaultdict(RouteStats)
+pool_stats: Dict[str, PoolStats] = defaultdict(PoolStats)
+
+
+class _TimedCheckout:
+    """Times Pool.connect(): how long a caller waited for a connection, including opening a new one."""
+
+    stats_name = 'pool'
+
+    def connect(self):
+        start = perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            with _lock:
+                pool_stats[self.stats_name].timeouts += 1
+            raise
+        finally:
+            waited = perf_counter() - start
+            with _lock:
+                stats = pool_stats[self.stats_name]
+                stats.checkouts += 1
+                stats.wait_seconds += waited
+                stats.max_wait_seconds = max(stats.max_wait_seconds, waited)
+            metrics = current_request_metrics.get()
+            if metrics is not None:
+                metrics.checkouts += 1
+                metrics.pool_wait_seconds += waited
+
+
+class InstrumentedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+def record_query(elapsed: float):
+    metrics = current_request_metrics.get()
+    if metrics is not None:
+        metrics.queries += 1
+        metrics.db_seconds += elapsed
+
+
+def instrument_engine(engine, name: str, statement_timeout_ms: int = 0):
+    """
+    Attach query timing and the per-connection statement timeout to a (sync) engine, and report
+    its pool under name. For an AsyncEngine pass async_engine.sync_engine.
+    """
+    engine.pool.stats_name = name
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        record_query(perf_counter() - conn.info['query_start'].pop())
+
+    @event.listens_for(engine, 'handle_error')
+    def handle_error(context):
+        # after_cursor_execute never runs for a failed statement (a statement timeout included), so
+        # its start is popped here; errors on connect or before execution have none pushed
+        starts = context.connection.info.get('query_start') if context.connection is not None else None
+        if context.execution_context is not None and starts:
+            record_query(perf_counter() - starts.pop())
+
+    if statement_timeout_ms:
+        @event.listens_for(engine, 'connect')
+        def set_statement_timeout(dbapi_connection, connection_record):
+            # Committed so the pool's rollback on return does not undo it
+            cursor = dbapi_connection.cursor()
+            cursor.execute(f"SET statement_timeout = {int(statement_timeout_ms)}")
+            cursor.close()
+            dbapi_connection.commit()
+
+
+def record_request(route: str, metrics: RequestMetrics, total_seconds: float):
+    with _lock:
+        stats = route_stats[route]
+        stats.requests += 1
+        stats.queries += metrics.queries
+        stats.db_seconds += metrics.db_seconds
+        stats.pool_wait_seconds += metrics.pool_wait_seconds
+        stats.max_pool_wait_seconds = max(stats.max_pool_wait_seconds, metrics.pool_wait_seconds)
+        stats.total_seconds += total_seconds
+
+
+def server_timing(metrics: RequestMetrics, total_seconds: float) -> str:
+    return ', '.join([
+        f'db;dur={metrics.db_seconds * 1000:.1f};desc="{metrics.queries} queries"',
+        f'pool;dur={metrics.pool_wait_seconds * 1000:.1f};desc="{metrics.checkouts} checkouts"',
+        f'total;dur={total_seconds * 1000:.1f}',
+    ])
+
+
+def pool_status(pool) -> dict:
+    return {
+        'size': pool.size(),
+        'checked_out': pool.checkedout(),
+        'checked_in': pool.checkedin(),
+        'overflow': pool.overflow(),
+    }
+
+
+def snapshot_metrics(pools: Dict[str, object]) -> dict:
+    with _lock:
+        routes = {
+            route: {
+                'requests': stats.requests,
+                'avg_queries': stats.queries / stats.requests,
+                'avg_db_ms': stats.db_seconds * 1000 / stats.requests,
+                'avg_pool_wait_ms': stats.pool_wait_seconds * 1000 / stats.requests,
+                'max_pool_wait_ms': stats.max_pool_wait_seconds * 1000,
+                'avg_total_ms': stats.total_seconds * 1000 / stats.requests,
+            }
+            for route, stats in route_stats.items()
+        }
+        pools_out = {}
+        for name, pool in pools.items():
+            stats = pool_stats[name]
+            pools_out[name] = {
+                **pool_status(pool),
+                'checkouts': stats.checkouts,
+                'timeouts': stats.timeouts,
+                'avg_wait_ms': stats.wait_seconds * 1000 / stats.checkouts if stats.checkouts else 0.0,
+                'max_wait_ms': stats.max_wait_seconds * 1000,
+            }
+    return {'pools': pools_out, 'routes': routes}
@@ -0,0 +1,73 @@
+from time import monotonic
+from typing import Optional
+import logging
+import threading
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+# 0 on a standalone database (e.g. a second local instance standing in for the replica) and on a
+# replica that has replayed everything it received; otherwise seconds since the last replayed commit
+REPLICA_LAG_SQL = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+
+class ReplicaMonitor:
+    """
+    Tracks whether read-only traffic may go to the replica.
+
+    A background thread measures replication lag every check_interval seconds. The replica is
+    used only while it is configured, the last check succeeded recently and the lag is within
+    max_lag seconds; in every other case reads fall back to the primary.
+    """
+
+    def __init__(self, engine, max_lag: float, check_interval: float):
+        self.engine = engine
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.lag: Optional[float] = None
+        self.checked_at: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def check(self) -> Optional[float]:
+        try:
+            with self.engine.connect() as connection:
+                self.lag = float(connection.execute(REPLICA_LAG_SQL).scalar())
+        except Exception as e:
+            logger.warning(f"Replica check failed, reads fall back to the primary: {e}")
+            self.lag = None
+        self.checked_at = monotonic()
+        return self.lag
+
+    def healthy(self) -> bool:
+        if self.engine is None or self.lag is None or self.checked_at is None:
+            return False
+        if monotonic() - self.checked_at > 3 * self.check_interval:
+            return False
+        return self.lag <= self.max_lag
+
+    def _run(self):
+        while not self._stop.is_set():
+            was_healthy = self.healthy()
+            self.check()
+            if self.healthy() != was_healthy:
+                logger.info(f"Replica {'in use' if self.healthy() else 'bypassed'}, lag={self.lag}")
+            self._stop.wait(self.check_interval)
+
+    def start(self):
+        if self.engine is None:
+            return
+        self._thread = threading.Thread(target=self._run, name='replica-monitor', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.check_interval)
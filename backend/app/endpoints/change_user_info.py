@@ -3,9 +3,9 @@ from fastapi.security import OAuth2PasswordBearer
 from passlib.context import CryptContext
 from sqlalchemy.orm import Session
 
-from app.core.token import get_user_from_token
+from app.core.token import get_current_identity
 from app.db.database import get_db
-from app.models.models import UserSelf, PasswordUpdateModel, UsernameChangeRequest
+from app.models.models import UserIdentity, PasswordUpdateModel, UsernameChangeRequest
 from app.models.db_models import User
 
 router = APIRouter()
@@ -15,14 +15,14 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 @router.put("/change_username")
-async def change_username(request: UsernameChangeRequest, user_data: UserSelf = Depends(get_user_from_token), db: Session = Depends(get_db)):
+async def change_username(request: UsernameChangeRequest, user_data: UserIdentity = Depends(get_current_identity), db: Session = Depends(get_db)):
     username_lower = request.newUsername.lower()
     # Find if new username already exists
     if db.query(User).filter(User.username == username_lower).first():
         raise HTTPException(status_code=400, detail="Username already taken")
 
     # Update username
-    user = db.query(User).filter(User.username == user_data.username).first()
+    user = db.get(User, user_data.id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -32,8 +32,8 @@ async def change_username(request: UsernameChangeRequest, user_data: UserSelf =
     return {"message": "Username updated successfully"}
 
 @router.put("/change_password")
-async def change_password(passwords: PasswordUpdateModel = Body(...), user_data: UserSelf = Depends(get_user_from_token), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.username == user_data.username).first()
+async def change_password(passwords: PasswordUpdateModel = Body(...), user_data: UserIdentity = Depends(get_current_identity), db: Session = Depends(get_db)):
+    user = db.get(User, user_data.id)
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
 
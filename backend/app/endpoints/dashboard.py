@@ -1,19 +1,21 @@
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models.models import UserProfile
-from app.core.token import get_user_from_token
+from app.core.profile import build_user_profile
+from app.core.token import get_current_identity_async
+from app.db.database import get_async_db
+from app.models.models import UserProfile, UserIdentity
 from app.utils.portfolio_change import portfolio_change
-from app.utils.portfolio_refresh import portfolio_refresh
 
 router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl='login')
 
 @router.get('/dashboard', response_model=UserProfile)
-async def read_dashboard(current_user: UserProfile = Depends(get_user_from_token)):
+async def read_dashboard(current_user: UserIdentity = Depends(get_current_identity_async), db: AsyncSession = Depends(get_async_db)):
     try:
-        refreshed_user_data = portfolio_refresh(current_user)
-        updated_user_data = portfolio_change(refreshed_user_data)
+        current_profile = await db.run_sync(build_user_profile, current_user)
+        updated_user_data = portfolio_change(current_profile)
     except Exception as e:
         print(f"Error processing dashboard data: {e}")
         raise HTTPException(status_code=500, detail="Error processing dashboard data")
@@ -0,0 +1,51 @@
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.export import MEDIA_TYPES, export_scope, transactions_export, portfolio_history_export, stream_export
+from app.core.token import get_current_identity_async
+from app.db.database import get_async_db
+from app.models.models import UserIdentity
+
+router = APIRouter()
+
+EXPORTS = {
+    'transactions': transactions_export,
+    'portfolio_history': portfolio_history_export,
+}
+
+
+async def export_response(name: str, fmt: str, league_id: Optional[int], members: bool,
+                          current_user: UserIdentity, db: AsyncSession) -> StreamingResponse:
+    league_id, user_id = await db.run_sync(export_scope, current_user, league_id, members)
+    # The request's connection is not needed while the export streams; stream_export takes its own
+    await db.close()
+    return StreamingResponse(
+        stream_export(EXPORTS[name](league_id, user_id), fmt),
+        media_type=MEDIA_TYPES[fmt],
+        headers={'Content-Disposition': f'attachment; filename="{name}_{league_id}.{fmt}"'}
+    )
+
+
+@router.get('/export/transactions')
+async def export_transactions(
+        fmt: Literal['csv', 'ndjson'] = Query(default='csv', alias='format'),
+        league_id: Optional[int] = Query(default=None),
+        members: bool = Query(default=False),
+        current_user: UserIdentity = Depends(get_current_identity_async),
+        db: AsyncSession = Depends(get_async_db)
+):
+    return await export_response('transactions', fmt, league_id, members, current_user, db)
+
+
+@router.get('/export/portfolio_history')
+async def export_portfolio_history(
+        fmt: Literal['csv', 'ndjson'] = Query(default='csv', alias='format'),
+        league_id: Optional[int] = Query(default=None),
+        members: bool = Query(default=False),
+        current_user: UserIdentity = Depends(get_current_identity_async),
+        db: AsyncSession = Depends(get_async_db)
+):
+    return await export_response('portfolio_history', fmt, league_id, members, current_user, db)
@@ -1,39 +1,38 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.core.token import get_user_from_token
-from app.db.database import get_db
-from app.models.models import UserProfile, FavoritesEntry, FavoritesResponse
-from app.models.db_models import User, Favorite, Player, PlayerData
-from app.models.pricing_model import price_model
+from app.core.token import get_current_identity_async
+from app.db.database import get_async_db
+from app.models.models import UserIdentity, FavoritesEntry, FavoritesResponse
+from app.models.db_models import Favorite, Player, PlayerLatest
 
 router = APIRouter()
 
 @router.get('/favorites', response_model=FavoritesResponse)
-async def get_favorites(current_user: UserProfile = Depends(get_user_from_token), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.username == current_user.username).first()
-    if not user:
-        raise HTTPException(status_code=404, detail='User not found')
+async def get_favorites(current_user: UserIdentity = Depends(get_current_identity_async), db: AsyncSession = Depends(get_async_db)):
+    return await db.run_sync(load_favorites, current_user)
 
-    favorites = []
-    favorite_entries = db.query(Favorite).filter(Favorite.user_id == user.id).all()
 
-    for entry in favorite_entries:
-        player = db.query(Player).filter(Player.id == entry.player_id).first()
-        if player:
-            # Fetch the latest player data for the player
-            player_data = db.query(PlayerData).filter(PlayerData.player_id == player.id).order_by(PlayerData.date.desc()).first()
+def load_favorites(db: Session, current_user: UserIdentity) -> FavoritesResponse:
+    favorites = []
+    # Favorited players joined with their latest price in one query
+    favorite_entries = db.query(Player, PlayerLatest.price) \
+        .join(Favorite, Favorite.player_id == Player.id) \
+        .join(PlayerLatest, PlayerLatest.player_id == Player.id) \
+        .filter(Favorite.user_id == current_user.id) \
+        .order_by(Favorite.id) \
+        .all()
 
-            if player_data:
-                current_price = price_model(player_data.league_points)
-                fav_entry = FavoritesEntry(
-                    name=player.game_name,
-                    current_price=current_price,
-                    eight_hour_change=player.delta_8h,
-                    one_day_change=player.delta_24h,
-                    three_day_change=player.delta_72h,
-                    tag_line=player.tag_line
-                )
-                favorites.append(fav_entry)
+    for player, current_price in favorite_entries:
+        fav_entry = FavoritesEntry(
+            name=player.game_name,
+            current_price=current_price,
+            eight_hour_change=player.delta_8h,
+            one_day_change=player.delta_24h,
+            three_day_change=player.delta_72h,
+            tag_line=player.tag_line
+        )
+        favorites.append(fav_entry)
 
     return FavoritesResponse(favorites=favorites)
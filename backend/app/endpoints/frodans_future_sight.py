@@ -1,15 +1,16 @@
-from datetime import timezone
+from datetime import datetime, timezone
 
-from fastapi import HTTPException, Depends, APIRouter
+from fastapi import HTTPException, Depends, APIRouter, Query
 from sqlalchemy import and_, desc
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 
-from app.models.models import FutureSightCreate, UserProfile, LeaderboardUser, Pick
+from app.models.models import FutureSightCreate, UserIdentity, LeaderboardUser, Pick
 from app.models.db_models import User, Player, FutureSight, FutureSightPick, FutureSightQuestion, RegionalsPlayers, \
     RegionalsNonna, RegionalsData, PlayerData
-from app.db.database import get_db
-from app.core.token import get_user_from_token
+from app.core.price_history import history_payload, latest_history_date, load_lp_history, validate_resolution
+from app.db.database import get_db, get_read_db
+from app.core.token import get_current_identity
 
 router = APIRouter()
 
@@ -17,26 +18,21 @@ router = APIRouter()
 @router.post('/ffs')
 async def create_future_sight(
         future_sight_data: FutureSightCreate,
-        user: UserProfile = Depends(get_user_from_token),
+        user: UserIdentity = Depends(get_current_identity),
         db: Session = Depends(get_db)
 ):
     if not user:
         raise HTTPException(status_code=404, detail='User not found')
 
-    # Check if user exists in the database
-    user_record = db.query(User).filter(User.username == user.username).first()
-    if not user_record:
-        raise HTTPException(status_code=404, detail='User not found in database')
-
     # Check if user already has a FutureSight entry
-    existing_future_sight = db.query(FutureSight).filter(FutureSight.user_id == user_record.id).first()
+    existing_future_sight = db.query(FutureSight).filter(FutureSight.user_id == user.id).first()
     if existing_future_sight:
         raise HTTPException(status_code=409, detail='User already has a FutureSight entry')
 
     try:
         # Create a new FutureSight entry
         new_future_sight = FutureSight(
-            user_id=user_record.id,
+            user_id=user.id,
             current_points=0
         )
         db.add(new_future_sight)
@@ -80,7 +76,7 @@ async def create_future_sight(
 
 
 @router.get('/ffs/players')
-async def get_regionals_players(db: Session = Depends(get_db)):
+async def get_regionals_players(db: Session = Depends(get_read_db)):
     try:
         # Get players from both tables
         regionals_players = db.query(RegionalsPlayers).all()
@@ -114,7 +110,15 @@ async def get_regionals_players(db: Session = Depends(get_db)):
 
 
 @router.get('/ffs/players/{gameName}/{tagLine}')
-async def player_info(gameName: str, tagLine: str, db: Session = Depends(get_db)):
+async def player_info(
+        gameName: str,
+        tagLine: str,
+        start: datetime = Query(default=None),
+        end: datetime = Query(default=None),
+        resolution: str = Query(default='raw'),
+        db: Session = Depends(get_read_db)
+):
+    validate_resolution(resolution)
     try:
         # Determine which table to fetch from
         player = db.query(RegionalsNonna).filter(
@@ -122,29 +126,23 @@ async def player_info(gameName: str, tagLine: str, db: Session = Depends(get_db)
         ).first()
 
         if player:
-            # Fetch the player data history from the regionals_data table
-            player_data = db.query(RegionalsData).filter(RegionalsData.player_id == player.id).order_by(
-                RegionalsData.date
-            ).all()
-            if not player_data:
-                raise HTTPException(status_code=404, detail="Player data not found")
+            # Regionals-only players keep their history in the regionals_data table
+            history_model = RegionalsData
         else:
             # Fetch the player data from the players table
             player = db.query(Player).filter(and_(Player.game_name == gameName, Player.tag_line == tagLine)).first()
             if not player:
                 raise HTTPException(status_code=404, detail="Player not found")
+            history_model = PlayerData
 
-            # Fetch the player data history from player_data table
-            player_data = db.query(PlayerData).filter(PlayerData.player_id == player.id).order_by(PlayerData.date).all()
-            if not player_data:
-                raise HTTPException(status_code=404, detail="Player data not found")
+        info_date = latest_history_date(db, history_model, player.id)
+        if info_date is None:
+            raise HTTPException(status_code=404, detail="Player data not found")
 
-        # Extract date and league points from player data
-        date_history = [str(data.date) for data in player_data]
-        price_history = [data.league_points for data in player_data]
+        # Fetch only the requested window of the history, bucketed to the requested resolution
+        history = history_payload(load_lp_history(db, history_model, player.id, start, end), resolution)
 
         # Get the most recent date and ensure it's timezone-aware
-        info_date = player_data[-1].date
         if info_date.tzinfo is None:
             info_date = info_date.replace(tzinfo=timezone.utc)
 
@@ -153,41 +151,34 @@ async def player_info(gameName: str, tagLine: str, db: Session = Depends(get_db)
 
         return {
             'name': player.game_name,
-            'price': price_history,
-            'date': date_history,
+            **history,
             'date_updated': utc_date,
             '8 Hour Change': player.delta_8h,
             '24 Hour Change': player.delta_24h,
             '3 Day Change': player.delta_72h,
         }
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get('/ffs/has_future_sight')
 async def has_future_sight(
-        user: UserProfile = Depends(get_user_from_token),
+        user: UserIdentity = Depends(get_current_identity),
         db: Session = Depends(get_db)
 ):
     if not user:
         raise HTTPException(status_code=404, detail='User not found')
 
-    user_record = db.query(User).filter(User.username == user.username).first()
-    if not user_record:
-        raise HTTPException(status_code=404, detail='User not found in database')
-
-    future_sight_entry = db.query(FutureSight).filter(FutureSight.user_id == user_record.id).first()
+    future_sight_entry = db.query(FutureSight).filter(FutureSight.user_id == user.id).first()
 
     return {"hasFutureSight": bool(future_sight_entry)}
 
 
 @router.get('/ffs/user_future_sight')
-async def get_user_future_sight(user: UserProfile = Depends(get_user_from_token), db: Session = Depends(get_db)):
-    user_record = db.query(User).filter(User.username == user.username).first()
-    if not user_record:
-        raise HTTPException(status_code=404, detail='User not found')
-
-    future_sight = db.query(FutureSight).filter(FutureSight.user_id == user_record.id).first()
+async def get_user_future_sight(user: UserIdentity = Depends(get_current_identity), db: Session = Depends(get_db)):
+    future_sight = db.query(FutureSight).filter(FutureSight.user_id == user.id).first()
     if not future_sight:
         return {"ranking": [], "questions": []}
 
@@ -214,7 +205,7 @@ async def get_user_future_sight(user: UserProfile = Depends(get_user_from_token)
 
 
 @router.get('/ffs/leaderboard', response_model=list[LeaderboardUser])
-async def get_leaderboard(db: Session = Depends(get_db)):
+async def get_leaderboard(db: Session = Depends(get_read_db)):
     try:
         # Get users with FutureSight data, ordered by current_points
         future_sight_users = db.query(FutureSight).order_by(desc(FutureSight.current_points)).all()
@@ -1,11 +1,13 @@
+from typing import Optional
+
 from fastapi import APIRouter, HTTPException, status, Query, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models.db_models import User
-from app.models.models import LeaderboardResponse, PortfolioLeaderboardResponse, UserProfile
-from app.core.logic import fetch_leaderboard_entries, fetch_portfolio_leaderboard
-from app.db.database import get_db
-from app.core.token import get_user_from_token  # Ensure you have the get_user_from_token dependency
+from app.models.models import LeaderboardResponse, PortfolioLeaderboardResponse, UserIdentity
+from app.core.leaderboard_snapshot import current_leaderboard_snapshot
+from app.core.logic import fetch_leaderboard_entries, fetch_portfolio_leaderboard, fetch_portfolio_leaderboard_around
+from app.db.database import get_async_read_db
+from app.core.token import get_current_identity_read
 import logging
 
 router = APIRouter()
@@ -20,29 +22,40 @@ def response_model_selector(lead_type: str):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid leaderboard type")
 
 
+@router.get('/leaderboard/portfolio/around_me', response_model=PortfolioLeaderboardResponse)
+async def get_portfolio_leaderboard_around_me(
+        n: int = Query(default=5, ge=1, le=50),
+        db: AsyncSession = Depends(get_async_read_db),
+        current_user: UserIdentity = Depends(get_current_identity_read)
+):
+    entries = await db.run_sync(lambda session: fetch_portfolio_leaderboard_around(current_user=current_user, n=n, db=session))
+    return PortfolioLeaderboardResponse(leaderboard_type="portfolio", entries=entries)
+
+
 @router.get('/leaderboard/{lead_type}')
 async def get_leaderboard(
         lead_type: str,
         response_model=Depends(response_model_selector),
         limit: int = Query(default=100, ge=1),
         page: int = Query(default=0, ge=0),
-        db: Session = Depends(get_db),
-        current_user: UserProfile = Depends(get_user_from_token)
+        cursor: Optional[str] = Query(default=None),
+        db: AsyncSession = Depends(get_async_read_db),
+        current_user: UserIdentity = Depends(get_current_identity_read)
 ):
     try:
-        logging.debug(f"Fetching user with username: {current_user.username}")
-        user = db.query(User).filter(User.username == current_user.username).first()
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-
-        logging.debug(f"User found: {user}")
-
         if lead_type == "portfolio":
-            entries = fetch_portfolio_leaderboard(current_user=user, page=page, limit=limit, db=db)
+            entries, next_cursor = await db.run_sync(lambda session: fetch_portfolio_leaderboard(
+                current_user=current_user, page=page, limit=limit, db=session, cursor=cursor))
+        elif (snapshot := current_leaderboard_snapshot()) is not None:
+            # Served from memory while the snapshot matches the newest tick, SQL otherwise
+            entries, next_cursor = snapshot.page(lead_type, limit=limit, page=page, cursor=cursor)
         else:
-            entries = fetch_leaderboard_entries(lead_type=lead_type, page=page, limit=limit, db=db)
+            entries, next_cursor = await db.run_sync(lambda session: fetch_leaderboard_entries(
+                lead_type=lead_type, page=page, limit=limit, db=session, cursor=cursor))
 
-        return response_model(leaderboard_type=lead_type, entries=entries)
+        return response_model(leaderboard_type=lead_type, entries=entries, next_cursor=next_cursor)
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error in get_leaderboard: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch leaderboard data: {str(e)}")
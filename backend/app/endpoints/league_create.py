@@ -3,9 +3,10 @@ from fastapi import APIRouter, Depends, HTTPException, Body, status
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from app.db.database import get_db
-from app.models.db_models import League, User, Portfolio, UserLeagues
-from app.core.token import get_user_from_token
-from app.models.models import UserProfile
+from app.models.db_models import League, Portfolio, UserLeagues
+from app.core.token import get_current_identity
+from app.core.league_rank import rank_leagues
+from app.models.models import UserIdentity
 
 router = APIRouter()
 
@@ -15,15 +16,10 @@ async def create_league(
     length: int = Body(...),
     max_players: int = Body(None),
     password: str = Body(None),
-    current_user: UserProfile = Depends(get_user_from_token),
+    current_user: UserIdentity = Depends(get_current_identity),
     db: Session = Depends(get_db)
 ):
     try:
-        # Fetch the user by their username to get the user ID
-        user = db.query(User).filter(User.username == current_user.username).first()
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-
         # Check for existing league with the same name (case-insensitive)
         existing_league = db.query(League).filter(func.lower(League.name) == func.lower(name)).first()
         if existing_league:
@@ -36,7 +32,7 @@ async def create_league(
             name=name,
             start_date=start_date,
             end_date=end_date,
-            created_by=user.id,
+            created_by=current_user.id,
             max_players=max_players,
             password=password,
             type='custom'
@@ -53,13 +49,14 @@ async def create_league(
 
         # Add the user to the user_leagues table
         user_league_entry = UserLeagues(
-            user_id=user.id,
+            user_id=current_user.id,
             league_id=new_league.id,
             portfolio_id=new_portfolio.id,
             balance=100000
         )
         db.add(user_league_entry)
         db.commit()
+        rank_leagues(db, [new_league.id])
 
         return {"message": "League created successfully", "league_id": new_league.id}
     except Exception as e:
@@ -1,21 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from app.db.database import get_db
-from app.models.db_models import League, User
-from app.models.models import LeagueOverview, LeagueEdit, UserProfile
-from app.core.token import get_user_from_token
+from app.models.db_models import League
+from app.models.models import LeagueOverview, LeagueEdit, UserIdentity
+from app.core.token import get_current_identity
 
 router = APIRouter()
 
 @router.put("/leagues/{league_name}")
-async def edit_league(league_name: str, league: LeagueEdit, current_user: UserProfile = Depends(get_user_from_token),
+async def edit_league(league_name: str, league: LeagueEdit, current_user: UserIdentity = Depends(get_current_identity),
                       db: Session = Depends(get_db)):
     try:
-        # Fetch the user's full record to get the ID
-        user = db.query(User).filter(User.username == current_user.username).first()
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-
         # Decode the league name if it's URL-encoded
         from urllib.parse import unquote
         league_name = unquote(league_name)
@@ -30,7 +25,7 @@ async def edit_league(league_name: str, league: LeagueEdit, current_user: UserPr
             raise HTTPException(status_code=404, detail="League not found")
 
         # Check if the current user is the creator of the league
-        if league_db.created_by != user.id:
+        if league_db.created_by != current_user.id:
             raise HTTPException(status_code=403, detail="You are not the creator of this league")
 
         # Update the league details
@@ -2,21 +2,17 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 
 from app.db.database import get_db
-from app.models.db_models import User, UserLeagues, League, Portfolio
-from app.models.models import LeagueJoinRequest, UserProfile
-from app.core.token import get_user_from_token
+from app.models.db_models import UserLeagues, League, Portfolio
+from app.models.models import LeagueJoinRequest, UserIdentity
+from app.core.token import get_current_identity
+from app.core.league_rank import rank_new_member
 
 router = APIRouter()
 
 @router.post("/join_league")
-async def join_league(request: LeagueJoinRequest, current_user: UserProfile = Depends(get_user_from_token), db: Session = Depends(get_db)):
-    # Fetch the user by their username to get the user ID
-    user = db.query(User).filter(User.username == current_user.username).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
+async def join_league(request: LeagueJoinRequest, current_user: UserIdentity = Depends(get_current_identity), db: Session = Depends(get_db)):
     # Check the number of leagues the user is currently enrolled in
-    league_count = db.query(UserLeagues).filter(UserLeagues.user_id == user.id).count()
+    league_count = db.query(UserLeagues).filter(UserLeagues.user_id == current_user.id).count()
     if league_count >= 5:
         raise HTTPException(status_code=400, detail="User is already enrolled in the maximum number of leagues")
 
@@ -41,7 +37,7 @@ async def join_league(request: LeagueJoinRequest, current_user: UserProfile = De
 
     # Add the user to the league
     new_user_league = UserLeagues(
-        user_id=user.id,
+        user_id=current_user.id,
         league_id=league.id,
         portfolio_id=new_portfolio.id,
         balance=100000.0
@@ -53,4 +49,7 @@ async def join_league(request: LeagueJoinRequest, current_user: UserProfile = De
 
     db.commit()
 
+    # Place the new member on the leaderboard without waiting for the next tick
+    rank_new_member(db, current_user.id, [league.id])
+
     return {"message": "Successfully joined the league"}
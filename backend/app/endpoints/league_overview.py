@@ -3,22 +3,17 @@ from sqlalchemy.orm import Session
 from typing import List
 
 from app.db.database import get_db
-from app.models.db_models import User, UserLeagues, League
-from app.models.models import LeagueOverview, UserProfile
-from app.core.token import get_user_from_token
+from app.models.db_models import UserLeagues, League
+from app.models.models import LeagueOverview, UserIdentity
+from app.core.token import get_current_identity
 
 router = APIRouter()
 
 @router.get("/leagues", response_model=List[LeagueOverview])
-async def get_leagues(current_user: UserProfile = Depends(get_user_from_token), db: Session = Depends(get_db)):
+async def get_leagues(current_user: UserIdentity = Depends(get_current_identity), db: Session = Depends(get_db)):
     try:
-        # Fetch the user by their username to get the user ID
-        user = db.query(User).filter(User.username == current_user.username).first()
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-
         # Fetch user leagues
-        user_leagues = db.query(UserLeagues).filter(UserLeagues.user_id == user.id).all()
+        user_leagues = db.query(UserLeagues).filter(UserLeagues.user_id == current_user.id).all()
         league_ids = [ul.league_id for ul in user_leagues]
 
         # Fetch leagues based on league_ids
@@ -34,7 +29,7 @@ async def get_leagues(current_user: UserProfile = Depends(get_user_from_token),
                 player_count=league.player_count,
                 max_players=league.max_players,
                 password=league.password,
-                is_creator=(league.created_by == user.id)
+                is_creator=(league.created_by == current_user.id)
             )
             league_overviews.append(league_overview)
 
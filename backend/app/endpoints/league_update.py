@@ -3,8 +3,8 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from app.db.database import get_db
 from app.models.db_models import User
-from app.core.token import get_user_from_token
-from app.models.models import UserSelf, UpdateCurrentLeagueRequest, UserProfile
+from app.core.token import get_current_identity
+from app.models.models import UserSelf, UpdateCurrentLeagueRequest, UserIdentity
 
 router = APIRouter()
 
@@ -12,10 +12,10 @@ router = APIRouter()
 @router.put("/users/current_league")
 async def update_current_league(
         request: UpdateCurrentLeagueRequest,
-        current_user: UserProfile = Depends(get_user_from_token),
+        current_user: UserIdentity = Depends(get_current_identity),
         db: Session = Depends(get_db)
 ):
-    user = db.query(User).filter(User.username == current_user.username).first()
+    user = db.get(User, current_user.id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
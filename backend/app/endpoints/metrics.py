@@ -0,0 +1,35 @@
+import hmac
+import os
+
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+
+from app.db.database import engine, async_engine, replica_engine, async_replica_engine, replica_monitor
+from app.db.instrumentation import snapshot_metrics
+
+router = APIRouter()
+
+# Shared secret scrapers send in the X-Metrics-Key header; /metrics is not served at all when unset
+METRICS_KEY = os.getenv('METRICS_KEY', '')
+
+
+def require_metrics_key(x_metrics_key: str = Header(default='')):
+    if not METRICS_KEY:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not hmac.compare_digest(x_metrics_key.encode(), METRICS_KEY.encode()):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid metrics key")
+
+
+@router.get('/metrics', dependencies=[Depends(require_metrics_key)])
+async def get_metrics():
+    # Live pool occupancy plus cumulative per-route query, DB time and pool wait figures for this worker
+    pools = {'primary': engine.pool, 'primary_async': async_engine.pool}
+    if replica_engine is not None:
+        pools.update({'replica': replica_engine.pool, 'replica_async': async_replica_engine.pool})
+
+    metrics = snapshot_metrics(pools)
+    metrics['replica'] = {
+        'configured': replica_engine is not None,
+        'in_use': replica_monitor.healthy(),
+        'lag_seconds': replica_monitor.lag,
+    }
+    return metrics
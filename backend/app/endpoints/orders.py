@@ -0,0 +1,23 @@
+from typing import Optional
+
+from fastapi import Depends, APIRouter, Header
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.trade import execute_orders
+from app.core.token import get_current_identity_async
+from app.db.database import get_async_db
+from app.models.models import BatchOrderRequest, UserIdentity
+
+router = APIRouter()
+
+
+@router.post('/orders/batch')
+async def add_batch_orders(
+        batch: BatchOrderRequest,
+        idempotency_key: Optional[str] = Header(default=None, max_length=64),
+        user: UserIdentity = Depends(get_current_identity_async),
+        db: AsyncSession = Depends(get_async_db)
+):
+    # Every order in the basket is priced, validated and committed together, or none is
+    await db.run_sync(execute_orders, user, batch.orders, idempotency_key)
+    return {"message": "Transaction successful", "orders": len(batch.orders)}
@@ -1,49 +1,81 @@
 from datetime import datetime, timezone
 
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from sqlalchemy import and_
 
-from app.db.database import get_db
-from app.models.db_models import Player, PlayerData
-from app.models.pricing_model import price_model  # Assuming your pricing model is in app/models
+from app.core.history_store import HistoryStore, current_history_store
+from app.core.price_history import LpHistory, history_payload, load_lp_history, validate_resolution
+from app.db.database import get_async_read_db
+from app.models.db_models import Player, PlayerData, PlayerLatest
+from app.models.pricing_model import price_model_batch
 
 router = APIRouter()
 
 @router.get('/players/{gameName}/{tagLine}')
-async def player_info(gameName: str, tagLine: str, db: Session = Depends(get_db)):
+async def player_info(
+        gameName: str,
+        tagLine: str,
+        start: datetime = Query(default=None),
+        end: datetime = Query(default=None),
+        resolution: str = Query(default='raw'),
+        db: AsyncSession = Depends(get_async_read_db)
+):
+    validate_resolution(resolution)
+    store = current_history_store()
+    if store is not None:
+        # Served from the in-process history store; the session is never used
+        return store_player_info(store, gameName, tagLine, start, end, resolution)
+    return await db.run_sync(load_player_info, gameName, tagLine, start, end, resolution)
+
+
+def store_player_info(store: HistoryStore, gameName: str, tagLine: str, start: datetime, end: datetime,
+                      resolution: str):
+    found = store.find(gameName, tagLine, start, end)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Player not found")
+    player, history = found
+    return player_payload(player, player.latest_date, history, resolution)
+
+
+def load_player_info(db: Session, gameName: str, tagLine: str, start: datetime, end: datetime, resolution: str):
     try:
         # Fetch the player data from the database
         player = db.query(Player).filter(and_(Player.game_name == gameName, Player.tag_line == tagLine)).first()
         if not player:
             raise HTTPException(status_code=404, detail="Player not found")
 
-        # Fetch the player data history
-        player_data = db.query(PlayerData).filter(PlayerData.player_id == player.id).order_by(PlayerData.date).all()
-        if not player_data:
+        latest = db.query(PlayerLatest).filter(PlayerLatest.player_id == player.id).first()
+        if not latest:
             raise HTTPException(status_code=404, detail="Player data not found")
 
-        # Extract date and league points from player data
-        date_history = [str(data.date) for data in player_data]
-        price_history = [price_model(data.league_points) for data in player_data]
-
-        # Get the most recent date and ensure it's timezone-aware
-        info_date = player_data[-1].date
-        if info_date.tzinfo is None:
-            info_date = info_date.replace(tzinfo=timezone.utc)
-
-        # Convert date to string with microsecond precision
-        utc_date = info_date.astimezone(timezone.utc).isoformat()
-
-        return {
-            'name': player.game_name,
-            'price': price_history,
-            'date': date_history,
-            'date_updated': utc_date,
-            '8 Hour Change': player.delta_8h,
-            '24 Hour Change': player.delta_24h,
-            '3 Day Change': player.delta_72h,
-            'delist_date': player.delist_date  # This will be None if not present
-        }
+        # Fetch only the requested window of the history
+        return player_payload(player, latest.date, load_lp_history(db, PlayerData, player.id, start, end), resolution)
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+def player_payload(player, info_date: datetime, history: LpHistory, resolution: str) -> dict:
+    """Response for a Player row or a store PlayerHistory, with the history bucketed to the requested resolution."""
+    if info_date is None:
+        raise HTTPException(status_code=404, detail="Player data not found")
+
+    # Get the most recent date and ensure it's timezone-aware
+    if info_date.tzinfo is None:
+        info_date = info_date.replace(tzinfo=timezone.utc)
+
+    # Convert date to string with microsecond precision
+    utc_date = info_date.astimezone(timezone.utc).isoformat()
+
+    return {
+        'name': player.game_name,
+        **history_payload(history, resolution, to_price=price_model_batch),
+        'date_updated': utc_date,
+        '8 Hour Change': player.delta_8h,
+        '24 Hour Change': player.delta_24h,
+        '3 Day Change': player.delta_72h,
+        'delist_date': player.delist_date  # This will be None if not present
+    }
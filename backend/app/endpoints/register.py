@@ -5,6 +5,7 @@ from sqlalchemy.orm import Session
 from passlib.context import CryptContext
 
 from app.core.token import create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
+from app.core.league_rank import rank_new_member
 from app.db.database import get_db
 from app.models.db_models import User, UserLeagues, Portfolio, League
 
@@ -60,6 +61,9 @@ async def register(form_data: OAuth2PasswordRequestForm = Depends(), db: Session
     new_user.current_league_id = server_leagues[0].id
     db.commit()
 
+    # Last in every server league until the tick job re-ranks them
+    rank_new_member(db, new_user.id, [league.id for league in server_leagues])
+
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(data={'sub': form_data.username}, expires_delta=access_token_expires)
     return {'access_token': access_token, 'token_type': 'bearer'}
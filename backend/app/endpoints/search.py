@@ -2,16 +2,17 @@ from fastapi import APIRouter, HTTPException, status, Depends
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 
-from app.db.database import get_db
+from app.db.database import get_read_db
 from app.models.db_models import User, Player
 
 router = APIRouter()
 
 
 @router.get('/search/players/{query}')
-async def search_players(query: str, db: Session = Depends(get_db)):
+async def search_players(query: str, db: Session = Depends(get_read_db)):
     query_lower = query.lower()
-    players = db.query(Player).filter(func.lower(Player.game_name_lower) == query_lower).all()
+    # game_name_lower is stored lowercased; comparing it directly lets ix_players_game_name_lower serve the lookup
+    players = db.query(Player).filter(Player.game_name_lower == query_lower).all()
     if not players:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Player not found')
 
@@ -22,7 +23,7 @@ async def search_players(query: str, db: Session = Depends(get_db)):
 
 
 @router.get('/search/users/{query}')
-async def search_users(query: str, db: Session = Depends(get_db)):
+async def search_users(query: str, db: Session = Depends(get_read_db)):
     query_lower = query.lower()
     user = db.query(User).filter(func.lower(User.username) == query_lower).first()
     if not user:
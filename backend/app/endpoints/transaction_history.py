@@ -1,22 +1,24 @@
-from fastapi import APIRouter, Depends
-from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from typing import List
+from typing import Optional
 
-from app.models.models import UserPublic
-from app.core.token import get_user_from_token
-from app.db.database import get_db
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.models import UserIdentity, TransactionHistoryResponse
+from app.core.token import get_current_identity_async
+from app.db.database import get_async_db
 from app.core.logic import fetch_recent_transactions
-from app.models.models import TransactionWithTagLine  # Import the new model
 
 router = APIRouter()
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl='login')
 
 
-@router.get('/transaction_history', response_model=List[TransactionWithTagLine])
+@router.get('/transaction_history', response_model=TransactionHistoryResponse)
 async def transaction_history(
-        current_user: UserPublic = Depends(get_user_from_token),
-        db: Session = Depends(get_db)
+        limit: int = Query(default=50, ge=1, le=200),
+        cursor: Optional[str] = Query(default=None),
+        current_user: UserIdentity = Depends(get_current_identity_async),
+        db: AsyncSession = Depends(get_async_db)
 ):
-    transactions = fetch_recent_transactions(current_user, db)
-    return transactions
+    # Served from the primary so a trade shows up in the history right after it commits
+    transactions, next_cursor = await db.run_sync(
+        lambda session: fetch_recent_transactions(current_user, session, limit=limit, cursor=cursor))
+    return TransactionHistoryResponse(transactions=transactions, next_cursor=next_cursor)
@@ -1,7 +1,10 @@
-from sqlalchemy import create_engine, Column, Integer, String, Date, DateTime, ForeignKey, DECIMAL, CheckConstraint
+from sqlalchemy import create_engine, Column, Integer, String, Date, DateTime, ForeignKey, DECIMAL, CheckConstraint, \
+    Float, DDL, Index, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship, sessionmaker
 
+from app.models.pricing_model import A, B
+
 Base = declarative_base()
 
 class User(Base):
@@ -31,11 +34,17 @@ class Player(Base):
     delist_date = Column(DateTime(timezone=True))
 
     player_data = relationship('PlayerData', back_populates='player')
+    latest = relationship('PlayerLatest', back_populates='player', uselist=False)
     portfolio_players = relationship('PortfolioPlayer', back_populates='player')
     portfolio_holds = relationship('PortfolioHold', back_populates='player')
     transactions = relationship('Transaction', back_populates='player')
     favorites = relationship('Favorite', back_populates='player')
 
+    __table_args__ = (
+        Index('ix_players_game_name_tag_line', game_name, tag_line),
+        Index('ix_players_game_name_lower', game_name_lower),
+    )
+
 
 class PlayerData(Base):
     __tablename__ = 'player_data'
@@ -46,6 +55,47 @@ class PlayerData(Base):
 
     player = relationship('Player', back_populates='player_data')
 
+    __table_args__ = (
+        Index('ix_player_data_player_id_date', player_id, date.desc()),
+        # Rows arrive in date order, so a BRIN index finds a date range for retention at almost no size
+        Index('ix_player_data_date', date, postgresql_using='brin'),
+    )
+
+
+class PlayerDataHourly(Base):
+    # Open/high/low/close LP per player and hour, rolled up from player_data rows older than the
+    # raw retention window by app.core.retention
+    __tablename__ = 'player_data_hourly'
+    player_id = Column(Integer, ForeignKey('players.id'), primary_key=True)
+    bucket = Column(DateTime(timezone=True), primary_key=True)
+    open = Column(Integer, nullable=False)
+    high = Column(Integer, nullable=False)
+    low = Column(Integer, nullable=False)
+    close = Column(Integer, nullable=False)
+
+
+class PlayerDataDaily(Base):
+    # Same per day (UTC), rolled up from player_data_hourly rows older than the hourly retention window
+    __tablename__ = 'player_data_daily'
+    player_id = Column(Integer, ForeignKey('players.id'), primary_key=True)
+    bucket = Column(DateTime(timezone=True), primary_key=True)
+    open = Column(Integer, nullable=False)
+    high = Column(Integer, nullable=False)
+    low = Column(Integer, nullable=False)
+    close = Column(Integer, nullable=False)
+
+
+class PlayerLatest(Base):
+    # Read model holding the newest PlayerData row of every player, kept current by the
+    # player_data_latest trigger in the same transaction as each snapshot insert
+    __tablename__ = 'player_latest'
+    player_id = Column(Integer, ForeignKey('players.id'), primary_key=True)
+    date = Column(DateTime(timezone=True))
+    league_points = Column(Integer)
+    price = Column(Float)
+
+    player = relationship('Player', back_populates='latest')
+
 
 class League(Base):
     __tablename__ = 'leagues'
@@ -75,6 +125,11 @@ class UserLeagues(Base):
     league = relationship('League', back_populates='user_leagues')
     portfolio = relationship('Portfolio', back_populates='user_leagues')
 
+    __table_args__ = (
+        Index('ix_user_leagues_user_id_league_id', user_id, league_id),
+        Index('ix_user_leagues_league_id_rank', league_id, rank),
+    )
+
 
 class Portfolio(Base):
     __tablename__ = 'portfolios'
@@ -87,6 +142,10 @@ class Portfolio(Base):
     portfolio_history = relationship('PortfolioHistory', back_populates='portfolio')
     transactions = relationship('Transaction', back_populates='portfolio')
 
+    __table_args__ = (
+        Index('ix_portfolios_current_value', current_value.desc()),
+    )
+
 
 class PortfolioPlayer(Base):
     __tablename__ = 'portfolio_players'
@@ -95,10 +154,16 @@ class PortfolioPlayer(Base):
     player_id = Column(Integer, ForeignKey('players.id'))
     purchase_price = Column(DECIMAL)
     shares = Column(Integer)
+    # Shares of this holding's portfolio_holds rows, expired ones included until they are swept
+    locked_shares = Column(Integer, nullable=False, default=0, server_default='0')
 
     portfolio = relationship('Portfolio', back_populates='portfolio_players')
     player = relationship('Player', back_populates='portfolio_players')
 
+    __table_args__ = (
+        Index('uq_portfolio_players_portfolio_id_player_id', portfolio_id, player_id, unique=True),
+    )
+
 
 class PortfolioHold(Base):
     __tablename__ = 'portfolio_holds'
@@ -111,6 +176,11 @@ class PortfolioHold(Base):
     portfolio = relationship('Portfolio', back_populates='portfolio_holds')
     player = relationship('Player', back_populates='portfolio_holds')
 
+    __table_args__ = (
+        Index('ix_portfolio_holds_portfolio_id_player_id_hold_deadline', portfolio_id, player_id, hold_deadline),
+        Index('ix_portfolio_holds_hold_deadline', hold_deadline),
+    )
+
 
 class Transaction(Base):
     __tablename__ = 'transactions'
@@ -121,10 +191,16 @@ class Transaction(Base):
     price = Column(DECIMAL)
     transaction_date = Column(DateTime(timezone=True))
     portfolio_id = Column(Integer, ForeignKey('portfolios.id'))
+    idempotency_key = Column(String(64))  # Client supplied; a retried request with the same key is not applied twice
 
     portfolio = relationship('Portfolio', back_populates='transactions')
     player = relationship('Player', back_populates='transactions')
 
+    __table_args__ = (
+        Index('ix_transactions_portfolio_id_transaction_date_id', portfolio_id, transaction_date, id),
+        Index('uq_transactions_portfolio_id_idempotency_key', portfolio_id, idempotency_key, unique=True),
+    )
+
 
 class PortfolioHistory(Base):
     __tablename__ = 'portfolio_history'
@@ -135,6 +211,10 @@ class PortfolioHistory(Base):
 
     portfolio = relationship('Portfolio', back_populates='portfolio_history')
 
+    __table_args__ = (
+        Index('ix_portfolio_history_portfolio_id_date', portfolio_id, date),
+    )
+
 
 class Favorite(Base):
     __tablename__ = 'favorites'
@@ -145,6 +225,10 @@ class Favorite(Base):
     user = relationship('User', back_populates='favorites')
     player = relationship('Player', back_populates='favorites')
 
+    __table_args__ = (
+        Index('uq_favorites_user_id_player_id', user_id, player_id, unique=True),
+    )
+
 
 class FutureSight(Base):
     __tablename__ = 'future_sight'
@@ -203,6 +287,32 @@ class RegionalsData(Base):
     date = Column(DateTime(timezone=True), nullable=False)
     league_points = Column(Integer, nullable=False)
 
+    __table_args__ = (
+        Index('ix_regionals_data_player_id_date', player_id, date.desc()),
+        Index('ix_regionals_data_date', date, postgresql_using='brin'),
+    )
+
+
+class RegionalsDataHourly(Base):
+    # Hourly and daily rollups of regionals_data, as for player_data
+    __tablename__ = 'regionals_data_hourly'
+    player_id = Column(Integer, ForeignKey('regionals_nonna.id'), primary_key=True)
+    bucket = Column(DateTime(timezone=True), primary_key=True)
+    open = Column(Integer, nullable=False)
+    high = Column(Integer, nullable=False)
+    low = Column(Integer, nullable=False)
+    close = Column(Integer, nullable=False)
+
+
+class RegionalsDataDaily(Base):
+    __tablename__ = 'regionals_data_daily'
+    player_id = Column(Integer, ForeignKey('regionals_nonna.id'), primary_key=True)
+    bucket = Column(DateTime(timezone=True), primary_key=True)
+    open = Column(Integer, nullable=False)
+    high = Column(Integer, nullable=False)
+    low = Column(Integer, nullable=False)
+    close = Column(Integer, nullable=False)
+
 
 class RegionalsPlayers(Base):
     __tablename__ = 'regionals_players'
@@ -213,3 +323,31 @@ class RegionalsPlayers(Base):
     __table_args__ = (
         CheckConstraint(table_name.in_(['players', 'regionals_nonna'])),
     )
+
+
+# Statement-level trigger: every INSERT into player_data upserts the newest row per player into
+# player_latest inside the inserting transaction, whichever process writes the snapshot
+PLAYER_LATEST_TRIGGER_SQL = """
+CREATE OR REPLACE FUNCTION player_latest_sync() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO player_latest (player_id, date, league_points, price)
+    SELECT DISTINCT ON (player_id) player_id, date, league_points,
+           (power(league_points::double precision, %(a)s) * %(b)s) + 10
+    FROM new_rows
+    WHERE player_id IS NOT NULL
+    ORDER BY player_id, date DESC
+    ON CONFLICT (player_id) DO UPDATE
+        SET date = EXCLUDED.date, league_points = EXCLUDED.league_points, price = EXCLUDED.price
+        WHERE player_latest.date IS NULL OR player_latest.date <= EXCLUDED.date;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS player_data_latest ON player_data;
+CREATE TRIGGER player_data_latest
+    AFTER INSERT ON player_data
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION player_latest_sync();
+""" % {'a': A, 'b': B}
+
+event.listen(Base.metadata, 'after_create', DDL(PLAYER_LATEST_TRIGGER_SQL).execute_if(dialect='postgresql'))
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, SecretStr, Field
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Literal
 from datetime import datetime, timezone
 
 
@@ -62,8 +62,24 @@ class TransactionWithTagLine(BaseModel):
         from_attributes = True
 
 
+class TransactionHistoryResponse(BaseModel):
+    transactions: List[TransactionWithTagLine]  # Newest first
+    next_cursor: Optional[str] = None  # Opaque token for the following (older) page, None on the last page
+
+
 class TransactionRequest(BaseModel):
-    shares: int
+    shares: int = Field(gt=0)
+
+
+class OrderRequest(BaseModel):
+    gameName: str
+    tagLine: str
+    type: Literal['buy', 'sell']
+    shares: int = Field(gt=0)
+
+
+class BatchOrderRequest(BaseModel):
+    orders: List[OrderRequest] = Field(min_length=1, max_length=50)
 
 
 class FavoritesEntry(BaseModel):
@@ -101,6 +117,11 @@ class UserSelf(UserPublic):
     password: Optional[SecretStr] = None
 
 
+class UserIdentity(UserPublic):
+    id: int
+    current_league_id: Optional[int] = None
+
+
 class ToggleFavoriteRequest(BaseModel):
     gameName: str  # Ensuring the request model matches the expected input
     tagLine: str
@@ -125,11 +146,13 @@ class PortfolioLeaderboardEntry(BaseModel):
 class LeaderboardResponse(BaseModel):
     leaderboard_type: str  # LP, delta, portfolio
     entries: List[LeaderboardEntry]
+    next_cursor: Optional[str] = None  # Opaque token for the following page, None on the last page
 
 
 class PortfolioLeaderboardResponse(BaseModel):
     leaderboard_type: str
     entries: List[PortfolioLeaderboardEntry]
+    next_cursor: Optional[str] = None
 
 
 class TopLeaderboardEntry(BaseModel):
@@ -183,7 +206,7 @@ class LeagueWithPortfolio(BaseModel):
     league: League
     portfolio: Portfolio
     portfolio_history: List[PortfolioHistory]
-    transactions: List[Transaction] = []
+    transactions: List[Transaction] = []  # Most recent only, oldest first; /transaction_history pages the rest
     one_day_change: Optional[float] = None
     three_day_change: Optional[float] = None
     balance: float = 100_000.0
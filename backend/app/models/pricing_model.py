@@ -1,6 +1,37 @@
+import numpy as np
+
 A = 1.75
 B = 0.00698
 
+MAX_TABLE_LP = 5000
+
 
 def price_model(lp: float) -> float:
     return ((lp ** A) * B) + 10
+
+
+# LP is a bounded integer, so prices for the whole realistic range are precomputed once
+PRICE_TABLE = np.array([price_model(lp) for lp in range(MAX_TABLE_LP + 1)], dtype=np.float64)
+
+
+def price_model_batch(lps) -> np.ndarray:
+    """
+    Price a whole array of LP values at once.
+
+    Integral LP inside [0, MAX_TABLE_LP] is served from PRICE_TABLE and matches price_model
+    exactly; anything else falls back to evaluating the model with NumPy.
+    """
+    lps = np.asarray(lps)
+    if lps.dtype.kind not in 'iu':
+        as_int = lps.astype(np.int64)
+        if not np.array_equal(as_int, lps):
+            return ((lps.astype(np.float64) ** A) * B) + 10
+        lps = as_int
+
+    in_table = (lps >= 0) & (lps <= MAX_TABLE_LP)
+    if in_table.all():
+        return PRICE_TABLE[lps]
+
+    prices = ((lps.astype(np.float64) ** A) * B) + 10
+    prices[in_table] = PRICE_TABLE[lps[in_table]]
+    return prices
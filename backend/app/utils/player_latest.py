@@ -0,0 +1,59 @@
+from sqlalchemy import select, union_all
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.core.price_history import tier_sources
+from app.db.database import get_database_session
+from app.models.db_models import PlayerData, PlayerLatest
+from app.models.pricing_model import price_model_batch
+
+
+def rebuild_player_latest(db: Session) -> int:
+    """
+    Rebuild player_latest from each player's newest reading in any retention tier: the newest
+    player_data row, or for players with no raw rows left the close of their newest rollup.
+
+    The player_data_latest trigger keeps the table current on every insert; this is only
+    needed to backfill it once, or to reprice every row after the pricing model changes.
+    """
+    readings = union_all(*[
+        select(table.player_id.label('player_id'), time.label('date'), close.label('league_points'))
+        for table, (time, *_, close) in tier_sources(PlayerData)
+    ]).subquery('readings')
+
+    # The tiers never overlap, so the newest reading is the raw one whenever there is one
+    rows = db.execute(
+        select(readings.c.player_id, readings.c.date, readings.c.league_points)
+        .distinct(readings.c.player_id)
+        .order_by(readings.c.player_id, readings.c.date.desc())
+    ).all()
+
+    prices = price_model_batch([league_points for _, _, league_points in rows])
+    values = {}
+    for (player_id, date, league_points), price in zip(rows, prices.tolist()):
+        values[player_id] = {
+            'player_id': player_id,
+            'date': date,
+            'league_points': league_points,
+            'price': price
+        }
+    if not values:
+        return 0
+
+    statement = insert(PlayerLatest).values(list(values.values()))
+    statement = statement.on_conflict_do_update(
+        index_elements=[PlayerLatest.player_id],
+        set_={
+            'date': statement.excluded.date,
+            'league_points': statement.excluded.league_points,
+            'price': statement.excluded.price
+        }
+    )
+    db.execute(statement)
+    db.commit()
+    return len(values)
+
+
+if __name__ == "__main__":
+    with get_database_session() as session:
+        print(f"Rebuilt player_latest for {rebuild_player_latest(session)} players")
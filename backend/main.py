@@ -1,13 +1,27 @@
 import os
+from time import perf_counter
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from starlette.middleware.cors import CORSMiddleware
 from starlette.responses import Response
 from starlette.staticfiles import StaticFiles
 
+from app.core import leaderboard_snapshot, history_store  # noqa: F401 register their tick listeners
+from app.core.history_store import SnapshotWriter
+from app.core.holds import HoldSweeper
+from app.core.retention import RetentionWorker
+from app.core.ticks import TickWatcher
+from app.db.database import engine, get_database_session, replica_monitor
+from app.db.instrumentation import RequestMetrics, current_request_metrics, record_request, server_timing
 from app.endpoints import player, leaderboard, login, register, user, search, transaction, dashboard, \
     transaction_history, top_leaderboard, favorites, favorites_toggle, change_user_info, league_overview, league_create, \
-    league_join, league_update, league_search, league_dropdown, league_edit, league_current, frodans_future_sight
+    league_join, league_update, league_search, league_dropdown, league_edit, league_current, frodans_future_sight, metrics, \
+    orders, export
+
+tick_watcher = TickWatcher(get_database_session)
+hold_sweeper = HoldSweeper(get_database_session)
+retention_worker = RetentionWorker(engine)
+snapshot_writer = SnapshotWriter()
 
 app = FastAPI(title='TFT Stocks API', version='1.0', description='API for a TFT stock market simulation')
 app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -31,16 +45,37 @@ app.add_middleware(
     allow_headers=["*"],  # Allowing all headers
 )
 
+@app.middleware('http')
+async def database_metrics(request: Request, call_next):
+    # Collects query count, DB time and pool wait for this request through the engine event listeners
+    metrics = RequestMetrics()
+    token = current_request_metrics.set(metrics)
+    start = perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        current_request_metrics.reset(token)
+    total = perf_counter() - start
+
+    route = request.scope.get('route')
+    record_request(f"{request.method} {route.path if route else 'unmatched'}", metrics, total)
+    response.headers['Server-Timing'] = server_timing(metrics, total)
+    response.headers['Timing-Allow-Origin'] = '*'
+    return response
+
+
 # Include routers
 app.include_router(user.router)
 app.include_router(player.router)
 app.include_router(transaction.router)
+app.include_router(orders.router)
 app.include_router(leaderboard.router)
 app.include_router(dashboard.router)
 app.include_router(login.router)
 app.include_router(search.router)
 app.include_router(register.router)
 app.include_router(transaction_history.router)
+app.include_router(export.router)
 # app.include_router(refresh_dashboard.router)
 app.include_router(top_leaderboard.router)
 app.include_router(favorites.router)
@@ -55,6 +90,7 @@ app.include_router(league_dropdown.router)
 app.include_router(league_edit.router)
 app.include_router(league_current.router)
 app.include_router(frodans_future_sight.router)
+app.include_router(metrics.router)
 
 
 @app.get("/riot.txt")
@@ -69,11 +105,21 @@ async def get_riot_txt():
 @app.on_event('startup')
 async def startup_event():
     print('Starting up...')
+    tick_watcher.start()
+    hold_sweeper.start()
+    retention_worker.start()
+    snapshot_writer.start()
+    replica_monitor.start()
 
 
 @app.on_event('shutdown')
 async def shutdown_event():
     print('Shutting down...')
+    tick_watcher.stop()
+    hold_sweeper.stop()
+    retention_worker.stop()
+    snapshot_writer.stop()
+    replica_monitor.stop()
 
 
 # Run the app with Uvicorn if this file is executed directly
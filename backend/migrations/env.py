@@ -0,0 +1,47 @@
+from logging.config import fileConfig
+import os
+
+from alembic import context
+from sqlalchemy import create_engine, pool
+
+from app.models.db_models import Base
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def database_url() -> str:
+    # Same source as the app: DATABASE_URL when set, otherwise the AWS secret
+    url = os.getenv('DATABASE_URL')
+    if url:
+        return url
+    from app.utils.get_secret import get_secret
+    return get_secret("tft-stocks-keys")["database_url"]
+
+
+def run_migrations_offline() -> None:
+    context.configure(
+        url=database_url(),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    connectable = create_engine(database_url(), poolclass=pool.NullPool)
+    with connectable.connect() as connection:
+        context.configure(connection=connection, target_metadata=target_metadata)
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
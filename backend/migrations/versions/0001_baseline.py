@@ -0,0 +1,184 @@
+"""Baseline schema
+
+The production database predates migrations, so every table is created only when it is missing:
+on an existing database this revision just records the starting point.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PICK_TABLES = "table_name IN ('players', 'regionals_nonna')"
+
+
+def create_table(name: str, *columns) -> bool:
+    if sa.inspect(op.get_bind()).has_table(name):
+        return False
+    op.create_table(name, *columns)
+    return True
+
+
+def upgrade() -> None:
+    id_column = lambda: sa.Column('id', sa.Integer, primary_key=True, autoincrement=True)
+
+    # users.current_league_id and leagues.created_by reference each other; the first key is added last
+    users_created = create_table(
+        'users',
+        id_column(),
+        sa.Column('username', sa.String(50), unique=True),
+        sa.Column('password', sa.String(255)),
+        sa.Column('date_registered', sa.DateTime(timezone=True)),
+        sa.Column('current_league_id', sa.Integer),
+    )
+    create_table(
+        'leagues',
+        id_column(),
+        sa.Column('name', sa.String(50)),
+        sa.Column('start_date', sa.DateTime(timezone=True)),
+        sa.Column('end_date', sa.DateTime(timezone=True)),
+        sa.Column('player_count', sa.Integer),
+        sa.Column('created_by', sa.Integer, sa.ForeignKey('users.id'), nullable=True),
+        sa.Column('password', sa.String(255), nullable=True),
+        sa.Column('max_players', sa.Integer, nullable=True),
+        sa.Column('type', sa.String(50)),
+    )
+    if users_created:
+        op.create_foreign_key('users_current_league_id_fkey', 'users', 'leagues', ['current_league_id'], ['id'])
+
+    create_table(
+        'players',
+        id_column(),
+        sa.Column('puuid', sa.String(100), unique=True),
+        sa.Column('summoner_id', sa.String(100), unique=True),
+        sa.Column('game_name', sa.String(50)),
+        sa.Column('game_name_lower', sa.String(50)),
+        sa.Column('tag_line', sa.String(10)),
+        sa.Column('delta_8h', sa.DECIMAL),
+        sa.Column('delta_24h', sa.DECIMAL),
+        sa.Column('delta_72h', sa.DECIMAL),
+        sa.Column('delist_date', sa.DateTime(timezone=True)),
+    )
+    create_table(
+        'player_data',
+        id_column(),
+        sa.Column('player_id', sa.Integer, sa.ForeignKey('players.id')),
+        sa.Column('date', sa.DateTime(timezone=True)),
+        sa.Column('league_points', sa.Integer),
+    )
+    create_table(
+        'portfolios',
+        id_column(),
+        sa.Column('current_value', sa.DECIMAL),
+    )
+    create_table(
+        'user_leagues',
+        id_column(),
+        sa.Column('user_id', sa.Integer, sa.ForeignKey('users.id')),
+        sa.Column('league_id', sa.Integer, sa.ForeignKey('leagues.id')),
+        sa.Column('portfolio_id', sa.Integer, sa.ForeignKey('portfolios.id')),
+        sa.Column('rank', sa.Integer),
+        sa.Column('balance', sa.DECIMAL),
+    )
+    create_table(
+        'portfolio_players',
+        id_column(),
+        sa.Column('portfolio_id', sa.Integer, sa.ForeignKey('portfolios.id')),
+        sa.Column('player_id', sa.Integer, sa.ForeignKey('players.id')),
+        sa.Column('purchase_price', sa.DECIMAL),
+        sa.Column('shares', sa.Integer),
+    )
+    create_table(
+        'portfolio_holds',
+        id_column(),
+        sa.Column('portfolio_id', sa.Integer, sa.ForeignKey('portfolios.id')),
+        sa.Column('player_id', sa.Integer, sa.ForeignKey('players.id')),
+        sa.Column('hold_deadline', sa.DateTime(timezone=True)),
+        sa.Column('shares', sa.Integer),
+    )
+    create_table(
+        'transactions',
+        id_column(),
+        sa.Column('type', sa.String(10)),
+        sa.Column('player_id', sa.Integer, sa.ForeignKey('players.id')),
+        sa.Column('shares', sa.Integer),
+        sa.Column('price', sa.DECIMAL),
+        sa.Column('transaction_date', sa.DateTime(timezone=True)),
+        sa.Column('portfolio_id', sa.Integer, sa.ForeignKey('portfolios.id')),
+    )
+    create_table(
+        'portfolio_history',
+        id_column(),
+        sa.Column('value', sa.DECIMAL),
+        sa.Column('date', sa.DateTime(timezone=True)),
+        sa.Column('portfolio_id', sa.Integer, sa.ForeignKey('portfolios.id')),
+    )
+    create_table(
+        'favorites',
+        id_column(),
+        sa.Column('user_id', sa.Integer, sa.ForeignKey('users.id')),
+        sa.Column('player_id', sa.Integer, sa.ForeignKey('players.id')),
+    )
+    create_table(
+        'future_sight',
+        id_column(),
+        sa.Column('user_id', sa.Integer, sa.ForeignKey('users.id')),
+        sa.Column('current_points', sa.DECIMAL),
+    )
+    create_table(
+        'future_sight_picks',
+        id_column(),
+        sa.Column('future_sight_id', sa.Integer, sa.ForeignKey('future_sight.id')),
+        sa.Column('player_id', sa.Integer),
+        sa.Column('rank', sa.Integer),
+        sa.Column('table_name', sa.String),
+        sa.CheckConstraint(PICK_TABLES),
+    )
+    create_table(
+        'future_sight_questions',
+        id_column(),
+        sa.Column('future_sight_id', sa.Integer, sa.ForeignKey('future_sight.id')),
+        sa.Column('question', sa.String),
+        sa.Column('answer', sa.String),
+    )
+    create_table(
+        'regionals_nonna',
+        id_column(),
+        sa.Column('game_name', sa.String, nullable=False),
+        sa.Column('tag_line', sa.String, nullable=False),
+        sa.Column('puuid', sa.String, nullable=True),
+        sa.Column('summoner_id', sa.String, nullable=True),
+        sa.Column('region', sa.String, nullable=False),
+        sa.Column('delta_8h', sa.DECIMAL, nullable=True),
+        sa.Column('delta_24h', sa.DECIMAL, nullable=True),
+        sa.Column('delta_72h', sa.DECIMAL, nullable=True),
+    )
+    create_table(
+        'regionals_data',
+        id_column(),
+        sa.Column('player_id', sa.Integer, sa.ForeignKey('regionals_nonna.id')),
+        sa.Column('date', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('league_points', sa.Integer, nullable=False),
+    )
+    create_table(
+        'regionals_players',
+        id_column(),
+        sa.Column('player_id', sa.Integer, nullable=False),
+        sa.Column('table_name', sa.String(50), nullable=False),
+        sa.Column('total_points', sa.DECIMAL, nullable=False),
+        sa.CheckConstraint(PICK_TABLES),
+    )
+
+
+def downgrade() -> None:
+    # The baseline describes data that existed before migrations; it is never dropped
+    pass
@@ -0,0 +1,50 @@
+"""player_latest read model
+
+Creates the table, installs the player_data_latest trigger that keeps it current and backfills it
+from the existing history.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.models.db_models import PLAYER_LATEST_TRIGGER_SQL
+from app.models.pricing_model import A, B
+
+
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if not sa.inspect(op.get_bind()).has_table('player_latest'):
+        op.create_table(
+            'player_latest',
+            sa.Column('player_id', sa.Integer, sa.ForeignKey('players.id'), primary_key=True),
+            sa.Column('date', sa.DateTime(timezone=True)),
+            sa.Column('league_points', sa.Integer),
+            sa.Column('price', sa.Float),
+        )
+
+    op.execute(PLAYER_LATEST_TRIGGER_SQL)
+    op.execute("""
+        INSERT INTO player_latest (player_id, date, league_points, price)
+        SELECT DISTINCT ON (player_id) player_id, date, league_points,
+               (power(league_points::double precision, %(a)s) * %(b)s) + 10
+        FROM player_data
+        WHERE player_id IS NOT NULL
+        ORDER BY player_id, date DESC
+        ON CONFLICT (player_id) DO NOTHING
+    """ % {'a': A, 'b': B})
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS player_data_latest ON player_data")
+    op.execute("DROP FUNCTION IF EXISTS player_latest_sync()")
+    op.drop_table('player_latest')
@@ -0,0 +1,84 @@
+"""Indexes for the hot queries
+
+Composite indexes matching the access paths of the player history, portfolio, holds,
+transaction, favorite, player lookup and league membership queries. Duplicate favorites and
+portfolio rows are merged first so the unique indexes can be built.
+
+The indexes are built CONCURRENTLY so snapshot ingestion and trading keep writing meanwhile.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (name, table, columns, unique)
+INDEXES = [
+    ('ix_player_data_player_id_date', 'player_data', ['player_id', sa.text('date DESC')], False),
+    ('ix_transactions_portfolio_id_transaction_date', 'transactions', ['portfolio_id', 'transaction_date'], False),
+    ('ix_portfolio_history_portfolio_id_date', 'portfolio_history', ['portfolio_id', 'date'], False),
+    ('ix_portfolio_holds_portfolio_id_player_id_hold_deadline', 'portfolio_holds',
+     ['portfolio_id', 'player_id', 'hold_deadline'], False),
+    ('uq_portfolio_players_portfolio_id_player_id', 'portfolio_players', ['portfolio_id', 'player_id'], True),
+    ('uq_favorites_user_id_player_id', 'favorites', ['user_id', 'player_id'], True),
+    ('ix_players_game_name_tag_line', 'players', ['game_name', 'tag_line'], False),
+    ('ix_players_game_name_lower', 'players', ['game_name_lower'], False),
+    ('ix_user_leagues_user_id_league_id', 'user_leagues', ['user_id', 'league_id'], False),
+    ('ix_user_leagues_league_id_rank', 'user_leagues', ['league_id', 'rank'], False),
+]
+
+
+def upgrade() -> None:
+    # Fold duplicate holdings into the oldest row: shares add up, purchase price is share-weighted
+    op.execute("""
+        WITH merged AS (
+            SELECT min(id) AS id, sum(shares) AS shares,
+                   sum(purchase_price * shares) / NULLIF(sum(shares), 0) AS purchase_price
+            FROM portfolio_players
+            WHERE portfolio_id IS NOT NULL AND player_id IS NOT NULL
+            GROUP BY portfolio_id, player_id
+            HAVING count(*) > 1
+        )
+        UPDATE portfolio_players
+        SET shares = merged.shares,
+            purchase_price = COALESCE(merged.purchase_price, portfolio_players.purchase_price)
+        FROM merged
+        WHERE portfolio_players.id = merged.id
+    """)
+    op.execute("""
+        DELETE FROM portfolio_players duplicate
+        USING portfolio_players kept
+        WHERE duplicate.portfolio_id = kept.portfolio_id
+          AND duplicate.player_id = kept.player_id
+          AND duplicate.id > kept.id
+    """)
+    op.execute("""
+        DELETE FROM favorites duplicate
+        USING favorites kept
+        WHERE duplicate.user_id = kept.user_id
+          AND duplicate.player_id = kept.player_id
+          AND duplicate.id > kept.id
+    """)
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction. pg8000 opens one when the block
+    # looks up the isolation level, so it is ended explicitly before the first index
+    with op.get_context().autocommit_block():
+        op.execute('COMMIT')
+        for name, table, columns, unique in INDEXES:
+            op.create_index(name, table, columns, unique=unique, if_not_exists=True, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute('COMMIT')
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
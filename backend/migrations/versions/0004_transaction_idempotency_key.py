@@ -0,0 +1,35 @@
+"""Idempotency key on transactions
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('transactions', sa.Column('idempotency_key', sa.String(64)))
+
+    # Existing rows have no key and NULL keys never conflict. COMMIT as in 0003, for CONCURRENTLY under pg8000
+    with op.get_context().autocommit_block():
+        op.execute('COMMIT')
+        op.create_index('uq_transactions_portfolio_id_idempotency_key', 'transactions',
+                        ['portfolio_id', 'idempotency_key'], unique=True, if_not_exists=True,
+                        postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute('COMMIT')
+        op.drop_index('uq_transactions_portfolio_id_idempotency_key', table_name='transactions', if_exists=True,
+                      postgresql_concurrently=True)
+    op.drop_column('transactions', 'idempotency_key')
@@ -0,0 +1,58 @@
+"""Maintained locked_shares on portfolio_players and an index for sweeping expired holds
+
+Expired holds are deleted and locked_shares is set to the shares of the holds that remain, the
+invariant the trade engine and the hold sweeper maintain from here on. Holds left behind by
+holdings that were sold out are dropped as well.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('portfolio_players', sa.Column('locked_shares', sa.Integer, nullable=False, server_default='0'))
+
+    op.execute("DELETE FROM portfolio_holds WHERE hold_deadline <= now() OR hold_deadline IS NULL")
+    op.execute("""
+        DELETE FROM portfolio_holds hold
+        WHERE NOT EXISTS (
+            SELECT 1 FROM portfolio_players holding
+            WHERE holding.portfolio_id = hold.portfolio_id AND holding.player_id = hold.player_id
+        )
+    """)
+    op.execute("""
+        UPDATE portfolio_players
+        SET locked_shares = held.shares
+        FROM (
+            SELECT portfolio_id, player_id, sum(shares) AS shares
+            FROM portfolio_holds
+            GROUP BY portfolio_id, player_id
+        ) held
+        WHERE portfolio_players.portfolio_id = held.portfolio_id
+          AND portfolio_players.player_id = held.player_id
+    """)
+
+    # COMMIT as in 0003, for CONCURRENTLY under pg8000
+    with op.get_context().autocommit_block():
+        op.execute('COMMIT')
+        op.create_index('ix_portfolio_holds_hold_deadline', 'portfolio_holds', ['hold_deadline'],
+                        if_not_exists=True, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute('COMMIT')
+        op.drop_index('ix_portfolio_holds_hold_deadline', table_name='portfolio_holds', if_exists=True,
+                      postgresql_concurrently=True)
+    op.drop_column('portfolio_players', 'locked_shares')
@@ -0,0 +1,37 @@
+"""Transaction history index covering the keyset
+
+/transaction_history pages by (transaction_date, id) descending within a portfolio. Adding id to
+the index lets each page be read straight off it, ties included, with no sort.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # COMMIT as in 0003, for CONCURRENTLY under pg8000. The new index is built before the old one is dropped
+    with op.get_context().autocommit_block():
+        op.execute('COMMIT')
+        op.create_index('ix_transactions_portfolio_id_transaction_date_id', 'transactions',
+                        ['portfolio_id', 'transaction_date', 'id'], if_not_exists=True, postgresql_concurrently=True)
+        op.drop_index('ix_transactions_portfolio_id_transaction_date', table_name='transactions', if_exists=True,
+                      postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute('COMMIT')
+        op.create_index('ix_transactions_portfolio_id_transaction_date', 'transactions',
+                        ['portfolio_id', 'transaction_date'], if_not_exists=True, postgresql_concurrently=True)
+        op.drop_index('ix_transactions_portfolio_id_transaction_date_id', table_name='transactions', if_exists=True,
+                      postgresql_concurrently=True)
@@ -0,0 +1,63 @@
+"""Hourly and daily OHLC rollups of player_data and regionals_data
+
+Creates the rollup tables app.core.retention rolls old snapshots into, BRIN indexes on the
+snapshot dates for the date-range deletes, and the (player_id, date) index regionals_data was
+missing for per-player history reads. Existing history is rolled up by the first retention run,
+not here.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '0007'
+down_revision: Union[str, None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ROLLUPS = [
+    ('player_data_hourly', 'players.id'),
+    ('player_data_daily', 'players.id'),
+    ('regionals_data_hourly', 'regionals_nonna.id'),
+    ('regionals_data_daily', 'regionals_nonna.id'),
+]
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    for table, players in ROLLUPS:
+        if not inspector.has_table(table):
+            op.create_table(
+                table,
+                sa.Column('player_id', sa.Integer, sa.ForeignKey(players), primary_key=True),
+                sa.Column('bucket', sa.DateTime(timezone=True), primary_key=True),
+                sa.Column('open', sa.Integer, nullable=False),
+                sa.Column('high', sa.Integer, nullable=False),
+                sa.Column('low', sa.Integer, nullable=False),
+                sa.Column('close', sa.Integer, nullable=False),
+            )
+
+    # COMMIT as in 0003, for CONCURRENTLY under pg8000
+    with op.get_context().autocommit_block():
+        op.execute('COMMIT')
+        op.create_index('ix_player_data_date', 'player_data', ['date'], postgresql_using='brin',
+                        if_not_exists=True, postgresql_concurrently=True)
+        op.create_index('ix_regionals_data_date', 'regionals_data', ['date'], postgresql_using='brin',
+                        if_not_exists=True, postgresql_concurrently=True)
+        op.create_index('ix_regionals_data_player_id_date', 'regionals_data', ['player_id', sa.text('date DESC')],
+                        if_not_exists=True, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute('COMMIT')
+        for index, table in [('ix_player_data_date', 'player_data'), ('ix_regionals_data_date', 'regionals_data'),
+                             ('ix_regionals_data_player_id_date', 'regionals_data')]:
+            op.drop_index(index, table_name=table, if_exists=True, postgresql_concurrently=True)
+    for table, _ in reversed(ROLLUPS):
+        op.drop_table(table)
@@ -0,0 +1,34 @@
+"""Index on portfolio value for the top leaderboard
+
+The top leaderboard's most valuable portfolio is read off this index, highest value first,
+instead of sorting every portfolio on each tick.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '0008'
+down_revision: Union[str, None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # COMMIT as in 0003, for CONCURRENTLY under pg8000
+    with op.get_context().autocommit_block():
+        op.execute('COMMIT')
+        op.create_index('ix_portfolios_current_value', 'portfolios', [sa.text('current_value DESC')],
+                        if_not_exists=True, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute('COMMIT')
+        op.drop_index('ix_portfolios_current_value', table_name='portfolios', if_exists=True,
+                      postgresql_concurrently=True)
@@ -0,0 +1,42 @@
+"""Backfill user_leagues.rank
+
+Leaderboard pages and around-me read user_leagues by rank, which rank_leagues maintains, but
+existing memberships still hold the rank they were created with (0 or null) and so were missing
+from the leaderboard until the first tick re-ranked them. They are ranked here with the same
+row_number() window as rank_leagues.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = '0009'
+down_revision: Union[str, None] = '0008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        UPDATE user_leagues
+        SET rank = ranked.rank
+        FROM (
+            SELECT user_leagues.id,
+                   row_number() OVER (
+                       PARTITION BY user_leagues.league_id
+                       ORDER BY portfolios.current_value DESC NULLS LAST, user_leagues.id
+                   ) AS rank
+            FROM user_leagues
+            JOIN portfolios ON portfolios.id = user_leagues.portfolio_id
+        ) ranked
+        WHERE user_leagues.id = ranked.id AND user_leagues.rank IS DISTINCT FROM ranked.rank
+    """)
+
+
+def downgrade() -> None:
+    # Ranks are derived from portfolio values; the backfilled ones are as valid as any
+    pass
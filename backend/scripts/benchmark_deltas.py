@@ -0,0 +1,163 @@
+"""
+Check the delta engine against a plain per-player computation and measure both.
+
+Generates four days of five-minute snapshots for every player (with random gaps, and some
+players who only appear in the last hours), then:
+- backfills the deltas at every tick of the range and checks a sample of ticks against the
+  per-player reference, and the deltas written to players against the newest one
+- times one tick's pass of the engine against the per-player loop, the way a tick runs at
+  ingest time
+
+Needs a Postgres database; everything is created in a throwaway 'delta_benchmark' schema that
+is dropped afterwards. Run from the backend directory:
+    BENCHMARK_DATABASE_URL=postgresql+pg8000://... python -m scripts.benchmark_deltas
+"""
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+import os
+import random
+import time
+
+import numpy as np
+from sqlalchemy import create_engine, event, insert, text, select
+from sqlalchemy.orm import sessionmaker
+
+from app.core.deltas import DELTA_WINDOWS, DeltaEngine, backfill_deltas, history_statement, load_history
+from app.models.db_models import Base, Player, PlayerData
+from app.models.pricing_model import price_model
+
+SCHEMA = 'delta_benchmark'
+PLAYERS = 750
+LATE_PLAYERS = 50  # Only have the last LATE_HOURS of history
+LATE_HOURS = 6
+DAYS = 4
+TICK = timedelta(minutes=5)
+SAMPLE_TICKS = 20
+
+
+def make_engine(url: str):
+    engine = create_engine(url)
+
+    @event.listens_for(engine, 'connect')
+    def use_benchmark_schema(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f'SET search_path TO {SCHEMA}')
+        cursor.close()
+        # Committed so the rollback that ends the first checkout does not undo it
+        dbapi_connection.commit()
+
+    return engine
+
+
+def reset_schema(engine):
+    with engine.begin() as connection:
+        connection.execute(text(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE'))
+        connection.execute(text(f'CREATE SCHEMA {SCHEMA}'))
+    Base.metadata.create_all(engine)
+
+
+def seed(engine, end: datetime):
+    start = end - timedelta(days=DAYS)
+    with engine.begin() as connection:
+        connection.execute(insert(Player), [
+            {'id': i + 1, 'summoner_id': f's{i}', 'puuid': f'p{i}', 'game_name': f'player{i}',
+             'game_name_lower': f'player{i}', 'tag_line': 'NA1'}
+            for i in range(PLAYERS)
+        ])
+        # Generated server side: about 5% of readings are missing, late players start LATE_HOURS ago
+        connection.execute(text('SELECT setseed(0.42)'))
+        connection.execute(text("""
+            INSERT INTO player_data (player_id, date, league_points)
+            SELECT p, t, floor(random() * 1500)::int
+            FROM generate_series(1, :players) AS p,
+                 generate_series(CAST(:start AS timestamptz), CAST(:end AS timestamptz), CAST(:tick AS interval)) AS t
+            WHERE random() > 0.05
+              AND (p <= :early_players OR t > CAST(:late_start AS timestamptz))
+        """), {'players': PLAYERS, 'early_players': PLAYERS - LATE_PLAYERS, 'late_start': end - timedelta(hours=LATE_HOURS),
+               'start': start, 'end': end, 'tick': TICK})
+    return start
+
+
+def reference(history, tick: datetime):
+    """Per-player deltas at tick, one bisect per player and window."""
+    deltas = {}
+    for player_id, (dates, league_points) in history.items():
+        current = bisect_right(dates, tick) - 1
+        if current < 0:
+            deltas[player_id] = [None] * len(DELTA_WINDOWS)
+            continue
+        price = price_model(league_points[current])
+        deltas[player_id] = [
+            price - price_model(league_points[max(bisect_right(dates, tick - window) - 1, 0)])
+            for window in DELTA_WINDOWS.values()
+        ]
+    return deltas
+
+
+def assert_matches(frame, index: int, expected):
+    for field_index, field in enumerate(DELTA_WINDOWS):
+        for player_id, delta in zip(frame.player_ids.tolist(), frame.deltas[field][index]):
+            want = expected[player_id][field_index]
+            assert (want is None and np.isnan(delta)) or abs(want - delta) < 1e-6, (field, player_id, want, delta)
+
+
+if __name__ == "__main__":
+    url = os.environ.get('BENCHMARK_DATABASE_URL')
+    if not url:
+        raise SystemExit('Set BENCHMARK_DATABASE_URL to a Postgres database to run the benchmark')
+
+    engine = make_engine(url)
+    Session = sessionmaker(bind=engine)
+    end = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+    try:
+        reset_schema(engine)
+        start = seed(engine, end)
+
+        with Session() as db:
+            history = defaultdict(lambda: ([], []))
+            for player_id, date, league_points in db.execute(
+                    select(PlayerData.player_id, PlayerData.date, PlayerData.league_points)
+                    .order_by(PlayerData.player_id, PlayerData.date)):
+                history[player_id][0].append(date)
+                history[player_id][1].append(league_points)
+            rows = sum(len(dates) for dates, _ in history.values())
+
+            began = time.perf_counter()
+            frames = list(backfill_deltas(db, start, end))
+            backfill = time.perf_counter() - began
+            ticks = sum(len(frame.ticks) for frame in frames)
+            print(f"backfill: {ticks} ticks x {PLAYERS} players from {rows} rows in {backfill:.2f}s")
+
+            rng = random.Random(0)
+            for frame in rng.sample(frames, min(len(frames), SAMPLE_TICKS)):
+                index = rng.randrange(len(frame.ticks))
+                tick = datetime.fromtimestamp(int(frame.ticks[index]), timezone.utc)
+                assert_matches(frame, index, reference(history, tick))
+
+            written = {row.id: [row.delta_8h, row.delta_24h, row.delta_72h] for row in db.query(Player)}
+            expected = reference(history, max(dates[-1] for dates, _ in history.values()))
+            for player_id, deltas in expected.items():
+                assert all(abs(float(got) - want) < 0.006 for got, want in zip(written[player_id], deltas)), player_id
+            print("backfilled deltas match the per-player reference")
+
+            deltas = DeltaEngine()
+            began = time.perf_counter()
+            load_history(deltas, db.execute(history_statement(end, end)))
+            load = time.perf_counter() - began
+
+        began = time.perf_counter()
+        deltas.trim(end)
+        frame = deltas.compute([end])
+        vectorized = time.perf_counter() - began
+        assert_matches(frame, 0, reference(history, end))
+
+        began = time.perf_counter()
+        reference(history, end)
+        loop = time.perf_counter() - began
+        print(f"one tick: history load {load * 1000:.0f} ms (cold start only), engine {vectorized * 1000:.1f} ms, "
+              f"per-player loop {loop * 1000:.1f} ms")
+    finally:
+        with engine.begin() as connection:
+            connection.execute(text(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE'))
+        engine.dispose()
@@ -0,0 +1,142 @@
+"""
+Check the history store mapped from a snapshot file, and measure worker cold start with and without one.
+
+Uses the data of benchmark_history_store, then:
+- writes a snapshot, maps it with a newer tick to replay, and checks /players responses against
+  the SQL path, again after a tick that moves the raw retention cutoff, and that folding the
+  appended snapshots into a private base changes nothing
+- starts 1, 2 and 4 worker processes at once: each building the store from the database, then
+  through the snapshot file from scratch (one builds and writes it, the rest wait and map it),
+  then with the file already written, as on a restart. It reports the wall time until every
+  worker is ready and the least and most memory a worker holds privately (Private_Clean +
+  Private_Dirty of /proc/<pid>/smaps_rollup, Linux only) after reading every player's history
+
+Needs a Postgres database; everything is created in a throwaway 'history_store_benchmark'
+schema that is dropped afterwards. As for benchmark_history_store, DATABASE_URL must be set as
+well. Run from the backend directory:
+    DATABASE_URL=postgresql+pg8000://... BENCHMARK_DATABASE_URL=$DATABASE_URL \\
+    python -m scripts.benchmark_history_snapshot
+"""
+from datetime import datetime, timedelta, timezone
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from app.core.history_snapshot import read_snapshot
+from app.core.history_store import HistoryStore, load_history_store, open_history_store
+from app.core.retention import apply_retention
+from scripts.benchmark_history_store import PLAYERS, SAMPLE_PLAYERS, SCHEMA, TICK, add_tick, check, make_engine, \
+    reset_schema, seed
+
+WORKERS = [1, 2, 4]
+
+
+def private_bytes() -> int:
+    with open('/proc/self/smaps_rollup') as smaps:
+        fields = dict(line.split(':', 1) for line in smaps if ':' in line)
+    return sum(int(fields[field].split()[0]) * 1024 for field in ('Private_Clean', 'Private_Dirty'))
+
+
+def worker(url: str, path: str, tick: datetime, ready, results):
+    engine = make_engine(url)
+    before = private_bytes()
+    with sessionmaker(bind=engine)() as db:
+        store = load_history_store(db, tick, path)
+    # Touch every row, as requests for every player eventually would
+    for player in store.players.values():
+        player.window(None, None, store.raw_cutoff, store.hourly_cutoff)
+    results.put((time.perf_counter(), private_bytes() - before, store.snapshot is not None))
+    # Stay alive until every worker has measured, so mapped pages are measured shared
+    ready.wait()
+    engine.dispose()
+
+
+def start_workers(url: str, path: str, tick: datetime, count: int):
+    context = multiprocessing.get_context('spawn')
+    ready, results = context.Barrier(count + 1), context.Queue()
+    processes = [context.Process(target=worker, args=(url, path, tick, ready, results)) for _ in range(count)]
+    began = time.perf_counter()
+    for process in processes:
+        process.start()
+    reports = [results.get() for _ in processes]
+    ready.wait()
+    for process in processes:
+        process.join()
+    # Wall time includes spawning the interpreters and importing the app in each
+    wall = max(report[0] for report in reports) - began
+    private = sorted(report[1] / 2 ** 20 for report in reports)
+    mapped = sum(report[2] for report in reports)
+    return wall, private[0], private[-1], mapped
+
+
+if __name__ == "__main__":
+    url = os.environ.get('BENCHMARK_DATABASE_URL')
+    if not url:
+        raise SystemExit('Set BENCHMARK_DATABASE_URL to a Postgres database to run the benchmark')
+
+    engine = make_engine(url)
+    Session = sessionmaker(bind=engine)
+    path = os.path.join(tempfile.mkdtemp(prefix='history-benchmark-'), 'history.snapshot')
+    end = datetime.now(timezone.utc)
+    rng = random.Random(0)
+    sample = rng.sample(range(1, PLAYERS + 1), SAMPLE_PLAYERS) + [PLAYERS + 1]
+    ranges = [(None, None), (end - timedelta(days=10, hours=5), end - timedelta(days=3, minutes=7)),
+              (end - timedelta(hours=10), None)]
+    try:
+        reset_schema(engine)
+        seed(engine, end)
+
+        with Session() as db:
+            HistoryStore.build(db, end).save(path)
+        print(f"snapshot: {os.path.getsize(path) / 2 ** 20:.1f} MB")
+
+        tick = end + TICK
+        add_tick(engine, tick, PLAYERS + 2)
+        began = time.perf_counter()
+        with Session() as db:
+            store = open_history_store(db, tick, path)
+        mapped_start = time.perf_counter() - began
+        private, mapped = store.nbytes()
+        assert store.snapshot == end and store.version == tick and mapped > 100 * private, (private, mapped)
+        check(Session, store, sample + [PLAYERS + 2], ranges)
+
+        tick = end + timedelta(hours=3)
+        add_tick(engine, tick, PLAYERS + 3)
+        with engine.connect() as connection:
+            apply_retention(connection, tick)
+        with Session() as db:
+            store.update(db, tick)
+        check(Session, store, sample + [PLAYERS + 3], ranges)
+        for player in store.players.values():
+            before = player.window(None, None, store.raw_cutoff, store.hourly_cutoff)
+            player.rebase(store.raw_cutoff, store.hourly_cutoff)
+            after = player.window(None, None, store.raw_cutoff, store.hourly_cutoff)
+            assert all((a == b).all() for a, b in zip(before, after)), player.id
+        print(f"responses match the SQL path on a mapped snapshot (opened and replayed in "
+              f"{mapped_start * 1000:.0f} ms), after a tick that moved the retention cutoffs, and after a rebase")
+
+        # The snapshot is written as of its tick; the workers replay the rest
+        with Session() as db:
+            HistoryStore.build(db, tick).save(path)
+        assert read_snapshot(path).version == tick
+        for count in WORKERS:
+            for mode, worker_path in (('database', ''), ('snapshot, written by one', path),
+                                      ('snapshot, already written', path)):
+                if mode == 'snapshot, written by one':
+                    os.unlink(path)
+                wall, least, most, mapped = start_workers(url, worker_path, tick + TICK, count)
+                print(f"{count} workers from the {mode}: all ready in {wall:.1f}s, "
+                      f"{least:.1f}-{most:.1f} MB private each, {mapped} mapped")
+    finally:
+        for name in (path, f'{path}.lock'):
+            if os.path.exists(name):
+                os.unlink(name)
+        os.rmdir(os.path.dirname(path))
+        with engine.begin() as connection:
+            connection.execute(text(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE'))
+        engine.dispose()
@@ -0,0 +1,185 @@
+"""
+Check the in-process history store against the SQL path of the player page and measure both.
+
+Generates 30 days of five-minute snapshots, rolled into retention tiers, then:
+- builds the store and checks /players responses against the SQL path for a sample of players,
+  at every resolution, over the whole history and over ranges inside each tier
+- appends a tick, and a later one that moves the raw retention cutoff (applying retention in
+  the database as well), checking the responses again after each
+- times a response from the store against one from the database
+
+Needs a Postgres database; everything is created in a throwaway 'history_store_benchmark'
+schema that is dropped afterwards. The player endpoint module is imported, so DATABASE_URL must
+be set as well; the benchmark never uses it. Run from the backend directory:
+    DATABASE_URL=postgresql+pg8000://... BENCHMARK_DATABASE_URL=$DATABASE_URL \\
+    python -m scripts.benchmark_history_store
+"""
+from datetime import datetime, timedelta, timezone
+import os
+import random
+import time
+
+from fastapi import HTTPException
+from sqlalchemy import create_engine, event, insert, text
+from sqlalchemy.orm import sessionmaker
+
+from app.core.history_store import HistoryStore
+from app.core.retention import RAW_RETENTION, apply_retention
+from app.endpoints.player import load_player_info, store_player_info
+from app.models.db_models import Base, Player
+
+SCHEMA = 'history_store_benchmark'
+PLAYERS = 200
+DAYS = 30
+TICK = timedelta(minutes=5)
+SAMPLE_PLAYERS = 20
+TIMED_REQUESTS = 200
+
+
+def make_engine(url: str):
+    engine = create_engine(url)
+
+    @event.listens_for(engine, 'connect')
+    def use_benchmark_schema(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f'SET search_path TO {SCHEMA}')
+        cursor.close()
+        # Committed so the rollback that ends the first checkout does not undo it
+        dbapi_connection.commit()
+
+    return engine
+
+
+def reset_schema(engine):
+    with engine.begin() as connection:
+        connection.execute(text(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE'))
+        connection.execute(text(f'CREATE SCHEMA {SCHEMA}'))
+    Base.metadata.create_all(engine)
+
+
+def add_players(connection, ids):
+    connection.execute(insert(Player), [
+        {'id': i, 'summoner_id': f's{i}', 'puuid': f'p{i}', 'game_name': f'player{i}',
+         'game_name_lower': f'player{i}', 'tag_line': 'NA1', 'delta_8h': i % 7 - 3}
+        for i in ids
+    ])
+
+
+def refresh_latest(connection):
+    # What the player_data_latest trigger maintains, which create_all does not install
+    connection.execute(text("""
+        INSERT INTO player_latest (player_id, date, league_points, price)
+        SELECT DISTINCT ON (player_id) player_id, date, league_points, league_points
+        FROM player_data ORDER BY player_id, date DESC
+        ON CONFLICT (player_id) DO UPDATE SET date = excluded.date, league_points = excluded.league_points
+    """))
+
+
+def seed(engine, end: datetime):
+    with engine.begin() as connection:
+        # The last player never has a snapshot
+        add_players(connection, range(1, PLAYERS + 2))
+        connection.execute(text('SELECT setseed(0.42)'))
+        connection.execute(text("""
+            INSERT INTO player_data (player_id, date, league_points)
+            SELECT p, t, floor(random() * 1500)::int
+            FROM generate_series(1, :players) AS p,
+                 generate_series(CAST(:start AS timestamptz), CAST(:end AS timestamptz), CAST(:tick AS interval)) AS t
+            WHERE random() > 0.05
+            ORDER BY t
+        """), {'players': PLAYERS, 'start': end - timedelta(days=DAYS), 'end': end, 'tick': TICK})
+        refresh_latest(connection)
+    with engine.connect() as connection:
+        apply_retention(connection, end)
+
+
+def add_tick(engine, tick: datetime, new_player: int):
+    with engine.begin() as connection:
+        add_players(connection, [new_player])
+        connection.execute(text("""
+            INSERT INTO player_data (player_id, date, league_points)
+            SELECT p, CAST(:tick AS timestamptz), floor(random() * 1500)::int FROM generate_series(1, :players) AS p
+            UNION ALL SELECT :new_player, CAST(:tick AS timestamptz), 100
+        """), {'tick': tick, 'players': PLAYERS, 'new_player': new_player})
+        connection.execute(text('UPDATE players SET delta_24h = delta_24h + 1 WHERE id = 1'))
+        refresh_latest(connection)
+
+
+def response(load, *args):
+    try:
+        return load(*args)
+    except HTTPException as e:
+        return e.status_code, e.detail
+
+
+def check(Session, store: HistoryStore, player_ids, ranges):
+    with Session() as db:
+        for player_id in player_ids:
+            for start, end in ranges:
+                for resolution in ('raw', '1h', '1d'):
+                    args = (f'player{player_id}', 'NA1', start, end, resolution)
+                    expected = response(load_player_info, db, *args)
+                    assert response(store_player_info, store, *args) == expected, (player_id, start, end, resolution)
+
+
+if __name__ == "__main__":
+    url = os.environ.get('BENCHMARK_DATABASE_URL')
+    if not url:
+        raise SystemExit('Set BENCHMARK_DATABASE_URL to a Postgres database to run the benchmark')
+
+    engine = make_engine(url)
+    Session = sessionmaker(bind=engine)
+    end = datetime.now(timezone.utc)
+    rng = random.Random(0)
+    sample = rng.sample(range(1, PLAYERS + 1), SAMPLE_PLAYERS) + [PLAYERS + 1, PLAYERS + 100]
+    ranges = [(None, None), (end - timedelta(days=DAYS + 1), None), (None, end - timedelta(days=20)),
+              (end - timedelta(days=10, hours=5), end - timedelta(days=3, minutes=7)),
+              (end - timedelta(hours=10), end - timedelta(hours=2)), (end + timedelta(days=1), None)]
+    try:
+        reset_schema(engine)
+        seed(engine, end)
+
+        began = time.perf_counter()
+        with Session() as db:
+            store = HistoryStore.build(db, end)
+        build = time.perf_counter() - began
+        rows = sum(len(player.base_times) for player in store.players.values())
+        print(f"build: {rows} rows of {len(store.players)} players in {build:.2f}s, "
+              f"{store.nbytes()[0] / 2 ** 20:.1f} MB")
+        check(Session, store, sample, ranges)
+
+        tick = end + TICK
+        add_tick(engine, tick, PLAYERS + 2)
+        with Session() as db:
+            store.update(db, tick)
+        check(Session, store, sample + [1, PLAYERS + 2], ranges + [(tick - timedelta(hours=1), None)])
+
+        # Far enough ahead that the raw cutoff moves past more hours of snapshots
+        tick = end + timedelta(hours=3)
+        add_tick(engine, tick, PLAYERS + 3)
+        with engine.connect() as connection:
+            apply_retention(connection, tick)
+        began = time.perf_counter()
+        with Session() as db:
+            store.update(db, tick)
+        update = time.perf_counter() - began
+        assert store.raw_cutoff > (end - RAW_RETENTION).timestamp()
+        check(Session, store, sample + [PLAYERS + 3], ranges)
+        print(f"responses match the SQL path after the build, a tick, and a tick that moved the retention cutoffs "
+              f"(that update took {update * 1000:.0f} ms)")
+
+        for resolution in ('raw', '1h'):
+            began = time.perf_counter()
+            with Session() as db:
+                for _ in range(TIMED_REQUESTS):
+                    load_player_info(db, f'player{rng.randint(1, PLAYERS)}', 'NA1', None, None, resolution)
+            database = (time.perf_counter() - began) * 1000 / TIMED_REQUESTS
+            began = time.perf_counter()
+            for _ in range(TIMED_REQUESTS):
+                store_player_info(store, f'player{rng.randint(1, PLAYERS)}', 'NA1', None, None, resolution)
+            memory = (time.perf_counter() - began) * 1000 / TIMED_REQUESTS
+            print(f"full history at {resolution}: database {database:.1f} ms, store {memory:.1f} ms per response")
+    finally:
+        with engine.begin() as connection:
+            connection.execute(text(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE'))
+        engine.dispose()
@@ -0,0 +1,118 @@
+"""
+Measure one ingestion tick against the local mock ladder and check what it wrote.
+
+The first tick is cold: the puuid -> id cache is empty and every player's account is looked
+up and inserted. Later ticks are warm: the ladder is the only fetch and the snapshot is one
+COPY, apart from the few players the mock rotates in. Fetch and database time are reported
+separately, and every tick is checked against the mock: one player_data row per listed
+player, player_latest at the tick, and players leaving the ladder given a delist date.
+
+Needs a Postgres database; everything is created in a throwaway 'ingest_benchmark' schema that
+is dropped afterwards. Run from the backend directory:
+    BENCHMARK_DATABASE_URL=postgresql+pg8000://... python -m scripts.benchmark_ingest
+BENCHMARK_ASYNC_DATABASE_URL overrides the asyncpg URL derived from it.
+"""
+from datetime import datetime, timedelta, timezone
+import asyncio
+import os
+import socket
+import threading
+import time
+
+import uvicorn
+from sqlalchemy import create_engine, event, text, make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.deltas import DeltaEngine
+from app.core.ingest import DELIST_GRACE, RiotClient, RateLimiter, PlayerIdCache, ingest_tick
+from app.models.db_models import Base
+from scripts.mock_ladder import MockLadder, create_app
+
+SCHEMA = 'ingest_benchmark'
+LADDER_SIZE = 750
+WARM_TICKS = 10
+
+
+def make_engine(url: str):
+    engine = create_engine(url)
+
+    @event.listens_for(engine, 'connect')
+    def use_benchmark_schema(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f'SET search_path TO {SCHEMA}')
+        cursor.close()
+        # Committed so the rollback that ends the first checkout does not undo it
+        dbapi_connection.commit()
+
+    return engine
+
+
+def reset_schema(engine):
+    with engine.begin() as connection:
+        connection.execute(text(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE'))
+        connection.execute(text(f'CREATE SCHEMA {SCHEMA}'))
+    Base.metadata.create_all(engine)
+
+
+def serve(ladder: MockLadder) -> str:
+    """Run the mock in a background thread and return its base URL."""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(create_app(ladder), port=port, log_level='warning'))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f'http://127.0.0.1:{port}'
+
+
+def check(engine, ladder: MockLadder, tick: datetime):
+    with engine.connect() as connection:
+        written = dict(connection.execute(text(
+            'SELECT p.puuid, d.league_points FROM player_data d JOIN players p ON p.id = d.player_id '
+            'WHERE d.date = :tick'), {'tick': tick}).all())
+        latest = connection.execute(text(
+            'SELECT count(*) FROM player_latest WHERE date = :tick'), {'tick': tick}).scalar()
+        leaving = dict(connection.execute(text(
+            'SELECT puuid, delist_date FROM players WHERE delist_date IS NOT NULL')).all())
+    assert written == {puuid: ladder.league_points[puuid] for puuid in ladder.listed}, 'snapshot differs'
+    assert latest == len(ladder.listed), latest
+    assert not set(leaving) & set(ladder.listed), 'a listed player has a delist date'
+    assert all(date <= tick + DELIST_GRACE for date in leaving.values())
+    return len(leaving)
+
+
+async def benchmark(url: str, async_url: str):
+    engine = make_engine(url)
+    async_engine = create_async_engine(async_url, connect_args={'server_settings': {'search_path': SCHEMA}})
+    ladder = MockLadder(ladder_size=LADDER_SIZE)
+    base_url = serve(ladder)
+    client = RiotClient('benchmark', platform_url=base_url, regional_url=base_url, limiter=RateLimiter([(400, 1)]))
+    cache = PlayerIdCache()
+    deltas = DeltaEngine()
+    start = datetime.now(timezone.utc)
+
+    print(f"{'tick':<6} {'players':>7} {'new':>5} {'leaving':>7} {'fetch s':>8} {'db ms':>8}")
+    try:
+        reset_schema(engine)
+        for i in range(WARM_TICKS + 1):
+            tick = start + timedelta(minutes=5 * i)
+            result = await ingest_tick(client, async_engine, cache, tick, deltas)
+            leaving = check(engine, ladder, tick)
+            print(f"{'cold' if i == 0 else i:<6} {result.players:>7} {result.new_players:>5} {leaving:>7} "
+                  f"{result.fetch_seconds:8.2f} {result.db_seconds * 1000:8.1f}")
+            ladder.advance()
+    finally:
+        await client.close()
+        await async_engine.dispose()
+        with engine.begin() as connection:
+            connection.execute(text(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE'))
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    url = os.environ.get('BENCHMARK_DATABASE_URL')
+    if not url:
+        raise SystemExit('Set BENCHMARK_DATABASE_URL to a Postgres database to run the benchmark')
+    async_url = os.environ.get('BENCHMARK_ASYNC_DATABASE_URL') or make_url(url).set(drivername='postgresql+asyncpg')
+    asyncio.run(benchmark(url, async_url))
@@ -0,0 +1,45 @@
+"""
+Compare per-element price_model calls with price_model_batch.
+
+Workload: 750 players x 30 days of 5-minute ticks (288 a day), i.e. one season of history.
+Run from the backend directory: python -m scripts.benchmark_pricing
+"""
+import time
+
+import numpy as np
+
+from app.models.pricing_model import price_model, price_model_batch
+
+PLAYERS = 750
+TICKS = 30 * 288
+
+
+def generate_history(seed: int = 0) -> np.ndarray:
+    # Random-walk LP per player, clipped at zero like the real ladder
+    rng = np.random.default_rng(seed)
+    start = rng.integers(200, 1500, size=(PLAYERS, 1))
+    steps = rng.integers(-12, 13, size=(PLAYERS, TICKS))
+    return np.clip(start + np.cumsum(steps, axis=1), 0, None)
+
+
+def timed(label: str, fn):
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<38} {elapsed * 1000:10.1f} ms")
+    return result, elapsed
+
+
+if __name__ == "__main__":
+    history = generate_history()
+    rows = [player.tolist() for player in history]
+    print(f"{PLAYERS} players x {TICKS} ticks = {history.size:,} prices "
+          f"(LP range {history.min()}-{history.max()})")
+
+    scalar, scalar_time = timed("price_model per element", lambda: [[price_model(lp) for lp in player] for player in rows])
+    per_player, _ = timed("price_model_batch per player history", lambda: [price_model_batch(player) for player in rows])
+    batch, batch_time = timed("price_model_batch whole season", lambda: price_model_batch(history))
+
+    assert np.allclose(np.array(scalar), batch, rtol=1e-12, atol=0)
+    assert all(np.array_equal(a, b) for a, b in zip(per_player, batch))
+    print(f"speedup {scalar_time / batch_time:.0f}x")
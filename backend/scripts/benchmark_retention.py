@@ -0,0 +1,198 @@
+"""
+Check that retention keeps the history endpoints' answers and measure what it saves.
+
+Generates 120 days of five-minute snapshots in player_data and regionals_data, reads a few
+players' histories at every resolution, applies retention, and checks that:
+- each tier only holds its own period, and a second run has nothing left to do
+- daily candles are unchanged over the whole range, hourly candles wherever hourly or raw rows
+  remain, and raw ticks inside the raw window
+- the newest history date of a regionals player is still found once all of it is rolled up
+- deltas backfilled inside the raw window are unchanged, and a backfill of a range that was
+  rolled up still finds its ticks, one per hourly bucket, with deltas between bucket closes
+
+It reports the rows and on-disk size of player_data and the time of a full-range '1d' history
+read, before and after. The size barely moves: deleted rows leave space for new snapshots to
+reuse rather than shrinking the table, so the raw table stops growing instead.
+
+Needs a Postgres database; everything is created in a throwaway 'retention_benchmark' schema
+that is dropped afterwards. Run from the backend directory:
+    BENCHMARK_DATABASE_URL=postgresql+pg8000://... python -m scripts.benchmark_retention
+"""
+from datetime import datetime, timedelta, timezone
+import os
+import time
+
+import numpy as np
+from sqlalchemy import create_engine, event, insert, text, select, func
+from sqlalchemy.orm import sessionmaker
+
+from app.core.deltas import DELTA_WINDOWS, backfill_deltas
+from app.core.price_history import history_payload, latest_history_date, load_lp_history
+from app.core.retention import HISTORY_TIERS, HOURLY_RETENTION, RAW_RETENTION, apply_retention, truncate
+from app.models.db_models import Base, Player, PlayerData, PlayerDataHourly, RegionalsNonna, RegionalsData
+from app.models.pricing_model import price_model
+
+SCHEMA = 'retention_benchmark'
+PLAYERS = 100
+REGIONALS_PLAYERS = 20
+DAYS = 120
+TICK = timedelta(minutes=5)
+CHECKED_PLAYERS = [1, 37, 100]
+
+
+def make_engine(url: str):
+    engine = create_engine(url)
+
+    @event.listens_for(engine, 'connect')
+    def use_benchmark_schema(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f'SET search_path TO {SCHEMA}')
+        cursor.close()
+        # Committed so the rollback that ends the first checkout does not undo it
+        dbapi_connection.commit()
+
+    return engine
+
+
+def reset_schema(engine):
+    with engine.begin() as connection:
+        connection.execute(text(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE'))
+        connection.execute(text(f'CREATE SCHEMA {SCHEMA}'))
+    Base.metadata.create_all(engine)
+
+
+def seed(engine, end: datetime):
+    with engine.begin() as connection:
+        connection.execute(insert(Player), [
+            {'id': i + 1, 'summoner_id': f's{i}', 'puuid': f'p{i}', 'game_name': f'player{i}',
+             'game_name_lower': f'player{i}', 'tag_line': 'NA1'}
+            for i in range(PLAYERS)
+        ])
+        connection.execute(insert(RegionalsNonna), [
+            {'id': i + 1, 'game_name': f'regional{i}', 'tag_line': 'NA1', 'region': 'NA'}
+            for i in range(REGIONALS_PLAYERS)
+        ])
+        # Regionals ended before the hourly window, so all of their history ends up in daily buckets
+        for table, players, last in [('player_data', PLAYERS, end),
+                                     ('regionals_data', REGIONALS_PLAYERS, end - HOURLY_RETENTION - timedelta(days=2))]:
+            connection.execute(text('SELECT setseed(0.42)'))
+            connection.execute(text(f"""
+                INSERT INTO {table} (player_id, date, league_points)
+                SELECT p, t, floor(random() * 1500)::int
+                FROM generate_series(1, :players) AS p,
+                     generate_series(CAST(:start AS timestamptz), CAST(:end AS timestamptz), CAST(:tick AS interval)) AS t
+                ORDER BY t
+            """), {'players': players, 'start': end - timedelta(days=DAYS), 'end': last, 'tick': TICK})
+        connection.execute(text('ANALYZE'))
+
+
+def histories(db, end: datetime):
+    result = {}
+    for player_id in CHECKED_PLAYERS:
+        for resolution in ('raw', '1h', '1d'):
+            result[player_id, resolution] = history_payload(load_lp_history(db, PlayerData, player_id), resolution)
+    return result
+
+
+def deltas(db, start: datetime, end: datetime):
+    """Backfilled ticks in [start, end] and every window's deltas at them, as (ticks x players) arrays."""
+    frames = list(backfill_deltas(db, start, end))
+    return np.concatenate([frame.ticks for frame in frames]), frames[0].player_ids, \
+        {field: np.concatenate([frame.deltas[field] for frame in frames]) for field in DELTA_WINDOWS}
+
+
+def rolled_delta(db, player_id: int, tick: datetime, window: timedelta) -> float:
+    """A delta from the hourly closes directly: the close at tick less the last close at or before tick - window."""
+    def close_at(when: datetime) -> int:
+        return db.execute(select(PlayerDataHourly.close).where(
+            PlayerDataHourly.player_id == player_id, PlayerDataHourly.bucket <= when
+        ).order_by(PlayerDataHourly.bucket.desc()).limit(1)).scalar()
+    return price_model(close_at(tick)) - price_model(close_at(tick - window))
+
+
+def since(payload: dict, start: datetime) -> dict:
+    keep = [index for index, date in enumerate(payload['date']) if datetime.fromisoformat(date) >= start]
+    return {key: [values[index] for index in keep] for key, values in payload.items()}
+
+
+def footprint(engine):
+    with engine.connect() as connection:
+        rows = connection.execute(text('SELECT count(*) FROM player_data')).scalar()
+        size = connection.execute(text("SELECT pg_total_relation_size('player_data')")).scalar()
+    return rows, size / 2 ** 20
+
+
+def timed_read(Session):
+    began = time.perf_counter()
+    with Session() as db:
+        for player_id in CHECKED_PLAYERS:
+            history_payload(load_lp_history(db, PlayerData, player_id), '1d')
+    return (time.perf_counter() - began) * 1000 / len(CHECKED_PLAYERS)
+
+
+if __name__ == "__main__":
+    url = os.environ.get('BENCHMARK_DATABASE_URL')
+    if not url:
+        raise SystemExit('Set BENCHMARK_DATABASE_URL to a Postgres database to run the benchmark')
+
+    engine = make_engine(url)
+    Session = sessionmaker(bind=engine)
+    end = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+    raw_cutoff = truncate(end - RAW_RETENTION, timedelta(hours=1))
+    hourly_cutoff = truncate(end - HOURLY_RETENTION, timedelta(days=1))
+    # Its lookback stays inside the raw window
+    recent_range = (end - timedelta(days=1), end - timedelta(hours=22))
+    try:
+        reset_schema(engine)
+        seed(engine, end)
+        with Session() as db:
+            before = histories(db, end)
+            regional_latest = latest_history_date(db, RegionalsData, 1)
+            recent_deltas = deltas(db, *recent_range)
+        rows, size = footprint(engine)
+        read = timed_read(Session)
+        print(f"before: player_data {rows} rows, {size:.0f} MB, full-range 1d read {read:.1f} ms")
+
+        began = time.perf_counter()
+        with engine.connect() as connection:
+            apply_retention(connection, end)
+        elapsed = time.perf_counter() - began
+
+        with engine.connect() as connection:
+            for tiers in HISTORY_TIERS:
+                ranges = connection.execute(select(func.min(tiers.raw.date), func.max(tiers.raw.date))).one()
+                hourly = connection.execute(select(func.min(tiers.hourly.bucket), func.max(tiers.hourly.bucket))).one()
+                daily_max = connection.execute(select(func.max(tiers.daily.bucket))).scalar()
+                assert ranges[0] is None or ranges[0] >= raw_cutoff, ranges
+                assert hourly[0] is None or (hourly[0] >= hourly_cutoff and hourly[1] < raw_cutoff), hourly
+                assert daily_max is None or daily_max < hourly_cutoff, daily_max
+            apply_retention(connection, end)
+            assert connection.execute(text('SELECT count(*) FROM player_data_daily')).scalar() > 0
+
+        with Session() as db:
+            after = histories(db, end)
+            assert latest_history_date(db, RegionalsData, 1) == truncate(regional_latest, timedelta(days=1))
+
+            ticks, player_ids, recent = deltas(db, *recent_range)
+            assert (ticks == recent_deltas[0]).all() and all(
+                np.array_equal(recent[field], recent_deltas[2][field], equal_nan=True) for field in DELTA_WINDOWS)
+            old = truncate(end - timedelta(days=60), timedelta(days=1))
+            ticks, player_ids, old_deltas = deltas(db, old, old + timedelta(days=1))
+            assert ticks.tolist() == [int((old + timedelta(hours=hour)).timestamp()) for hour in range(25)], ticks
+            column = player_ids.tolist().index(CHECKED_PLAYERS[0])
+            for field, window in DELTA_WINDOWS.items():
+                expected = rolled_delta(db, CHECKED_PLAYERS[0], old + timedelta(hours=12), window)
+                assert abs(old_deltas[field][12, column] - expected) < 1e-6, (field, expected)
+        for player_id in CHECKED_PLAYERS:
+            assert after[player_id, '1d'] == before[player_id, '1d'], player_id
+            assert since(after[player_id, '1h'], hourly_cutoff) == since(before[player_id, '1h'], hourly_cutoff)
+            assert since(after[player_id, 'raw'], raw_cutoff) == since(before[player_id, 'raw'], raw_cutoff)
+        print(f"retention applied in {elapsed:.1f}s; history reads and backfilled deltas match across tiers")
+
+        rows, size = footprint(engine)
+        read = timed_read(Session)
+        print(f"after:  player_data {rows} rows, {size:.0f} MB, full-range 1d read {read:.1f} ms")
+    finally:
+        with engine.begin() as connection:
+            connection.execute(text(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE'))
+        engine.dispose()
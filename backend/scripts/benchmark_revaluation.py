@@ -0,0 +1,146 @@
+"""
+Measure how portfolio revaluation scales with the number of portfolios.
+
+Compares revalue_portfolios (one set-based statement) with the per-portfolio ORM loop it
+replaces, at several league sizes. Needs a Postgres database; everything is created in a
+throwaway 'revaluation_benchmark' schema that is dropped afterwards.
+Run from the backend directory:
+    BENCHMARK_DATABASE_URL=postgresql+pg8000://... python -m scripts.benchmark_revaluation
+"""
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+import os
+import time
+
+import numpy as np
+from sqlalchemy import create_engine, event, insert, text
+from sqlalchemy.orm import sessionmaker
+
+from app.core.revaluation import revalue_portfolios
+from app.models.db_models import Base, Player, PlayerLatest, League, User, Portfolio, PortfolioPlayer, \
+    PortfolioHistory, UserLeagues
+from app.models.pricing_model import price_model_batch
+
+SCHEMA = 'revaluation_benchmark'
+PORTFOLIO_COUNTS = [100, 1_000, 5_000, 20_000]
+PLAYERS = 750
+HOLDINGS_PER_PORTFOLIO = 8
+# The per-portfolio loop is only timed up to this size, beyond that it just takes too long
+MAX_LOOP_PORTFOLIOS = 5_000
+
+
+def make_engine(url: str):
+    engine = create_engine(url)
+
+    @event.listens_for(engine, 'connect')
+    def use_benchmark_schema(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f'SET search_path TO {SCHEMA}')
+        cursor.close()
+        # Committed so the rollback that ends the first checkout does not undo it
+        dbapi_connection.commit()
+
+    return engine
+
+
+def reset_schema(engine):
+    with engine.begin() as connection:
+        connection.execute(text(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE'))
+        connection.execute(text(f'CREATE SCHEMA {SCHEMA}'))
+    Base.metadata.create_all(engine)
+
+
+def seed(engine, portfolios: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    now = datetime.now(timezone.utc)
+    lps = rng.integers(0, 2000, size=PLAYERS)
+    prices = price_model_batch(lps)
+
+    with engine.begin() as connection:
+        connection.execute(insert(Player), [
+            {'id': i + 1, 'summoner_id': f's{i}', 'puuid': f'p{i}', 'game_name': f'player{i}',
+             'game_name_lower': f'player{i}', 'tag_line': 'NA1'}
+            for i in range(PLAYERS)
+        ])
+        connection.execute(insert(PlayerLatest), [
+            {'player_id': i + 1, 'date': now, 'league_points': int(lps[i]), 'price': float(prices[i])}
+            for i in range(PLAYERS)
+        ])
+        connection.execute(insert(League), [{
+            'id': 1, 'name': 'benchmark', 'start_date': now - timedelta(days=1),
+            'end_date': now + timedelta(days=30), 'type': 'public'
+        }])
+        connection.execute(insert(User), [
+            {'id': i + 1, 'username': f'user{i}', 'password': '', 'date_registered': now, 'current_league_id': 1}
+            for i in range(portfolios)
+        ])
+        connection.execute(insert(Portfolio), [
+            {'id': i + 1, 'current_value': 100000} for i in range(portfolios)
+        ])
+        connection.execute(insert(UserLeagues), [
+            {'user_id': i + 1, 'league_id': 1, 'portfolio_id': i + 1,
+             'balance': Decimal(int(rng.integers(0, 100000)))}
+            for i in range(portfolios)
+        ])
+        holdings = []
+        for portfolio_id in range(1, portfolios + 1):
+            for player_id in rng.choice(PLAYERS, size=HOLDINGS_PER_PORTFOLIO, replace=False):
+                holdings.append({'portfolio_id': portfolio_id, 'player_id': int(player_id) + 1,
+                                 'shares': int(rng.integers(1, 50)), 'purchase_price': 100})
+        connection.execute(insert(PortfolioPlayer), holdings)
+    return now
+
+
+def revalue_per_portfolio(db, as_of: datetime) -> int:
+    # One price lookup per holding and one write per portfolio
+    user_leagues = db.query(UserLeagues).all()
+    for user_league in user_leagues:
+        value = user_league.balance
+        for holding in db.query(PortfolioPlayer).filter(PortfolioPlayer.portfolio_id == user_league.portfolio_id):
+            latest = db.query(PlayerLatest).filter(PlayerLatest.player_id == holding.player_id).first()
+            value += holding.shares * Decimal(latest.price)
+        portfolio = db.query(Portfolio).filter(Portfolio.id == user_league.portfolio_id).first()
+        portfolio.current_value = value
+        db.add(PortfolioHistory(portfolio_id=portfolio.id, value=value, date=as_of))
+    db.commit()
+    return len(user_leagues)
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - start) * 1000
+
+
+if __name__ == "__main__":
+    url = os.environ.get('BENCHMARK_DATABASE_URL')
+    if not url:
+        raise SystemExit('Set BENCHMARK_DATABASE_URL to a Postgres database to run the benchmark')
+
+    engine = make_engine(url)
+    Session = sessionmaker(bind=engine)
+    print(f"{'portfolios':>10} {'set-based ms':>14} {'per-row ms':>12} {'speedup':>8}")
+    try:
+        for count in PORTFOLIO_COUNTS:
+            reset_schema(engine)
+            as_of = seed(engine, count)
+
+            with Session() as db:
+                revalued, set_ms = timed(lambda: revalue_portfolios(db, as_of))
+            assert revalued == count
+
+            loop_ms = None
+            if count <= MAX_LOOP_PORTFOLIOS:
+                with Session() as db:
+                    expected = {pid: value for pid, value in db.query(Portfolio.id, Portfolio.current_value)}
+                    _, loop_ms = timed(lambda: revalue_per_portfolio(db, as_of))
+                    actual = {pid: value for pid, value in db.query(Portfolio.id, Portfolio.current_value)}
+                assert all(abs(actual[pid] - expected[pid]) < Decimal('0.0001') for pid in expected)
+
+            loop_column = f"{loop_ms:12.1f}" if loop_ms is not None else f"{'-':>12}"
+            speedup = f"{loop_ms / set_ms:7.0f}x" if loop_ms is not None else f"{'-':>8}"
+            print(f"{count:>10} {set_ms:14.1f} {loop_column} {speedup}")
+    finally:
+        with engine.begin() as connection:
+            connection.execute(text(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE'))
+        engine.dispose()
@@ -0,0 +1,303 @@
+"""
+Measure trade latency under parallel load and check that concurrent trades never overspend.
+
+Each scenario runs with several worker threads trading on their own sessions:
+- spread: buys and sells of one share spread over many accounts, the normal case
+- contended: every worker buys for the same account, whose balance covers only part of the
+  orders; its user_leagues row lock serializes them, and the final balance must equal the
+  starting balance minus exactly the trades that succeeded
+- raced sells: every worker tries to sell the whole of one holding of the same account; exactly
+  one sale may succeed, and the balance must rise by exactly its proceeds
+- raced buys: every worker buys one share of a player the account does not hold yet, so the
+  first buys race to create the holding; every buy must succeed and be counted in the holding
+- raced baskets: every worker sends the same basket selling the whole of two holdings of one
+  account; exactly one basket may succeed, all of it
+
+Once at the end, a trade waits on the account lock of a hold sweep that then releases expired
+holds and commits first; the trade must keep the released shares free.
+- basket / singles: a 10-leg rebalance as one execute_orders call, and the same legs as ten
+  separate trades; latency is per rebalance
+
+Needs a Postgres database; everything is created in a throwaway 'trade_benchmark' schema that
+is dropped afterwards. Run from the backend directory:
+    BENCHMARK_DATABASE_URL=postgresql+pg8000://... python -m scripts.benchmark_trades
+"""
+from concurrent.futures import ThreadPoolExecutor
+import threading
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+import logging
+import os
+import random
+import time
+
+import numpy as np
+from fastapi import HTTPException
+from sqlalchemy import create_engine, event, insert, delete, select, text, func
+from sqlalchemy.orm import sessionmaker
+
+from app.core.holds import sweep_statement
+from app.core.trade import execute_trade, execute_orders
+from app.models.db_models import Base, Player, PlayerLatest, League, User, Portfolio, PortfolioPlayer, \
+    PortfolioHold, Transaction, UserLeagues
+from app.models.models import OrderRequest, UserIdentity
+
+SCHEMA = 'trade_benchmark'
+WORKER_COUNTS = [1, 8, 32]
+TRADES_PER_WORKER = 200
+ACCOUNTS = 1_000
+PLAYERS = 200
+PRICE = 100.0
+CONTENDED_BUYS = 50  # Orders the contended account can afford; every further order must fail
+BASKET_LEGS = 10
+REBALANCES_PER_WORKER = 20
+RACED_CALLS = 5  # Calls per worker in the raced scenarios
+RACED_SHARES = 1_000  # Shares of each holding the raced sells try to sell at once
+
+
+def make_engine(url: str, pool_size: int):
+    engine = create_engine(url, pool_size=pool_size, max_overflow=0)
+
+    @event.listens_for(engine, 'connect')
+    def use_benchmark_schema(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f'SET search_path TO {SCHEMA}')
+        cursor.close()
+        # Committed so the rollback that ends the first checkout does not undo it
+        dbapi_connection.commit()
+
+    return engine
+
+
+def reset_schema(engine):
+    with engine.begin() as connection:
+        connection.execute(text(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE'))
+        connection.execute(text(f'CREATE SCHEMA {SCHEMA}'))
+    Base.metadata.create_all(engine)
+
+
+def seed(engine):
+    now = datetime.now(timezone.utc)
+    with engine.begin() as connection:
+        connection.execute(insert(Player), [
+            {'id': i + 1, 'summoner_id': f's{i}', 'puuid': f'p{i}', 'game_name': f'player{i}',
+             'game_name_lower': f'player{i}', 'tag_line': 'NA1'}
+            for i in range(PLAYERS)
+        ])
+        connection.execute(insert(PlayerLatest), [
+            {'player_id': i + 1, 'date': now, 'league_points': 1000, 'price': PRICE} for i in range(PLAYERS)
+        ])
+        connection.execute(insert(League), [{
+            'id': 1, 'name': 'benchmark', 'start_date': now - timedelta(days=1),
+            'end_date': now + timedelta(days=30), 'type': 'public'
+        }])
+        connection.execute(insert(User), [
+            {'id': i + 1, 'username': f'user{i}', 'password': '', 'date_registered': now, 'current_league_id': 1}
+            for i in range(ACCOUNTS)
+        ])
+        connection.execute(insert(Portfolio), [{'id': i + 1, 'current_value': 0} for i in range(ACCOUNTS)])
+        connection.execute(insert(UserLeagues), [
+            {'user_id': i + 1, 'league_id': 1, 'portfolio_id': i + 1, 'balance': Decimal(1_000_000)}
+            for i in range(ACCOUNTS)
+        ])
+        # Shares bought before the benchmark carry no hold, so they can be sold right away
+        connection.execute(insert(PortfolioPlayer), [
+            {'portfolio_id': account + 1, 'player_id': player + 1, 'purchase_price': PRICE, 'shares': 1_000}
+            for account in range(ACCOUNTS) for player in range(0, PLAYERS, 20)
+        ])
+
+
+def identity(account: int) -> UserIdentity:
+    return UserIdentity(id=account, username=f'user{account - 1}', current_league_id=1)
+
+
+def run(Session, workers: int, operation, calls: int = TRADES_PER_WORKER):
+    """
+    Call operation(db, rng) `calls` times on each worker; returns the latencies in ms,
+    the number of calls that succeeded and the elapsed wall time.
+    """
+    def worker(seed: int):
+        rng = random.Random(seed)
+        latencies, succeeded = [], 0
+        with Session() as db:
+            for _ in range(calls):
+                start = time.perf_counter()
+                try:
+                    operation(db, rng)
+                    succeeded += 1
+                except HTTPException:
+                    pass
+                latencies.append((time.perf_counter() - start) * 1000)
+        return latencies, succeeded
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(worker, range(workers)))
+    elapsed = time.perf_counter() - start
+    latencies = np.concatenate([np.array(latency) for latency, _ in results])
+    return latencies, sum(succeeded for _, succeeded in results), elapsed
+
+
+def spread_trade(db, rng):
+    # Sells only touch the pre-seeded holdings, which are never on hold
+    account = rng.randint(1, ACCOUNTS)
+    if rng.random() < 0.5:
+        execute_trade(db, identity(account), f'player{rng.randrange(0, PLAYERS, 20)}', 'NA1', 'sell', 1)
+    else:
+        execute_trade(db, identity(account), f'player{rng.randrange(PLAYERS)}', 'NA1', 'buy', 1)
+
+
+def contended_trade(db, rng):
+    execute_trade(db, identity(1), f'player{rng.randrange(PLAYERS)}', 'NA1', 'buy', 1)
+
+
+def raced_sell(db, rng):
+    execute_trade(db, identity(2), 'player0', 'NA1', 'sell', RACED_SHARES)
+
+
+def raced_buy(db, rng):
+    execute_trade(db, identity(3), 'player1', 'NA1', 'buy', 1)
+
+
+def raced_basket(db, rng):
+    execute_orders(db, identity(4), [
+        OrderRequest(gameName=f'player{player}', tagLine='NA1', type='sell', shares=RACED_SHARES) for player in (0, 20)
+    ])
+
+
+def reset_holdings(engine, account: int, player_ids, shares: int) -> Decimal:
+    """Leave account with exactly `shares` free shares of each player (no holding when 0); returns its balance."""
+    with engine.begin() as connection:
+        connection.execute(delete(PortfolioHold).where(
+            PortfolioHold.portfolio_id == account, PortfolioHold.player_id.in_(player_ids)))
+        connection.execute(delete(PortfolioPlayer).where(
+            PortfolioPlayer.portfolio_id == account, PortfolioPlayer.player_id.in_(player_ids)))
+        if shares:
+            connection.execute(insert(PortfolioPlayer), [
+                {'portfolio_id': account, 'player_id': player_id, 'purchase_price': PRICE, 'shares': shares}
+                for player_id in player_ids
+            ])
+        return connection.execute(select(UserLeagues.balance).where(UserLeagues.user_id == account)).scalar()
+
+
+def holdings_after(engine, account: int):
+    """Balance of account and its (shares, locked_shares) by player id."""
+    with engine.connect() as connection:
+        balance = connection.execute(select(UserLeagues.balance).where(UserLeagues.user_id == account)).scalar()
+        rows = connection.execute(
+            select(PortfolioPlayer.player_id, PortfolioPlayer.shares, PortfolioPlayer.locked_shares)
+            .where(PortfolioPlayer.portfolio_id == account)
+        ).all()
+    return balance, {row.player_id: (row.shares, row.locked_shares) for row in rows}
+
+
+def check_sweep_race(engine, Session):
+    """A trade that waited on a sweep must read the holding as the sweep left it, not as it found it."""
+    now = datetime.now(timezone.utc)
+    reset_holdings(engine, 5, [1], RACED_SHARES)
+    with engine.begin() as connection:
+        connection.execute(insert(PortfolioHold), [
+            {'portfolio_id': 5, 'player_id': 1, 'hold_deadline': now - timedelta(minutes=1), 'shares': 100}])
+        connection.execute(text('UPDATE portfolio_players SET locked_shares = 100 WHERE portfolio_id = 5 AND player_id = 1'))
+
+    with Session() as sweeper, Session() as trader:
+        # The sweep locks the account first; the trade blocks on that lock until the sweep commits
+        assert sweeper.execute(sweep_statement(now, 10)).scalar() == 1
+        trade = threading.Thread(target=execute_trade, args=(trader, identity(5), 'player0', 'NA1', 'sell', 1))
+        trade.start()
+        time.sleep(0.5)
+        assert trade.is_alive(), 'the trade did not wait for the sweep'
+        sweeper.commit()
+        trade.join()
+
+    _, holdings = holdings_after(engine, 5)
+    assert holdings[1] == (RACED_SHARES - 1, 0), holdings[1]
+
+
+def rebalance(rng):
+    """Half the legs sell pre-seeded holdings, the other half buy other players."""
+    sells = rng.sample(range(0, PLAYERS, 20), BASKET_LEGS // 2)
+    buys = rng.sample([player for player in range(PLAYERS) if player % 20], BASKET_LEGS - len(sells))
+    return rng.randint(1, ACCOUNTS), \
+        [OrderRequest(gameName=f'player{player}', tagLine='NA1', type='sell', shares=1) for player in sells] + \
+        [OrderRequest(gameName=f'player{player}', tagLine='NA1', type='buy', shares=1) for player in buys]
+
+
+def basket_rebalance(db, rng):
+    account, orders = rebalance(rng)
+    execute_orders(db, identity(account), orders)
+
+
+def singles_rebalance(db, rng):
+    account, orders = rebalance(rng)
+    for order in orders:
+        execute_trade(db, identity(account), order.gameName, order.tagLine, order.type, order.shares)
+
+
+def report(label: str, workers: int, latencies, elapsed: float):
+    p50, p99 = np.percentile(latencies, [50, 99])
+    print(f"{label:<10} {workers:>7} {len(latencies):>7} {p50:9.2f} {p99:9.2f} {len(latencies) / elapsed:9.0f}")
+
+
+if __name__ == "__main__":
+    url = os.environ.get('BENCHMARK_DATABASE_URL')
+    if not url:
+        raise SystemExit('Set BENCHMARK_DATABASE_URL to a Postgres database to run the benchmark')
+
+    # Rejected orders are expected in the contended scenario
+    logging.getLogger('app.core.trade').setLevel(logging.CRITICAL)
+    engine = make_engine(url, pool_size=max(WORKER_COUNTS))
+    Session = sessionmaker(bind=engine)
+    print(f"{'scenario':<10} {'workers':>7} {'trades':>7} {'p50 ms':>9} {'p99 ms':>9} {'trades/s':>9}")
+    try:
+        for workers in WORKER_COUNTS:
+            reset_schema(engine)
+            seed(engine)
+            latencies, _, elapsed = run(Session, workers, spread_trade)
+            report('spread', workers, latencies, elapsed)
+            latencies, _, elapsed = run(Session, workers, basket_rebalance, REBALANCES_PER_WORKER)
+            report('basket', workers, latencies, elapsed)
+            latencies, _, elapsed = run(Session, workers, singles_rebalance, REBALANCES_PER_WORKER)
+            report('singles', workers, latencies, elapsed)
+
+            with engine.begin() as connection:
+                connection.execute(text('UPDATE user_leagues SET balance = :balance WHERE user_id = 1'),
+                                   {'balance': Decimal(PRICE) * CONTENDED_BUYS})
+                connection.execute(text('DELETE FROM transactions WHERE portfolio_id = 1'))
+            latencies, succeeded, elapsed = run(Session, workers, contended_trade)
+            report('contended', workers, latencies, elapsed)
+
+            with Session() as db:
+                balance = db.query(UserLeagues.balance).filter(UserLeagues.user_id == 1).scalar()
+                buys = db.query(func.count(Transaction.id)).filter(Transaction.portfolio_id == 1).scalar()
+            assert succeeded == buys == min(CONTENDED_BUYS, workers * TRADES_PER_WORKER), (succeeded, buys)
+            assert balance == Decimal(PRICE) * (CONTENDED_BUYS - succeeded), balance
+
+            # Player ids are one more than the number in the player's name
+            before = reset_holdings(engine, 2, [1], RACED_SHARES)
+            latencies, succeeded, elapsed = run(Session, workers, raced_sell, RACED_CALLS)
+            report('sells', workers, latencies, elapsed)
+            balance, holdings = holdings_after(engine, 2)
+            assert succeeded == 1 and 1 not in holdings, (succeeded, holdings.get(1))
+            assert balance == before + Decimal(PRICE) * RACED_SHARES, (before, balance)
+
+            before = reset_holdings(engine, 3, [2], 0)
+            latencies, succeeded, elapsed = run(Session, workers, raced_buy, RACED_CALLS)
+            report('buys', workers, latencies, elapsed)
+            balance, holdings = holdings_after(engine, 3)
+            assert succeeded == workers * RACED_CALLS and holdings[2] == (succeeded, succeeded), (succeeded, holdings)
+            assert balance == before - Decimal(PRICE) * succeeded, (before, balance)
+
+            before = reset_holdings(engine, 4, [1, 21], RACED_SHARES)
+            latencies, succeeded, elapsed = run(Session, workers, raced_basket, RACED_CALLS)
+            report('baskets', workers, latencies, elapsed)
+            balance, holdings = holdings_after(engine, 4)
+            assert succeeded == 1 and not {1, 21} & set(holdings), (succeeded, holdings)
+            assert balance == before + Decimal(PRICE) * RACED_SHARES * 2, (before, balance)
+
+        check_sweep_race(engine, Session)
+        print("a trade waiting on a hold sweep keeps the released shares free")
+    finally:
+        with engine.begin() as connection:
+            connection.execute(text(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE'))
+        engine.dispose()
@@ -0,0 +1,89 @@
+"""
+Check primary/replica routing of read-only sessions against two local Postgres instances.
+
+Two standalone instances are enough: a database that is not in recovery reports zero lag, so the
+second one is treated as an up-to-date replica. Run from the backend directory:
+    DATABASE_URL=postgresql+pg8000://postgres@localhost:5432/postgres \\
+    REPLICA_DATABASE_URL=postgresql+pg8000://postgres@localhost:5433/postgres \\
+    python -m scripts.check_replica_routing
+"""
+import asyncio
+import os
+
+from sqlalchemy import create_engine, text
+
+if not os.getenv('DATABASE_URL') or not os.getenv('REPLICA_DATABASE_URL'):
+    raise SystemExit('Set DATABASE_URL and REPLICA_DATABASE_URL to two different Postgres instances')
+
+from app.db.database import engine, replica_engine, replica_monitor, get_read_db, get_async_read_db, get_db
+
+# pg_postmaster_start_time() tells the two servers apart without needing superuser
+SERVER_SQL = text('SELECT pg_postmaster_start_time()')
+
+
+def server_of(session) -> str:
+    started = session.execute(SERVER_SQL).scalar()
+    return 'primary' if started == PRIMARY else 'replica' if started == REPLICA else f'unknown ({started})'
+
+
+def sync_read_server() -> str:
+    dependency = get_read_db()
+    db = next(dependency)
+    try:
+        return server_of(db)
+    finally:
+        dependency.close()
+
+
+async def async_read_server() -> str:
+    dependency = get_async_read_db()
+    db = await dependency.__anext__()
+    try:
+        return (await db.execute(SERVER_SQL)).scalar()
+    finally:
+        await dependency.aclose()
+
+
+async def report(label: str, expected: str):
+    sync_server = sync_read_server()
+    started = await async_read_server()
+    async_server = 'primary' if started == PRIMARY else 'replica' if started == REPLICA else f'unknown ({started})'
+    status = 'ok' if sync_server == async_server == expected else 'UNEXPECTED'
+    print(f"{label:<34} lag={replica_monitor.lag!s:<6} sync={sync_server:<8} async={async_server:<8} {status}")
+
+
+async def main():
+    global PRIMARY, REPLICA
+    with engine.connect() as connection:
+        PRIMARY = connection.execute(SERVER_SQL).scalar()
+    with replica_engine.connect() as connection:
+        REPLICA = connection.execute(SERVER_SQL).scalar()
+    if PRIMARY == REPLICA:
+        raise SystemExit('DATABASE_URL and REPLICA_DATABASE_URL point at the same server')
+
+    writer = next(get_db())
+    print(f"writes go to the {server_of(writer)}")
+    writer.close()
+
+    await report('before the first lag check', 'primary')
+
+    replica_monitor.check()
+    await report('replica healthy', 'replica')
+
+    max_lag = replica_monitor.max_lag
+    replica_monitor.max_lag = -1
+    await report('replica lagging past threshold', 'primary')
+    replica_monitor.max_lag = max_lag
+
+    healthy_engine = replica_monitor.engine
+    replica_monitor.engine = create_engine('postgresql+pg8000://nobody@127.0.0.1:1/missing')
+    replica_monitor.check()
+    await report('replica unreachable', 'primary')
+
+    replica_monitor.engine = healthy_engine
+    replica_monitor.check()
+    await report('replica back', 'replica')
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
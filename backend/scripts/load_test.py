@@ -0,0 +1,85 @@
+"""
+Closed-loop load test for the hot read endpoints.
+
+Each of --concurrency workers logs in once and then requests the endpoints round-robin for
+--duration seconds. Prints requests per second and latency percentiles per endpoint, so runs
+before and after a change can be compared on the same data.
+Run against a running server:
+    python -m scripts.load_test --base-url http://localhost:8080 --username u1 --password pw
+"""
+import argparse
+import asyncio
+import time
+from collections import defaultdict
+
+import httpx
+import numpy as np
+
+DEFAULT_PATHS = [
+    '/dashboard',
+    '/favorites',
+    '/leaderboard/lp?limit=100',
+    '/leaderboard/portfolio?limit=100',
+    '/top_leaderboard',
+]
+
+
+async def login(client: httpx.AsyncClient, username: str, password: str) -> str:
+    response = await client.post('/login', data={'username': username, 'password': password})
+    response.raise_for_status()
+    return response.json()['access_token']
+
+
+async def worker(client: httpx.AsyncClient, headers: dict, paths: list, offset: int, deadline: float, results: dict):
+    index = offset
+    while time.perf_counter() < deadline:
+        path = paths[index % len(paths)]
+        index += 1
+        start = time.perf_counter()
+        try:
+            response = await client.get(path, headers=headers)
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            ok = False
+        results[path].append((time.perf_counter() - start, ok))
+
+
+async def run(args):
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as client:
+        token = await login(client, args.username, args.password)
+        headers = {'Authorization': f'Bearer {token}'}
+        results = defaultdict(list)
+
+        deadline = time.perf_counter() + args.duration
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            worker(client, headers, args.paths, offset, deadline, results) for offset in range(args.concurrency)
+        ))
+        elapsed = time.perf_counter() - started
+
+    print(f"{args.concurrency} concurrent clients for {elapsed:.1f}s against {args.base_url}")
+    print(f"{'endpoint':<36} {'requests':>9} {'errors':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    total = 0
+    for path in args.paths:
+        samples = results[path]
+        if not samples:
+            continue
+        latencies = np.array([latency for latency, _ in samples]) * 1000
+        errors = sum(1 for _, ok in samples if not ok)
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        total += len(samples)
+        print(f"{path:<36} {len(samples):>9} {errors:>7} {len(samples) / elapsed:>8.1f} {p50:>8.1f} {p95:>8.1f} {p99:>8.1f}")
+    print(f"{'total':<36} {total:>9} {'':>7} {total / elapsed:>8.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', default='http://localhost:8080')
+    parser.add_argument('--username', required=True)
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=20.0)
+    parser.add_argument('--timeout', type=float, default=30.0)
+    parser.add_argument('--paths', nargs='+', default=DEFAULT_PATHS)
+    asyncio.run(run(parser.parse_args()))
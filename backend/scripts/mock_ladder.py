@@ -0,0 +1,103 @@
+"""
+Local stand-in for the Riot endpoints the ingestion calls, for benchmarks and manual runs.
+
+Serves a Challenger and a Grandmaster ladder drawn from a fixed pool of players, plus the
+account lookup by puuid. Each call to advance() moves every LP by a random walk and swaps a
+few players between the ladder and the pool, so successive ticks see new and leaving players.
+Every response is delayed by `latency` seconds, and more than `rate_limit` requests in one
+second get a 429 with Retry-After, like the real API. POST /mock/advance moves to the next
+tick when the mock runs standalone. Run standalone from the backend directory:
+    python -m scripts.mock_ladder --port 8100
+and point the ingestion at it with RIOT_PLATFORM_URL / RIOT_REGIONAL_URL=http://127.0.0.1:8100.
+"""
+from collections import deque
+from time import monotonic
+import argparse
+import asyncio
+import random
+
+import uvicorn
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse
+
+CHALLENGER = 250
+
+
+class MockLadder:
+    def __init__(self, ladder_size: int = 750, pool_size: int = 800, churn: int = 5, latency: float = 0.02,
+                 rate_limit: int = 500, seed: int = 0):
+        self.rng = random.Random(seed)
+        self.ladder_size = ladder_size
+        self.churn = churn
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.league_points = {f'puuid-{i}': self.rng.randint(200, 1500) for i in range(pool_size)}
+        self.listed = list(self.league_points)[:ladder_size]
+        self.requests = 0
+        self._sent = deque()
+
+    def advance(self):
+        for puuid in self.league_points:
+            self.league_points[puuid] = max(0, self.league_points[puuid] + self.rng.randint(-40, 40))
+        listed = set(self.listed)
+        unlisted = [puuid for puuid in self.league_points if puuid not in listed]
+        for _ in range(min(self.churn, len(unlisted))):
+            self.listed.remove(self.rng.choice(self.listed))
+            self.listed.append(unlisted.pop(self.rng.randrange(len(unlisted))))
+
+    def tier(self, tier: str) -> dict:
+        ranked = sorted(self.listed, key=lambda puuid: -self.league_points[puuid])
+        entries = ranked[:CHALLENGER] if tier == 'challenger' else ranked[CHALLENGER:]
+        return {'tier': tier.upper(), 'queue': 'RANKED_TFT', 'entries': [
+            {'puuid': puuid, 'summonerId': f'summoner-{puuid}', 'leaguePoints': self.league_points[puuid]}
+            for puuid in entries
+        ]}
+
+    async def throttle(self) -> bool:
+        """Wait out the latency; False when the request is over the rate limit."""
+        self.requests += 1
+        now = monotonic()
+        while self._sent and now - self._sent[0] >= 1:
+            self._sent.popleft()
+        if len(self._sent) >= self.rate_limit:
+            return False
+        self._sent.append(now)
+        await asyncio.sleep(self.latency)
+        return True
+
+
+def create_app(ladder: MockLadder) -> FastAPI:
+    app = FastAPI()
+    limited = JSONResponse({'status': {'status_code': 429}}, status_code=429, headers={'Retry-After': '1'})
+
+    @app.get('/tft/league/v1/{tier}')
+    async def league(tier: str, queue: str):
+        if tier not in ('challenger', 'grandmaster') or queue != 'RANKED_TFT':
+            raise HTTPException(status_code=404)
+        if not await ladder.throttle():
+            return limited
+        return ladder.tier(tier)
+
+    @app.get('/riot/account/v1/accounts/by-puuid/{puuid}')
+    async def account(puuid: str):
+        if puuid not in ladder.league_points:
+            raise HTTPException(status_code=404)
+        if not await ladder.throttle():
+            return limited
+        return {'puuid': puuid, 'gameName': f'Player {puuid.split("-")[1]}', 'tagLine': 'NA1'}
+
+    @app.post('/mock/advance')
+    async def advance():
+        ladder.advance()
+        return {'listed': len(ladder.listed)}
+
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=8100)
+    parser.add_argument('--players', type=int, default=750)
+    parser.add_argument('--latency', type=float, default=0.02)
+    args = parser.parse_args()
+    uvicorn.run(create_app(MockLadder(ladder_size=args.players, latency=args.latency)), port=args.port)
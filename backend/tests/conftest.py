@@ -0,0 +1,30 @@
+import os
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+
+def database_url() -> str:
+    # Same source as migrations/env.py: DATABASE_URL when set, otherwise the AWS secret
+    url = os.getenv('DATABASE_URL')
+    if url:
+        return url
+    from app.utils.get_secret import get_secret
+    return get_secret("tft-stocks-keys")["database_url"]
+
+
+@pytest.fixture(scope='session')
+def engine():
+    """Engine on the database `alembic upgrade head` migrated; without one the tests fail, never skip."""
+    engine = create_engine(database_url())
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    # Anything a test writes or sets is rolled back with the session
+    with Session(engine) as session:
+        yield session
+        session.rollback()
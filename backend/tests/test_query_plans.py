@@ -0,0 +1,109 @@
+"""
+Check that the hot queries are planned on the indexes added by the migrations.
+
+Each query is built the way the endpoints build it and EXPLAINed with sequential scans, bitmap scans
+and explicit sorts disabled, so the check asserts that the index matches the query shape (filter and
+ordering) even on a small development database where the planner would otherwise skip it. Tables
+holding data are ANALYZEd first so a choice between two candidate indexes uses current statistics;
+empty ones keep the planner's default estimate, under which an empty table is not treated as free to scan.
+"""
+from datetime import datetime, timezone, timedelta
+import json
+
+import pytest
+from sqlalchemy import select, text, func, and_, desc, tuple_, literal
+
+from app.models.db_models import User, Player, PlayerData, Portfolio, PortfolioPlayer, PortfolioHold, \
+    PortfolioHistory, Transaction, Favorite, UserLeagues
+
+NOW = datetime.now(timezone.utc)
+
+# (label, query, expected index or indexes, whether the index must also provide the ordering)
+HOT_QUERIES = [
+    ('player history window',
+     select(PlayerData.date, PlayerData.league_points)
+     .where(PlayerData.player_id == 1, PlayerData.date >= NOW - timedelta(days=7))
+     .order_by(PlayerData.date),
+     'ix_player_data_player_id_date', True),
+    ('player lookup',
+     select(Player).where(and_(Player.game_name == 'name', Player.tag_line == 'NA1')),
+     'ix_players_game_name_tag_line', False),
+    ('player search',
+     select(Player).where(Player.game_name_lower == 'name'),
+     'ix_players_game_name_lower', False),
+    ('current league membership',
+     select(UserLeagues).where(and_(UserLeagues.user_id == 1, UserLeagues.league_id == 1)),
+     'ix_user_leagues_user_id_league_id', False),
+    ('portfolio leaderboard page',
+     select(UserLeagues).where(UserLeagues.league_id == 1, UserLeagues.rank > 100)
+     .order_by(UserLeagues.rank).limit(100),
+     'ix_user_leagues_league_id_rank', True),
+    ('holding for a trade',
+     select(PortfolioPlayer).where(and_(PortfolioPlayer.portfolio_id == 1, PortfolioPlayer.player_id == 1)),
+     'uq_portfolio_players_portfolio_id_player_id', False),
+    ('unswept holds for a sell',
+     select(func.sum(PortfolioHold.shares)).where(and_(
+         PortfolioHold.portfolio_id == 1, PortfolioHold.player_id == 1, PortfolioHold.hold_deadline <= NOW)),
+     # Once holds are swept few rows are expired, so the deadline index alone is as good a path
+     ('ix_portfolio_holds_portfolio_id_player_id_hold_deadline', 'ix_portfolio_holds_hold_deadline'), False),
+    ('expired holds to sweep',
+     select(PortfolioHold.portfolio_id).where(PortfolioHold.hold_deadline <= NOW),
+     'ix_portfolio_holds_hold_deadline', False),
+    ('transaction history page',
+     select(Transaction).where(
+         Transaction.portfolio_id == 1,
+         tuple_(Transaction.transaction_date, Transaction.id) < tuple_(literal(NOW), literal(1_000_000))
+     ).order_by(desc(Transaction.transaction_date), desc(Transaction.id)).limit(50),
+     'ix_transactions_portfolio_id_transaction_date_id', True),
+    ('portfolio history',
+     select(PortfolioHistory).where(PortfolioHistory.portfolio_id == 1).order_by(PortfolioHistory.date),
+     'ix_portfolio_history_portfolio_id_date', True),
+    ('most valuable portfolio',
+     select(User.username, Portfolio.current_value)
+     .join(UserLeagues, User.id == UserLeagues.user_id)
+     .join(Portfolio, Portfolio.id == UserLeagues.portfolio_id)
+     .where(Portfolio.current_value.isnot(None))
+     .order_by(desc(Portfolio.current_value)).limit(1),
+     'ix_portfolios_current_value', True),
+    ('favorite status',
+     select(Favorite).where(and_(Favorite.user_id == 1, Favorite.player_id == 1)),
+     'uq_favorites_user_id_player_id', False),
+]
+
+CHECKED_TABLES = ['players', 'player_data', 'users', 'user_leagues', 'portfolios', 'portfolio_players',
+                  'portfolio_holds', 'transactions', 'portfolio_history', 'favorites']
+
+
+def plan_nodes(node: dict):
+    yield node
+    for child in node.get('Plans', []):
+        yield from plan_nodes(child)
+
+
+def explain(db, query) -> dict:
+    statement = query.compile(db.get_bind(), compile_kwargs={'literal_binds': True})
+    plan = db.execute(text(f'EXPLAIN (FORMAT JSON) {statement}')).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]['Plan']
+
+
+@pytest.fixture(scope='module')
+def analyzed(engine):
+    with engine.begin() as connection:
+        for table in CHECKED_TABLES:
+            if connection.execute(text(f'SELECT EXISTS (SELECT 1 FROM {table})')).scalar():
+                connection.execute(text(f'ANALYZE {table}'))
+
+
+@pytest.mark.parametrize('label, query, indexes, ordered', HOT_QUERIES, ids=[query[0] for query in HOT_QUERIES])
+def test_query_uses_index(analyzed, db, label, query, indexes, ordered):
+    # Local to the test's transaction, which the db fixture rolls back
+    for setting in ('enable_seqscan', 'enable_bitmapscan', 'enable_sort'):
+        db.execute(text(f'SET LOCAL {setting} = off'))
+    indexes = {indexes} if isinstance(indexes, str) else set(indexes)
+    nodes = list(plan_nodes(explain(db, query)))
+    used = {node['Index Name'] for node in nodes if 'Index Name' in node}
+    assert indexes & used, f"{label} planned on {', '.join(sorted(used)) or 'no index'}"
+    if ordered:
+        assert not any(node['Node Type'] in ('Sort', 'Incremental Sort') for node in nodes), f"{label} sorts"
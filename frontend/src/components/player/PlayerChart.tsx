@@ -1,4 +1,4 @@
-import React, {useState} from 'react';
+import React from 'react';
 import {
   XAxis, YAxis, CartesianGrid, ResponsiveContainer, AreaChart, Tooltip, Area, TooltipProps
 } from '../../../node_modules/recharts';
@@ -9,10 +9,25 @@ interface PlayerData {
   price: number[];
 }
 
+export type TimeRange = '3days' | '1week' | 'all';
+
 interface PlayerChartProps {
   playerData: PlayerData;
+  onTimeRangeChange: (timeRange: TimeRange) => void;
 }
 
+// Query string asking the backend for only the window and resolution the chart plots
+export const historyQuery = (timeRange: TimeRange): string => {
+  const days = timeRange === '3days' ? 3 : timeRange === '1week' ? 7 : null;
+  const params = new URLSearchParams({ resolution: timeRange === '3days' ? 'raw' : '1h' });
+  if (days !== null) {
+    const start = new Date();
+    start.setDate(start.getDate() - days);
+    params.set('start', start.toISOString());
+  }
+  return params.toString();
+};
+
 const formatDate = (date: Date): string => {
     return date.toLocaleDateString('en-US', {month: 'numeric', day: 'numeric'});
 };
@@ -42,26 +57,14 @@ const CustomTooltip = ({ active, payload, label }: TooltipProps<number, string>)
   return null;
 };
 
-export const PlayerChart: React.FC<PlayerChartProps> = ({ playerData }) => {
-  const [timeRange, setTimeRange] = useState<'3days' | '1week' | 'all'>('all');
-
+export const PlayerChart: React.FC<PlayerChartProps> = ({ playerData, onTimeRangeChange }) => {
+  // The backend already returns only the selected range, see historyQuery
   const chartData = React.useMemo(() => {
-    const data = playerData.price.map((price, index) => ({
+    return playerData.price.map((price, index) => ({
       date: new Date(playerData.date[index]),
       price
     })).filter((_, index, array) => index === 0 || array[index].price !== array[index - 1].price);
-
-    if (timeRange === '3days') {
-      const threeDaysAgo = new Date();
-      threeDaysAgo.setDate(threeDaysAgo.getDate() - 3);
-      return data.filter(entry => entry.date >= threeDaysAgo);
-    } else if (timeRange === '1week') {
-      const oneWeekAgo = new Date();
-      oneWeekAgo.setDate(oneWeekAgo.getDate() - 7);
-      return data.filter(entry => entry.date >= oneWeekAgo);
-    }
-    return data;
-  }, [playerData, timeRange]);
+  }, [playerData]);
 
   const hasData = chartData.length > 0;
 
@@ -88,9 +91,9 @@ export const PlayerChart: React.FC<PlayerChartProps> = ({ playerData }) => {
   return (
       <ChartContainer label={"Performance"}>
           <div style={{display: 'flex', justifyContent: 'flex-end'}}>
-              <ChartStyledButton onClick={() => setTimeRange('all')}>All</ChartStyledButton>
-              <ChartStyledButton onClick={() => setTimeRange('1week')}>1W</ChartStyledButton>
-              <ChartStyledButton onClick={() => setTimeRange('3days')}>3D</ChartStyledButton>
+              <ChartStyledButton onClick={() => onTimeRangeChange('all')}>All</ChartStyledButton>
+              <ChartStyledButton onClick={() => onTimeRangeChange('1week')}>1W</ChartStyledButton>
+              <ChartStyledButton onClick={() => onTimeRangeChange('3days')}>3D</ChartStyledButton>
           </div>
           {hasData ? (
               <ResponsiveContainer width="100%" height={400}>
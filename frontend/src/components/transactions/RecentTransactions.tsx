@@ -17,7 +17,8 @@ export interface Transaction {
 // Define the props for the RecentTransactions component
 interface RecentTransactionsProps {
     transactions: Transaction[];
-    maxEntries: number
+    maxEntries: number;
+    newestFirst?: boolean; // Set when the list already comes newest first, e.g. from /transaction_history
 }
 
 const TransactionContainer = styled.div`
@@ -27,13 +28,13 @@ const TransactionContainer = styled.div`
     flex: 1;  // Takes up all available space
 `;
 
-export const RecentTransactions: React.FC<RecentTransactionsProps> = ({ transactions, maxEntries }) => {
+export const RecentTransactions: React.FC<RecentTransactionsProps> = ({ transactions, maxEntries, newestFirst = false }) => {
   if (!transactions || !Array.isArray(transactions)) {
     return <p>No transactions available or still loading...</p>;
   }
 
-  // Create a copy of the transactions array and reverse it
-  const reversedTransactions = [...transactions].reverse().slice(0,maxEntries);
+  // Show the newest transactions first
+  const reversedTransactions = (newestFirst ? [...transactions] : [...transactions].reverse()).slice(0,maxEntries);
 
   return (
       <TransactionContainer>
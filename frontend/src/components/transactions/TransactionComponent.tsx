@@ -129,6 +129,8 @@ export const TransactionComponent: React.FC<TransactionComponentProps> = ({ game
   const [transactionType, setTransactionType] = useState<string>('');
   const [error, setError] = useState<string>('');
   const [loading, setLoading] = useState<boolean>(false);
+  // One key per previewed order, so a repeated confirm or a retried request trades only once
+  const [idempotencyKey, setIdempotencyKey] = useState<string>('');
   const { token } = useAuth();
   const { isLoggedIn } = useAuth();
   const backendUrl = import.meta.env.VITE_BACKEND_URL;
@@ -197,7 +199,8 @@ export const TransactionComponent: React.FC<TransactionComponentProps> = ({ game
         method: 'POST',
         headers: {
           'Authorization': `Bearer ${token}`,
-          'Content-Type': 'application/json'
+          'Content-Type': 'application/json',
+          'Idempotency-Key': idempotencyKey
         },
         body: JSON.stringify({ shares })
       });
@@ -245,6 +248,7 @@ export const TransactionComponent: React.FC<TransactionComponentProps> = ({ game
 
   const handlePreview = () => {
     if (transactionType && shares !== '0') {
+      setIdempotencyKey(crypto.randomUUID());
       setIsModalOpen(true);
     }
   };
@@ -63,14 +63,17 @@ export const LeaderboardPage = () => {
     const [error, setError] = useState<string | null>(null);
     const [isLoading, setIsLoading] = useState<boolean>(true);
     const [page, setPage] = useState<number>(0);
+    // cursors[i] fetches page i; the first page has no cursor
+    const [cursors, setCursors] = useState<Array<string | null>>([null]);
     const navigate = useNavigate();
 
     useEffect(() => {
         const fetchData = async () => {
             setIsLoading(true);
             try {
-                const data = await fetchLeaderboardData(leadType, token, page, 100);
+                const data = await fetchLeaderboardData(leadType, token, cursors[page] ?? null, 100);
                 setEntries(data.entries);
+                setCursors(prev => [...prev.slice(0, page + 1), data.nextCursor]);
                 setIsLoading(false);
             } catch (error) {
                 console.error('Fetch error:', error);
@@ -87,12 +90,14 @@ export const LeaderboardPage = () => {
         if (type !== leadType) {
             setLeadType(type);
             setPage(0); // Reset page to 0 when sort type changes
+            setCursors([null]);
         }
     };
 
     const toggleLeadType = () => {
         setLeadType(leadType === 'portfolio' ? 'lp' : 'portfolio');
         setPage(0); // Optionally reset the page when toggling
+        setCursors([null]);
     };
 
     if (isLoading) {
@@ -121,7 +126,7 @@ export const LeaderboardPage = () => {
                         <StyledButton disabled={page === 0} onClick={() => setPage(page - 1)}>Previous</StyledButton>
                     </PrevButtonContainer>
                     <NextButtonContainer>
-                        <StyledButton onClick={() => setPage(page + 1)}>Next</StyledButton>
+                        <StyledButton disabled={!cursors[page + 1]} onClick={() => setPage(page + 1)}>Next</StyledButton>
                     </NextButtonContainer>
                 </LeaderboardButtonContainer>
             </div>
@@ -1,7 +1,7 @@
 import { useState, useEffect } from 'react';
 import {useNavigate, useParams} from 'react-router-dom';
 import { TransactionComponent } from '../components/transactions/TransactionComponent';
-import { PlayerChart } from '../components/player/PlayerChart';
+import { PlayerChart, TimeRange, historyQuery } from '../components/player/PlayerChart';
 import { MainContent } from "../containers/general/MainContent";
 import {
     DetailsAndTransactionColumn,
@@ -63,6 +63,7 @@ export function PlayerInfo() {
     const [playerData, setPlayerData] = useState<PlayerData | null>(null);
     const [loading, setLoading] = useState<boolean>(true);
     const [error, setError] = useState<string>('');
+    const [timeRange, setTimeRange] = useState<TimeRange>('all');
     const navigate = useNavigate();
     const backendUrl = import.meta.env.VITE_BACKEND_URL;
 
@@ -70,14 +71,17 @@ export function PlayerInfo() {
         if (gameName && tagLine) {
             fetchPlayerData(gameName, tagLine);
         }
-    }, [gameName, tagLine]);
+    }, [gameName, tagLine, timeRange]);
 
     const fetchPlayerData = async (gameName: string, tagLine: string) => {
         console.log(`Fetching player data for ${gameName} with tagLine ${tagLine}`);
-        setLoading(true);
+        // Only show the loading screen on first load, not when switching chart ranges
+        if (!playerData) {
+            setLoading(true);
+        }
         setError('');
         try {
-            const response = await fetch(`${backendUrl}/players/${gameName}/${tagLine}`);
+            const response = await fetch(`${backendUrl}/players/${gameName}/${tagLine}?${historyQuery(timeRange)}`);
             if (!response.ok) {
                 const errorData = await response.json();
                 throw new Error(errorData.detail || 'Error fetching player data');
@@ -145,7 +149,7 @@ export function PlayerInfo() {
                         )}
                     </TransactionContainer>
                 </DetailsAndTransactionColumn>
-                <PlayerChart playerData={playerData} />
+                <PlayerChart playerData={playerData} onTimeRangeChange={setTimeRange} />
             </PlayerInfoContainer>
         </MainContent>
     );
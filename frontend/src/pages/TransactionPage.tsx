@@ -1,53 +1,93 @@
-import React, { useEffect, useState } from 'react';
+import React, { useCallback, useEffect, useState } from 'react';
 import axios from 'axios';
+import styled from "styled-components";
 import { useNavigate } from 'react-router-dom';
 import { RecentTransactions, Transaction } from "../components/transactions/RecentTransactions.tsx";
 import {MainContent} from "../containers/general/MainContent.tsx";
 import {useAuth} from "../utils/Authentication.tsx";
 
+const PAGE_SIZE = 50;
+
+interface TransactionHistoryResponse {
+    transactions: Transaction[]; // Newest first
+    next_cursor: string | null;
+}
+
+const LoadMoreButton = styled.button`
+    margin: 20px 0 0 3%;
+    padding: 8px 16px;
+    background: #333;
+    color: #EAEAEA;
+    border: none;
+    border-radius: 4px;
+    cursor: pointer;
+
+    &:hover {
+        background: #444;
+        color: cornflowerblue;
+    }
+
+    &:disabled {
+        cursor: default;
+        color: #888;
+    }
+`;
+
 // TransactionPage component
 export const TransactionPage: React.FC = () => {
     const [transactions, setTransactions] = useState<Transaction[]>([]);
+    const [nextCursor, setNextCursor] = useState<string | null>(null);
     const [isLoading, setLoading] = useState(true);
+    const [isLoadingMore, setLoadingMore] = useState(false);
     const [error, setError] = useState('');
     const navigate = useNavigate();
     const backendUrl = import.meta.env.VITE_BACKEND_URL;
     const { token } = useAuth();
 
-    useEffect(() => {
-        const fetchData = async () => {
-            try {
-                const response = await axios.get<Transaction[]>(`${backendUrl}/transaction_history`, {
-                    headers: { Authorization: `Bearer ${token}` }
-                });
-                if (response.data) {
-                    setTransactions(response.data);
-                }
-                setLoading(false);
-            } catch (error) {
-                navigate('/');
-                console.error('Error fetching transactions:', error);
-                if (axios.isAxiosError(error) && error.response) {
-                    if (error.response.status === 401) {
-                        navigate('/');
-                    }
+    // Fetches one page; without a cursor the list starts over from the newest transaction
+    const fetchPage = useCallback(async (cursor: string | null) => {
+        try {
+            const response = await axios.get<TransactionHistoryResponse>(`${backendUrl}/transaction_history`, {
+                headers: { Authorization: `Bearer ${token}` },
+                params: { limit: PAGE_SIZE, ...(cursor ? { cursor } : {}) }
+            });
+            if (response.data) {
+                setTransactions(previous => cursor ? [...previous, ...response.data.transactions] : response.data.transactions);
+                setNextCursor(response.data.next_cursor);
+            }
+        } catch (error) {
+            navigate('/');
+            console.error('Error fetching transactions:', error);
+            if (axios.isAxiosError(error) && error.response) {
+                if (error.response.status === 401) {
+                    navigate('/');
                 }
-                setError('Failed to fetch transactions');
-                setLoading(false);
             }
-        };
-
-        fetchData();
+            setError('Failed to fetch transactions');
+        }
     }, [backendUrl, navigate, token]);
 
+    useEffect(() => {
+        fetchPage(null).finally(() => setLoading(false));
+    }, [fetchPage]);
+
+    const loadMore = () => {
+        setLoadingMore(true);
+        fetchPage(nextCursor).finally(() => setLoadingMore(false));
+    };
+
     if (isLoading) {return (<MainContent className="mainContentContainer">Loading...</MainContent>);}
     if (error) {return (<MainContent className="mainContentContainer">Error: No data available.</MainContent>);}
 
     return (
         <MainContent>
             <h1>Transaction History</h1>
-            <RecentTransactions transactions={transactions} maxEntries={20} />
+            <RecentTransactions transactions={transactions} maxEntries={transactions.length} newestFirst />
+            {nextCursor && (
+                <LoadMoreButton onClick={loadMore} disabled={isLoadingMore}>
+                    {isLoadingMore ? 'Loading...' : 'Load more'}
+                </LoadMoreButton>
+            )}
         </MainContent>
     );
 };
-
@@ -22,11 +22,17 @@ export interface PortfolioLeaderboardEntry {
 interface LeaderboardResponse {
   entries: Array<LeaderboardEntry | PortfolioLeaderboardEntry>;
   totalEntries: number;
+  nextCursor: string | null;
 }
 
 // Function to fetch leaderboard data
-export async function fetchLeaderboardData(leadType: string, token: string | null, page: number = 0, limit: number = 100): Promise<LeaderboardResponse> {
-  const url: string = `${backendUrl}/leaderboard/${leadType}?limit=${limit}&page=${page}`;
+// Pages are addressed by the opaque cursor returned with the previous page; null fetches the first page
+export async function fetchLeaderboardData(leadType: string, token: string | null, cursor: string | null = null, limit: number = 100): Promise<LeaderboardResponse> {
+  const params = new URLSearchParams({ limit: String(limit) });
+  if (cursor) {
+    params.set('cursor', cursor);
+  }
+  const url: string = `${backendUrl}/leaderboard/${leadType}?${params.toString()}`;
   try {
     const response: Response = await fetch(url, {
       headers: {
@@ -46,7 +52,8 @@ export async function fetchLeaderboardData(leadType: string, token: string | nul
           value: entry.value,
           rank: entry.rank
         })),
-        totalEntries: data.totalEntries
+        totalEntries: data.totalEntries,
+        nextCursor: data.next_cursor ?? null
       } as LeaderboardResponse;
     } else {
       // Transform the data for standard leaderboard entries
@@ -60,7 +67,8 @@ export async function fetchLeaderboardData(leadType: string, token: string | nul
           delta_72h: entry.delta_72h,
           rank: entry.rank
         })),
-        totalEntries: data.totalEntries
+        totalEntries: data.totalEntries,
+        nextCursor: data.next_cursor ?? null
       } as LeaderboardResponse;
     }
   } catch (error) {